@@ -0,0 +1,130 @@
+'''Benchmark the Python side of computing an objective from Daisy output.
+
+These are the costs paid in every evaluation after Daisy has finished:
+  read_dlf              Parse a dlf
+  extract/singleton     DlfDataExtractor with a single variable (DlfSingleton)
+  extract/sum           DlfDataExtractor summing variables from two logs (DlfSum)
+  loss                  LossWrapper aligning actual and target on time and computing mse
+
+Dlf files are hourly over 1 to 50 years with 5 to 200 columns. They are generated once and stored
+in benchmark-data/. Time is the median over repeats and peak memory is the peak traced by
+tracemalloc during a single call.
+'''
+import argparse
+import itertools
+import os
+import shutil
+import time
+import tracemalloc
+from pathlib import Path
+import pandas as pd
+from generate_time_series import generate_dlf # pylint: disable=import-error
+from daisypy.io.dlf import read_dlf
+from daisypy.optim import DlfDataExtractor, DlfSum, mse
+from daisypy.optim.loss_wrapper import LossWrapper
+
+DATA_DIR = Path(__file__).parent / 'benchmark-data' / 'dlf'
+
+def dlf_dir(years, columns):
+    '''Directory with the two dlf files of a given size'''
+    return DATA_DIR / f'{years}y-{columns}c'
+
+def generate_benchmark_data(years_list, columns_list, regenerate):
+    '''Generate dlf files that do not already exist. Each size has two logs, a.dlf and b.dlf'''
+    for years, columns in itertools.product(years_list, columns_list):
+        out_dir = dlf_dir(years, columns)
+        if out_dir.exists() and not regenerate:
+            continue
+        print(f'Generating {years} years, {columns} columns', flush=True)
+        os.makedirs(out_dir, exist_ok=True)
+        for log_name in ('a', 'b'):
+            generate_dlf(out_dir / f'{log_name}.dlf', years, columns, log_name=log_name)
+
+def measure(fn, repeats):
+    '''Median time in seconds and peak traced memory in MiB of calling fn'''
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    # Measure memory separately, tracing slows down allocations
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pd.Series(timings).median(), peak / 2**20
+
+def benchmark_size(years, columns, repeats):
+    '''Run all benchmarks on dlf files of a given size
+
+    Returns
+    -------
+    list of dict
+    '''
+    # pylint: disable=too-many-locals
+    in_dir = dlf_dir(years, columns)
+    dlf_path = in_dir / 'a.dlf'
+    singleton = DlfDataExtractor({'a.dlf' : 'c0'})
+    dlf_sum = DlfDataExtractor({'a.dlf' : ['c0', 'c1'], 'b.dlf' : 'c0'}, DlfSum())
+    actual = singleton(in_dir)
+    # Sparse target, like measurements, with a time stamp every 10 days
+    target = actual.iloc[::240].copy()
+    loss = LossWrapper(mse)
+    benchmarks = {
+        'read_dlf' : lambda: read_dlf(dlf_path),
+        'extract/singleton' : lambda: singleton(in_dir),
+        'extract/sum' : lambda: dlf_sum(in_dir),
+        'loss' : lambda: loss(actual, target),
+    }
+    results = []
+    for name, fn in benchmarks.items():
+        print(f'Start {name} {years} years, {columns} columns', flush=True)
+        seconds, peak_mib = measure(fn, repeats)
+        results.append({
+            'benchmark' : name,
+            'years' : years,
+            'columns' : columns,
+            'rows' : len(actual),
+            'dlf_mib' : os.path.getsize(dlf_path) / 2**20,
+            'seconds' : seconds,
+            'peak_mib' : peak_mib,
+        })
+    return results
+
+def benchmark_dlf(years_list, columns_list, repeats):
+    '''Run all benchmarks and return results as a DataFrame'''
+    results = []
+    for years, columns in itertools.product(years_list, columns_list):
+        results += benchmark_size(years, columns, repeats)
+    return pd.DataFrame(results)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--years', nargs='+', type=int, default=[1, 10, 50], help='Years of hourly data'
+    )
+    parser.add_argument(
+        '--columns', nargs='+', type=int, default=[5, 50, 200], help='Number of columns in dlf'
+    )
+    parser.add_argument('--repeats', type=int, default=5, help='Number of timed calls')
+    parser.add_argument(
+        '--regenerate', action='store_true', help='If set regenerate benchmark data'
+    )
+    parser.add_argument(
+        '--clean', action='store_true', help='If set remove benchmark data when done'
+    )
+    parser.add_argument(
+        '--output', type=str,
+        default=str(Path(__file__).parent / 'benchmark-results' / 'dlf.csv'),
+        help='Path to result csv'
+    )
+    args = parser.parse_args()
+    generate_benchmark_data(args.years, args.columns, args.regenerate)
+    print('Running benchmarks')
+    df = benchmark_dlf(args.years, args.columns, args.repeats)
+    os.makedirs(Path(args.output).parent, exist_ok=True)
+    df.to_csv(args.output, index=False)
+    print(df.to_string(index=False))
+    print(f'Results written to {args.output}')
+    if args.clean:
+        shutil.rmtree(DATA_DIR)
@@ -0,0 +1,50 @@
+import argparse
+import subprocess
+import sys
+import time
+import pandas as pd
+
+LOOKUP = 'from daisypy.optim import available_optimizers; available_optimizers'
+STATEMENTS = {
+    'package' : 'import daisypy.optim',
+    'runner+problem' : 'from daisypy.optim import DaisyRunner, DaisyOptimizationProblem',
+    'sequential' : LOOKUP + "['sequential']",
+    'cma' : LOOKUP + "['cma']",
+    'ax' : LOOKUP + "['ax']",
+    'visualize' : 'from daisypy.optim import plot_result',
+    'create' : 'import daisypy.optim.create',
+}
+
+def time_import(statement):
+    '''Time a statement in a fresh interpreter, so nothing is cached in sys.modules'''
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', statement], check=True)
+    return time.perf_counter() - start
+
+def benchmark_import_time(repeats):
+    '''Measure median wall clock time of importing parts of daisypy.optim in a new process'''
+    baseline = [ time_import('pass') for _ in range(repeats) ]
+    baseline = pd.Series(baseline).median()
+    rows = []
+    for name, statement in STATEMENTS.items():
+        print(f'Start {name}', flush=True)
+        try:
+            timings = [ time_import(statement) for _ in range(repeats) ]
+        except subprocess.CalledProcessError:
+            print(f'Skipping {name}, statement failed', flush=True)
+            continue
+        median = pd.Series(timings).median()
+        rows.append({
+            'name' : name, 'median' : median, 'median - interpreter' : median - baseline
+        })
+    results = pd.DataFrame(rows)
+    print(f'Interpreter startup: {baseline:.3f}s')
+    print(results)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--repeats', type=int, default=5, help='Number of times each import is timed'
+    )
+    args = parser.parse_args()
+    benchmark_import_time(args.repeats)
@@ -0,0 +1,231 @@
+'''Compare how many evaluations the optimizers need on cheap analytic problems.
+
+Each optimizer is run through tests/mockup.py's MockProblem on functions with known minima. The
+number of evaluations until the best objective value is within the target tolerance of the minimum
+is read from the result log. This is the number of Daisy runs a method would cost on a problem of
+similar difficulty. Failed evaluations (nan) count as evaluations.
+
+Results are written to a csv file with one row per function, optimizer, option set and repeat.
+'''
+# pylint: disable=too-few-public-methods
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from daisypy.optim import ContinuousParameter, DefaultLogger, available_optimizers
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'tests'))
+# pylint: disable-next=import-error,wrong-import-position,wrong-import-order
+from mockup import MockProblem
+
+class Sphere:
+    '''Separable quadratic with minimum 0 away from the initial values'''
+    def __init__(self):
+        self.name = 'sphere'
+        self.amin = { 'x0' : 1, 'x1' : -2, 'x2' : 0.5, 'x3' : 3 }
+        self.parameters = [ ContinuousParameter(name, 0, (-5, 5)) for name in self.amin ]
+        self.min = 0
+
+    def __call__(self, **x):
+        return sum((x[name] - a)**2 for name, a in self.amin.items())
+
+class Rosenbrock:
+    '''Ill-conditioned curved valley with minimum 0 at (1, 1)'''
+    def __init__(self):
+        self.name = 'rosenbrock'
+        self.parameters = [
+            ContinuousParameter('x', -1, (-2, 2)),
+            ContinuousParameter('y', 2, (-1, 3))
+        ]
+        self.amin = { 'x' : 1, 'y' : 1 }
+        self.min = 0
+
+    def __call__(self, x, y):
+        return (1 - x)**2 + 100 * (y - x**2)**2
+
+class Rastrigin:
+    '''Multimodal function with a regular grid of local minima and global minimum 0 at (0, 0)'''
+    def __init__(self):
+        self.name = 'rastrigin'
+        self.parameters = [
+            ContinuousParameter('x', 2.5, (-5.12, 5.12)),
+            ContinuousParameter('y', -3.5, (-5.12, 5.12))
+        ]
+        self.amin = { 'x' : 0, 'y' : 0 }
+        self.min = 0
+
+    def __call__(self, x, y):
+        return 20 + x**2 - 10 * np.cos(2 * np.pi * x) + y**2 - 10 * np.cos(2 * np.pi * y)
+
+class FailingSphere(Sphere):
+    '''Sphere that fails (nan) in a large region, like Daisy does for unphysical parameters'''
+    def __init__(self):
+        super().__init__()
+        self.name = 'failing_sphere'
+
+    def __call__(self, **x):
+        if x['x0'] + x['x1'] > 1 or x['x3'] > 4:
+            return np.nan
+        return super().__call__(**x)
+
+class MockObjective:
+    '''Function named 'mock', like the objective value returned by MockProblem'''
+    def __init__(self, function):
+        self.name = 'mock'
+        self.function = function
+
+    def __call__(self, **x):
+        return self.function(**x)
+
+FUNCTIONS = { f.name : f for f in (Sphere(), Rosenbrock(), Rastrigin(), FailingSphere()) }
+
+def option_sets(budget, ax_budget):
+    '''Option sets to try for each optimizer
+
+    The analytic functions have no simulation period to shorten, so halving only uses the full
+    horizon, where it evaluates `num_candidates` uniform samples. This is a random search baseline.
+
+    Returns
+    -------
+    dict of (str, list of dict)
+    '''
+    return {
+        'sequential' : [ { 'num_samples' : n } for n in (3, 5, 9, 17) ],
+        'cma' : [
+            { 'maxfevals' : budget, 'verbose' : -9, **popsize }
+            for popsize in ({}, { 'popsize' : 4 }, { 'popsize' : 16 })
+        ],
+        'ax' : [
+            { 'max_trials' : ax_budget, 'max_trials_iteration' : n } for n in (1, 4)
+        ],
+        'halving' : [
+            { 'horizons' : [None], 'num_candidates' : n } for n in (ax_budget, budget)
+        ],
+    }
+
+def evaluations_to_target(fvals, target):
+    '''Number of evaluations until the best value is at most target. None if never reached'''
+    best = np.fmin.accumulate(np.where(np.isnan(fvals), np.inf, fvals))
+    reached = np.nonzero(best <= target)[0]
+    if len(reached) == 0:
+        return None
+    return int(reached[0]) + 1
+
+def run_optimizer(optimizer_name, options, function, seed, args):
+    '''Run an optimizer on a function and measure it
+
+    Returns
+    -------
+    dict
+    '''
+    options = dict(options)
+    if optimizer_name in ('cma', 'halving'):
+        options['seed'] = seed
+    problem = MockProblem(function.parameters, MockObjective(function))
+    with tempfile.TemporaryDirectory() as out_dir:
+        quiet = contextlib.redirect_stdout(io.StringIO())
+        with contextlib.nullcontext() if args.verbose else quiet, DefaultLogger(out_dir) as logger:
+            optimizer = available_optimizers[optimizer_name](
+                problem, logger, options, number_of_processes=args.processes
+            )
+            start = time.perf_counter()
+            optimizer.optimize()
+            wall = time.perf_counter() - start
+        result = pd.read_csv(os.path.join(out_dir, 'result.csv'))
+    if 'tag' in result.columns:
+        result = result[result['tag'] == 'raw']
+    fvals = result['metric_mock'].to_numpy(dtype=float)
+    if optimizer_name == 'sequential':
+        # The initial evaluation is not in the result log
+        initial = function(**{ p.name : p.initial_value for p in function.parameters })
+        fvals = np.concatenate([[initial], fvals])
+    return {
+        'evaluations_to_target' : evaluations_to_target(fvals, function.min + args.tolerance),
+        'evaluations' : len(fvals),
+        'failed_evaluations' : int(np.isnan(fvals).sum()),
+        'best' : np.nanmin(fvals),
+        'wall' : wall,
+    }
+
+def benchmark_optimizers(args):
+    '''Run all combinations, write results and print a summary'''
+    results = []
+    for function_name in args.functions:
+        function = FUNCTIONS[function_name]
+        for optimizer_name in args.optimizers:
+            for options in option_sets(args.budget, args.ax_budget)[optimizer_name]:
+                # The sequential optimizer is deterministic, so a single repeat is enough
+                repeats = 1 if optimizer_name == 'sequential' else args.repeats
+                for repeat in range(repeats):
+                    print(f'Start {function_name} {optimizer_name} {options} {repeat}', flush=True)
+                    try:
+                        result = run_optimizer(optimizer_name, options, function, repeat + 1, args)
+                    except Exception as e: # pylint: disable=broad-exception-caught
+                        # An optimizer that gives up on a problem is a result too
+                        print(f'Failed with {type(e).__name__}: {e}', flush=True)
+                        result = { 'error' : type(e).__name__ }
+                    results.append({
+                        'function' : function_name,
+                        'optimizer' : optimizer_name,
+                        'options' : json.dumps(options, sort_keys=True),
+                        'repeat' : repeat,
+                        'tolerance' : args.tolerance,
+                        **result,
+                    })
+
+    results = pd.DataFrame(results)
+    if 'error' not in results.columns:
+        results['error'] = None
+    os.makedirs(Path(args.output).parent, exist_ok=True)
+    results.to_csv(args.output, index=False)
+
+    summary = results.groupby(['function', 'optimizer', 'options'], sort=False).agg(
+        success_rate=('evaluations_to_target', lambda x: x.notna().mean()),
+        median_evaluations_to_target=('evaluations_to_target', 'median'),
+        median_evaluations=('evaluations', 'median'),
+        median_best=('best', 'median'),
+        median_wall=('wall', 'median'),
+        errors=('error', 'count'),
+    )
+    with pd.option_context('display.max_columns', None, 'display.width', 250):
+        print(summary)
+    print(f'Results written to {args.output}')
+
+def main():
+    '''Parse arguments and run benchmark'''
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--functions', nargs='+', choices=list(FUNCTIONS), default=list(FUNCTIONS),
+        help='Functions to optimize'
+    )
+    parser.add_argument(
+        '--optimizers', nargs='+', default=list(available_optimizers),
+        help='Optimizers to benchmark. Defaults to all available optimizers'
+    )
+    parser.add_argument(
+        '--tolerance', type=float, default=1e-2,
+        help='The target is reached when the best value is within tolerance of the minimum'
+    )
+    parser.add_argument('--budget', type=int, default=500, help='maxfevals for cma')
+    parser.add_argument(
+        '--ax-budget', type=int, default=30, help='max_trials for Ax, which is slow per trial'
+    )
+    parser.add_argument('--repeats', type=int, default=3, help='Repeats of stochastic optimizers')
+    parser.add_argument('--processes', type=int, default=None, help='Number of processes')
+    parser.add_argument(
+        '--output', type=str,
+        default=str(Path(__file__).parent / 'benchmark-results' / 'optimizers.csv'),
+        help='Path to result csv'
+    )
+    parser.add_argument('--verbose', action='store_true', help='Show optimizer output')
+    benchmark_optimizers(parser.parse_args())
+
+if __name__ == '__main__':
+    main()
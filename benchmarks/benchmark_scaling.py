@@ -0,0 +1,189 @@
+'''Measure how evaluation throughput scales with the number of processes and the scratch location.
+
+A fixed batch of evaluations is run through a process pool, the same way the optimizers do, for
+each number of processes and each data_dir location. By default Daisy is replaced by stub_daisy.py
+(see benchmark_throughput.py). To measure a real setup, call `run_scaling` with your own
+DaisyOptimizationProblem.
+
+For each configuration the time is split into
+  pool_startup      Starting the worker processes
+  wall              Running the batch, after the pool is started
+  log               Time the optimizer process spends writing results (CsvLog fsyncs every row)
+and the mean per evaluation phases (setup and teardown are temporary directory I/O).
+
+Speedup and efficiency are relative to one process at the same location. The number of processes
+where efficiency first drops below --efficiency-threshold is reported as the point where scaling
+flattens.
+'''
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from benchmark_throughput import make_problem # pylint: disable=import-error
+from daisypy.optim import DefaultLogger
+from daisypy.optim.problem import ScalarProblemWrapper
+from daisypy.optim.timing import TimingSummary
+
+PHASES = ['setup', 'render', 'simulate', 'objective', 'teardown', 'total']
+
+def _noop(_):
+    return os.getpid()
+
+def default_locations():
+    '''Local disk and, if available, tmpfs'''
+    locations = { 'local' : tempfile.gettempdir() }
+    if os.path.isdir('/dev/shm'):
+        locations['tmpfs'] = '/dev/shm'
+    return locations
+
+def default_process_counts():
+    '''Powers of two up to, and including, the number of cores'''
+    cpu_count = os.cpu_count()
+    counts = [2**i for i in range(int(np.log2(cpu_count)) + 1)]
+    if counts[-1] != cpu_count:
+        counts.append(cpu_count)
+    return counts
+
+def run_batch(problem, parameter_sets, processes, log_dir):
+    '''Evaluate parameter sets in a process pool and log the results
+
+    Returns
+    -------
+    dict
+      Times in seconds
+    '''
+    # pylint: disable=too-many-locals
+    wrapped = ScalarProblemWrapper(problem, return_timings=True)
+    summary = TimingSummary()
+    log_seconds = 0
+    with DefaultLogger(log_dir) as logger, ProcessPoolExecutor(processes) as executor:
+        start = time.perf_counter()
+        # Make sure all workers are started
+        list(executor.map(_noop, range(processes)))
+        pool_startup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for params, (fval, timings) in zip(parameter_sets, executor.map(wrapped, parameter_sets)):
+            summary.add(timings)
+            log_start = time.perf_counter()
+            logger.result(
+                metric=fval, **{ f'param_{p.name}' : v for p, v in zip(problem.parameters, params)}
+            )
+            log_seconds += time.perf_counter() - log_start
+        wall = time.perf_counter() - start
+
+    result = {
+        'pool_startup' : pool_startup,
+        'wall' : wall,
+        'log' : log_seconds,
+        'evaluations_per_second' : len(parameter_sets) / wall,
+    }
+    for phase, stats in summary.summary().items():
+        if phase in PHASES:
+            result[f'{phase}_mean'] = stats['mean']
+    return result
+
+def run_scaling(problem, parameter_sets, process_counts, locations):
+    '''Run the batch for all process counts and locations
+
+    Parameters
+    ----------
+    problem : DaisyOptimizationProblem
+      Its data_dir is replaced by each location in turn
+
+    parameter_sets : list of list of float
+
+    process_counts : list of int
+
+    locations : dict of (str, str)
+      Map from location name to directory
+
+    Returns
+    -------
+    pandas.DataFrame
+    '''
+    results = []
+    for location, path in locations.items():
+        with tempfile.TemporaryDirectory(dir=path) as scratch:
+            problem.data_dir = os.path.join(scratch, 'data')
+            os.makedirs(problem.data_dir)
+            for processes in process_counts:
+                print(f'Start {location} with {processes} processes', flush=True)
+                result = run_batch(
+                    problem, parameter_sets, processes, os.path.join(scratch, f'logs-{processes}')
+                )
+                results.append({ 'location' : location, 'processes' : processes, **result })
+    results = pd.DataFrame(results)
+    serial = results[results['processes'] == 1].set_index('location')['wall']
+    results['speedup'] = results['location'].map(serial) / results['wall']
+    results['efficiency'] = results['speedup'] / results['processes']
+    return results
+
+def flattening_points(results, threshold):
+    '''Smallest number of processes per location where efficiency is below threshold'''
+    below = results[results['efficiency'] < threshold]
+    return below.groupby('location')['processes'].min()
+
+def main():
+    '''Parse arguments and run benchmark with the stub Daisy'''
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--processes', nargs='+', type=int, default=None,
+        help='Number of processes. Defaults to powers of two up to the number of cores'
+    )
+    parser.add_argument(
+        '--data-dir', nargs='+', type=str, default=[],
+        help='Extra scratch locations to measure, e.g. on a network file system'
+    )
+    parser.add_argument('--evaluations', type=int, default=64, help='Evaluations per batch')
+    parser.add_argument(
+        '--sleep', type=float, default=0.5, help='Seconds the stub Daisy sleeps per simulation'
+    )
+    parser.add_argument('--rows', type=int, default=8760, help='Number of rows in dlf')
+    parser.add_argument('--columns', type=int, default=5, help='Number of value columns in dlf')
+    parser.add_argument(
+        '--efficiency-threshold', type=float, default=0.8,
+        help='Scaling is considered flat when efficiency drops below this'
+    )
+    parser.add_argument(
+        '--output', type=str,
+        default=str(Path(__file__).parent / 'benchmark-results' / 'scaling.csv'),
+        help='Path to result csv'
+    )
+    args = parser.parse_args()
+
+    process_counts = args.processes if args.processes is not None else default_process_counts()
+    if 1 not in process_counts:
+        process_counts = [1] + process_counts
+    locations = default_locations()
+    for path in args.data_dir:
+        locations[path] = path
+
+    os.environ['DAISY_STUB_SLEEP'] = str(args.sleep)
+    rng = np.random.default_rng(1)
+    parameter_sets = rng.uniform(-1, 1, size=(args.evaluations, 2)).tolist()
+    with tempfile.TemporaryDirectory() as work_dir:
+        problem = make_problem(work_dir, args.rows, args.columns)
+        results = run_scaling(problem, parameter_sets, process_counts, locations)
+
+    results['cpu_count'] = os.cpu_count()
+    results['sleep'] = args.sleep
+    os.makedirs(Path(args.output).parent, exist_ok=True)
+    results.to_csv(args.output, index=False)
+    with pd.option_context('display.max_columns', None, 'display.width', 250):
+        print(results)
+    flat = flattening_points(results, args.efficiency_threshold)
+    for location in results['location'].unique():
+        if location in flat:
+            print(f'{location}: efficiency below {args.efficiency_threshold} from '
+                  f'{flat[location]} processes')
+        else:
+            print(f'{location}: efficiency above {args.efficiency_threshold} for all counts')
+    print(f'Results written to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+'''End-to-end throughput benchmark of the optimizers with a stub Daisy binary.
+
+Each configuration (optimizer, number of processes, log size) is run in a fresh Python process, so
+peak memory and imports are measured per configuration. Daisy is replaced by stub_daisy.py, which
+sleeps for a fixed time and writes a synthetic dlf. Everything else (file generation, process pool,
+dlf reading, loss computation, logging and the optimizer itself) is the real code.
+
+Results are written to a csv file with one row per configuration. Pass a previous result file with
+--baseline to compare against it.
+
+Pass --pinning none core numa to compare unpinned throughput with Daisy pinned to a core or a NUMA
+node per worker. The speedup of each pinning over no pinning is printed.
+'''
+import argparse
+import itertools
+import json
+import os
+import platform
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+from generate_time_series import generate_time_series, write_dlf # pylint: disable=import-error
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+DAI_TEMPLATE = '(benchmark_offset {p0} {p1})\n(run benchmark)\n'
+LOG_NAME = 'benchmark'
+
+def make_stub_daisy(work_dir):
+    '''Write an executable that forwards its arguments to stub_daisy.py'''
+    stub = Path(__file__).parent / 'stub_daisy.py'
+    launcher = Path(work_dir) / 'daisy'
+    launcher.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{stub}" "$@"\n', encoding='utf-8')
+    launcher.chmod(launcher.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return str(launcher)
+
+def make_stub_data(work_dir, rows, columns):
+    '''Generate the dlf written by the stub and the target used by the objective
+
+    Returns
+    -------
+    (Path, pandas.DataFrame)
+      Path to dlf and target with columns 'time' and 'c0'
+    '''
+    start = pd.Timestamp('2000-01-01')
+    end = start + pd.Timedelta(hours=rows - 1)
+    df = generate_time_series(start, end, rows, [f'c{i}' for i in range(columns)])
+    dlf_path = Path(work_dir) / f'{LOG_NAME}.dlf'
+    write_dlf(df, dlf_path, LOG_NAME)
+    return dlf_path, df[['time', 'c0']]
+
+def make_problem(work_dir, rows, columns, launcher='subprocess'):
+    '''Setup a DaisyOptimizationProblem that runs the stub Daisy'''
+    # pylint: disable=import-outside-toplevel
+    from daisypy.optim import (
+        ContinuousParameter,
+        DaiFileGenerator,
+        DaisyOptimizationProblem,
+        DaisyRunner,
+        DlfDataExtractor,
+        ScalarObjective,
+        mse,
+    )
+    dlf_path, target = make_stub_data(work_dir, rows, columns)
+    os.environ['DAISY_STUB_DLF'] = str(dlf_path)
+    objective = ScalarObjective(
+        'benchmark', DlfDataExtractor({dlf_path.name : 'c0'}), target, 'c0', mse
+    )
+    parameters = [
+        ContinuousParameter('p0', 0.5, (-1, 1)),
+        ContinuousParameter('p1', 0.5, (-1, 1)),
+    ]
+    return DaisyOptimizationProblem(
+        DaisyRunner(make_stub_daisy(work_dir), launcher=launcher),
+        DaiFileGenerator(template_text=DAI_TEMPLATE),
+        objective,
+        parameters,
+        Path(work_dir) / 'data'
+    )
+
+def make_optimizer(name, problem, logger, processes, evaluations, executor='process'):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    '''Setup an optimizer that does approximately `evaluations` evaluations'''
+    # pylint: disable=import-outside-toplevel
+    from daisypy.optim import available_optimizers
+    optimizer_class = available_optimizers[name]
+    if name == 'sequential':
+        # With two parameters of n values we do 1 + 2(n-1) + (n-1) evaluations
+        num_samples = max(2, round((evaluations - 1) / 3) + 1)
+        options = { 'num_samples' : num_samples }
+    elif name == 'cma':
+        options = { 'maxfevals' : evaluations, 'verbose' : -9, 'seed' : 1 }
+    elif name == 'ax':
+        options = { 'max_trials' : evaluations, 'max_trials_iteration' : processes }
+    elif name == 'halving':
+        # The stub dai file has no stop time to shorten, so all candidates run the full horizon
+        options = { 'horizons' : [None], 'num_candidates' : evaluations, 'seed' : 1 }
+    else:
+        raise ValueError(f'Unknown optimizer {name}')
+    return optimizer_class(
+        problem, logger, options, number_of_processes=processes, executor=executor
+    )
+
+def run_configuration(config):
+    '''Run a single configuration in the current process and measure it
+
+    Parameters
+    ----------
+    config : dict
+      Must contain 'optimizer', 'processes', 'rows', 'columns', 'sleep' and 'evaluations'
+
+    Returns
+    -------
+    dict
+      Measurements. Times are in seconds and memory in MiB
+    '''
+    # pylint: disable=import-outside-toplevel,too-many-locals
+    from daisypy.optim import DefaultLogger, create_executor, version
+    os.environ['DAISY_STUB_SLEEP'] = str(config['sleep'])
+    executor = config.get('executor', 'process')
+    pinning = config.get('pinning', 'none')
+    if pinning != 'none':
+        executor = create_executor(executor, config['processes'], pinning=pinning)
+    with tempfile.TemporaryDirectory() as work_dir:
+        problem = make_problem(
+            work_dir, config['rows'], config['columns'], config.get('launcher', 'subprocess')
+        )
+        with DefaultLogger(Path(work_dir) / 'logs') as logger:
+            optimizer = make_optimizer(
+                config['optimizer'], problem, logger, config['processes'], config['evaluations'],
+                executor
+            )
+            start = time.perf_counter()
+            optimizer.optimize()
+            wall = time.perf_counter() - start
+        if pinning != 'none':
+            executor.shutdown()
+        dlf_size = os.path.getsize(Path(work_dir) / f'{LOG_NAME}.dlf')
+
+    summary = optimizer.timing_summary.summary()
+    evaluations = summary['total']['count']
+    eval_mean = summary['total']['mean']
+    simulate_mean = summary['simulate']['mean']
+    result = {
+        **config,
+        'dlf_mib' : dlf_size / 2**20,
+        'n_evaluations' : evaluations,
+        'wall' : wall,
+        'evaluations_per_second' : evaluations / wall,
+        'eval_mean' : eval_mean,
+        'simulate_mean' : simulate_mean,
+        # Time spent in Python in the worker: rendering, reading dlf, loss, temporary directories
+        'python_overhead_per_eval' : eval_mean - simulate_mean,
+        # Worker time not spent evaluating: pool startup, waiting for the optimizer, pickling
+        'idle_per_eval' : wall * config['processes'] / evaluations - eval_mean,
+        'version' : version,
+    }
+    for phase in ('render', 'objective', 'objective/dlf_read', 'objective/loss'):
+        if phase in summary:
+            result[f'{phase}_mean'] = summary[phase]['mean']
+    if resource is not None:
+        # ru_maxrss is in KiB on Linux
+        result['peak_rss_mib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        result['peak_child_rss_mib'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return result
+
+def benchmark_throughput(options):
+    '''Run all configurations in separate processes and write results'''
+    configs = [
+        {
+            'optimizer' : optimizer,
+            'processes' : processes,
+            'rows' : rows,
+            'columns' : options.columns,
+            'sleep' : options.sleep,
+            'evaluations' : options.evaluations,
+            'launcher' : launcher,
+            'executor' : executor,
+            'pinning' : pinning,
+        }
+        for optimizer, processes, rows, launcher, executor, pinning in itertools.product(
+            options.optimizers, options.processes, options.rows, options.launchers,
+            options.executors, options.pinning
+        )
+    ]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result_path = Path(tmp_dir) / 'result.json'
+        for config in configs:
+            print(f'Start {config}', flush=True)
+            subprocess.run(
+                [sys.executable, __file__, '--single', json.dumps(config), '--result-file',
+                 str(result_path)],
+                check=True,
+                stdout=None if options.verbose else subprocess.DEVNULL,
+                cwd=Path(__file__).parent
+            )
+            results.append(json.loads(result_path.read_text(encoding='utf-8')))
+
+    results = pd.DataFrame(results)
+    results['python'] = platform.python_version()
+    results['cpu_count'] = os.cpu_count()
+    results['date'] = datetime.now().isoformat(timespec='seconds')
+    os.makedirs(Path(options.output).parent, exist_ok=True)
+    results.to_csv(options.output, index=False)
+    print(results[[
+        'optimizer', 'processes', 'rows', 'launcher', 'executor', 'pinning', 'n_evaluations',
+        'evaluations_per_second', 'python_overhead_per_eval', 'idle_per_eval', 'peak_rss_mib',
+        'peak_child_rss_mib'
+    ]].to_string(index=False))
+    print(f'Results written to {options.output}')
+    if len(options.pinning) > 1 and 'none' in options.pinning:
+        print(pinning_speedup(results).to_string())
+    if options.baseline is not None:
+        compare(results, pd.read_csv(options.baseline), options.tolerance)
+
+def pinning_speedup(results):
+    '''Throughput of each pinning relative to no pinning, for each configuration'''
+    keys = ['optimizer', 'processes', 'rows', 'launcher', 'executor']
+    throughput = results.pivot_table(
+        index=keys, columns='pinning', values='evaluations_per_second'
+    )
+    return throughput.drop(columns='none').div(throughput['none'], axis=0)
+
+def compare(results, baseline, tolerance):
+    '''Print configurations where throughput or overhead is worse than in the baseline'''
+    keys = [
+        'optimizer', 'processes', 'rows', 'columns', 'sleep', 'evaluations', 'launcher', 'executor',
+        'pinning'
+    ]
+    # Results from before launchers, executors and pinning were benchmarked
+    if 'launcher' not in baseline.columns:
+        baseline['launcher'] = 'subprocess'
+    if 'executor' not in baseline.columns:
+        baseline['executor'] = 'process'
+    if 'pinning' not in baseline.columns:
+        baseline['pinning'] = 'none'
+    merged = pd.merge(results, baseline, on=keys, suffixes=('', '_baseline'))
+    merged['throughput_ratio'] = (
+        merged['evaluations_per_second'] / merged['evaluations_per_second_baseline']
+    )
+    merged['overhead_ratio'] = (
+        merged['python_overhead_per_eval'] / merged['python_overhead_per_eval_baseline']
+    )
+    columns = keys[:3] + ['launcher', 'executor', 'pinning', 'throughput_ratio', 'overhead_ratio']
+    print(merged[columns].to_string(index=False))
+    regressions = merged[
+        (merged['throughput_ratio'] < 1 - tolerance) | (merged['overhead_ratio'] > 1 + tolerance)
+    ]
+    if len(regressions) > 0:
+        print(f'{len(regressions)} configurations regressed by more than {100*tolerance:.0f}%')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--optimizers', nargs='+', default=None,
+        help='Optimizers to benchmark. Defaults to all available optimizers'
+    )
+    parser.add_argument(
+        '--processes', nargs='+', type=int, default=[1, 2, 4], help='Number of processes'
+    )
+    parser.add_argument(
+        '--rows', nargs='+', type=int, default=[1000, 100000], help='Number of rows in dlf'
+    )
+    parser.add_argument('--columns', type=int, default=5, help='Number of value columns in dlf')
+    parser.add_argument(
+        '--launchers', nargs='+', default=['subprocess'],
+        help="How DaisyRunner launches the stub: 'subprocess', 'posix_spawn' and/or 'helper'"
+    )
+    parser.add_argument(
+        '--executors', nargs='+', default=['process'],
+        help="How optimizers evaluate in parallel: 'process' and/or 'thread'"
+    )
+    parser.add_argument(
+        '--pinning', nargs='+', default=['none'],
+        help="Pin Daisy per worker: 'none', 'core' and/or 'numa'"
+    )
+    parser.add_argument(
+        '--sleep', type=float, default=0.05, help='Seconds the stub Daisy sleeps per simulation'
+    )
+    parser.add_argument(
+        '--evaluations', type=int, default=24, help='Approximate number of evaluations per run'
+    )
+    parser.add_argument(
+        '--output', type=str,
+        default=str(Path(__file__).parent / 'benchmark-results' / 'throughput.csv'),
+        help='Path to result csv'
+    )
+    parser.add_argument(
+        '--baseline', type=str, default=None, help='Path to result csv to compare against'
+    )
+    parser.add_argument(
+        '--tolerance', type=float, default=0.1,
+        help='Relative change from baseline that is reported as a regression'
+    )
+    parser.add_argument('--verbose', action='store_true', help='Show optimizer output')
+    parser.add_argument('--single', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.single is not None:
+        # Run a single configuration. Used internally to isolate configurations
+        with open(args.result_file, 'w', encoding='utf-8') as outfile:
+            json.dump(run_configuration(json.loads(args.single)), outfile)
+    else:
+        if args.optimizers is None:
+            # pylint: disable-next=ungrouped-imports
+            from daisypy.optim.optimizer import available_optimizers as all_optimizers
+            args.optimizers = list(all_optimizers)
+        benchmark_throughput(args)
@@ -23,3 +23,40 @@ def generate_time_series(start_date, end_date, steps, columns):
             # Increasing
             data[col] = np.linspace(0, 4, steps) + rng.normal(size=steps)
     return pd.DataFrame(data)
+
+def write_dlf(df, path, log_name='benchmark'):
+    '''
+    Write a time series generated by `generate_time_series` as a Daisy log file (dlf) with one
+    column per value column of `df`
+    '''
+    columns = [col for col in df.columns if col != 'time']
+    body = pd.DataFrame({
+        'year' : df['time'].dt.year,
+        'month' : df['time'].dt.month,
+        'mday' : df['time'].dt.day,
+        'hour' : df['time'].dt.hour,
+    })
+    for col in columns:
+        body[col] = df[col]
+    with open(path, 'w', encoding='utf-8', newline='\n') as outfile:
+        outfile.write(f'dlf-0.0 -- {log_name}\n\n')
+        outfile.write('VERSION: 7.1.3\n')
+        outfile.write(f'LOGFILE: {log_name}.dlf\n\n')
+        outfile.write('--------------------\n')
+        outfile.write('\t'.join(body.columns) + '\n')
+        outfile.write('\t'.join(['', '', '', ''] + ['mm'] * len(columns)) + '\n')
+        body.to_csv(outfile, sep='\t', header=False, index=False)
+
+def generate_dlf(path, years, columns, start_date='2000-01-01', log_name='benchmark'):
+    '''
+    Write a dlf with hourly values over a number of years and the given number of value columns.
+    Columns are named c0, c1, ...
+
+    Returns the generated time series
+    '''
+    start = pd.Timestamp(start_date)
+    end = start + pd.DateOffset(years=years) - pd.Timedelta(hours=1)
+    steps = int((end - start) / pd.Timedelta(hours=1)) + 1
+    df = generate_time_series(start, end, steps, [f'c{i}' for i in range(columns)])
+    write_dlf(df, path, log_name)
+    return df
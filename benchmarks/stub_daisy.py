@@ -0,0 +1,47 @@
+'''Stand-in for the Daisy binary used when benchmarking the orchestration layer.
+
+Called as `stub_daisy.py -q -d <output directory> <dai file>`, like Daisy. It sleeps for
+DAISY_STUB_SLEEP seconds and writes the dlf at DAISY_STUB_DLF to the output directory. The values in
+the first value column are offset by the sum of squares of the numbers in the
+`(benchmark_offset ...)` form of the dai file, so the objective depends on the parameters.
+
+Only the standard library is used, so starting the stub is cheap compared to a real simulation.
+'''
+import argparse
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+def main():
+    '''Parse arguments like Daisy and write the output log'''
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-q', action='store_true')
+    parser.add_argument('-d', dest='output_directory', default='.')
+    parser.add_argument('dai_file')
+    args = parser.parse_args()
+
+    time.sleep(float(os.environ.get('DAISY_STUB_SLEEP', 0)))
+    dai = Path(args.dai_file).read_text(encoding='utf-8')
+    match = re.search(r'\(benchmark_offset([^)]*)\)', dai)
+    offset = sum(float(x)**2 for x in match.group(1).split()) if match is not None else 0.0
+
+    dlf_path = Path(os.environ['DAISY_STUB_DLF'])
+    with open(dlf_path, 'r', encoding='utf-8') as infile, \
+         open(Path(args.output_directory) / dlf_path.name, 'w', encoding='utf-8') as outfile:
+        # Header is everything up to and including the line with column units
+        for line in infile:
+            outfile.write(line)
+            if line.startswith('--------------------'):
+                break
+        outfile.write(next(infile))
+        outfile.write(next(infile))
+        for line in infile:
+            fields = line.rstrip('\n').split('\t')
+            fields[4] = repr(float(fields[4]) + offset)
+            outfile.write('\t'.join(fields) + '\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
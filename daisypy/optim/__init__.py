@@ -1,17 +1,158 @@
-'''Module for Daisy parameter optimization'''
+# pylint: disable=R0801
+'''Module for Daisy parameter optimization
+
+Attributes are imported lazily on first access, so importing daisypy.optim is cheap. In particular,
+matplotlib is only imported when a plotting function is used, and cma and Ax are only imported
+when their optimizers are used.
+'''
+import importlib
+from typing import TYPE_CHECKING
 from daisypy.optim._version import version
-from daisypy.optim.aggregate_fns import *
-from daisypy.optim.file_generators import *
-from daisypy.optim.logging import *
-from daisypy.optim.loss_fns import *
-from daisypy.optim.objective import *
-from daisypy.optim.optimizer import *
-from daisypy.optim.parameter import *
-from daisypy.optim.problem import DaisyOptimizationProblem
-from daisypy.optim.runner import DaisyRunner
-from daisypy.optim.visualize import *
-from daisypy.optim.dlf_data_extraction import (
-    DlfDataExtractor,
-    DlfPostProcessor,
-    DlfSum
-)
+
+_lazy_modules = {
+    'daisypy.optim.aggregate_fns' : ['available_aggregate_fns', 'mean'],
+    'daisypy.optim.dai_file_generator' : ['DaiFileGenerator'],
+    'daisypy.optim.py_file_generator' : ['PyFileGenerator'],
+    'daisypy.optim.multi_file_generator' : ['MultiFileGenerator'],
+    'daisypy.optim.logging' : ['available_logs', 'DefaultLogger'],
+    'daisypy.optim.logger' : ['Logger'],
+    'daisypy.optim.terminal_log' : ['TerminalLog'],
+    'daisypy.optim.csv_log' : ['CsvLog'],
+    'daisypy.optim.arrow_log' : ['ArrowLog', 'ArrowLogReader', 'read_arrow_log'],
+    'daisypy.optim.loss_fns' : ['available_loss_fns', 'mse', 'mae'],
+    'daisypy.optim.scalar_objective' : ['ScalarObjective'],
+    'daisypy.optim.aggregate_objective' : ['AggregateObjective'],
+    'daisypy.optim.multi_objective' : ['MultiObjective'],
+    'daisypy.optim.optimizer' : ['available_optimizers'],
+    'daisypy.optim.cma_optimizer' : ['DaisyCMAOptimizer'],
+    'daisypy.optim.ax_optimizer' : ['DaisyAxOptimizer', 'AxResult'],
+    'daisypy.optim.sequential_optimizer' : ['DaisySequentialOptimizer'],
+    'daisypy.optim.halving_optimizer' : ['DaisyHalvingOptimizer'],
+    'daisypy.optim.parameter' : ['ContinuousParameter', 'CategoricalParameter'],
+    'daisypy.optim.problem' : ['DaisyOptimizationProblem', 'ObjectiveMap'],
+    'daisypy.optim.runner' : ['DaisyRunner', 'available_launchers'],
+    'daisypy.optim.executor' : [
+        'available_executors', 'create_executor', 'evaluation_executor', 'SerialExecutor'
+    ],
+    'daisypy.optim.history' : [
+        'attach_history', 'distribution_from_history', 'read_distribution', 'read_history'
+    ],
+    'daisypy.optim.orchestrator' : [
+        'AdaptiveExecutor',
+        'BudgetExhausted',
+        'MultiStudyOrchestrator',
+        'SharedPool',
+        'Study',
+        'StudyResult',
+    ],
+    'daisypy.optim.resources' : [
+        'MemoryAwareLimiter', 'available_cpus', 'available_pinnings', 'default_workers',
+        'memory_status',
+    ],
+    'daisypy.optim.runtime' : ['RuntimePredictor', 'map_longest_first'],
+    'daisypy.optim.screening' : [
+        'ScreeningResult', 'available_screening_methods', 'morris_indices', 'screen',
+        'sobol_indices',
+    ],
+    'daisypy.optim.staged_problem' : ['StagedProblem', 'select_scenarios'],
+    'daisypy.optim.parameter_sweep' : ['SweepResult', 'read_sweep', 'sweep'],
+    'daisypy.optim.timing' : ['Timings', 'TimingSummary', 'collect_timings', 'timed_phase'],
+    'daisypy.optim.trace' : ['Tracer'],
+    'daisypy.optim.visualize' : [
+        'plot_convergence',
+        'plot_result',
+        'plot_result_1d',
+        'plot_result_2d',
+        'plot_result_3d',
+        'plot_result_nd',
+        'animate_result',
+        'animate_result_1d',
+        'animate_result_2d',
+        'animate_result_nd',
+        'plot_sweep_heatmap',
+        'plot_sweep_slice',
+    ],
+    'daisypy.optim.dlf_data_extraction' : ['DlfDataExtractor', 'DlfPostProcessor', 'DlfSum'],
+}
+_lazy_attributes = {
+    name : module for module, names in _lazy_modules.items() for name in names
+}
+
+if TYPE_CHECKING:
+    # Let static analysis tools see the lazy attributes
+    from daisypy.optim.aggregate_fns import available_aggregate_fns, mean
+    from daisypy.optim.dai_file_generator import DaiFileGenerator
+    from daisypy.optim.py_file_generator import PyFileGenerator
+    from daisypy.optim.multi_file_generator import MultiFileGenerator
+    from daisypy.optim.logging import available_logs, DefaultLogger
+    from daisypy.optim.logger import Logger
+    from daisypy.optim.terminal_log import TerminalLog
+    from daisypy.optim.csv_log import CsvLog
+    from daisypy.optim.arrow_log import ArrowLog, ArrowLogReader, read_arrow_log
+    from daisypy.optim.loss_fns import available_loss_fns, mse, mae
+    from daisypy.optim.scalar_objective import ScalarObjective
+    from daisypy.optim.aggregate_objective import AggregateObjective
+    from daisypy.optim.multi_objective import MultiObjective
+    from daisypy.optim.optimizer import available_optimizers
+    from daisypy.optim.cma_optimizer import DaisyCMAOptimizer
+    from daisypy.optim.ax_optimizer import DaisyAxOptimizer, AxResult
+    from daisypy.optim.sequential_optimizer import DaisySequentialOptimizer
+    from daisypy.optim.halving_optimizer import DaisyHalvingOptimizer
+    from daisypy.optim.parameter import ContinuousParameter, CategoricalParameter
+    from daisypy.optim.problem import DaisyOptimizationProblem, ObjectiveMap
+    from daisypy.optim.runner import DaisyRunner, available_launchers
+    from daisypy.optim.executor import (
+        available_executors, create_executor, evaluation_executor, SerialExecutor
+    )
+    from daisypy.optim.history import (
+        attach_history, distribution_from_history, read_distribution, read_history
+    )
+    from daisypy.optim.orchestrator import (
+        AdaptiveExecutor,
+        BudgetExhausted,
+        MultiStudyOrchestrator,
+        SharedPool,
+        Study,
+        StudyResult,
+    )
+    from daisypy.optim.resources import (
+        MemoryAwareLimiter, available_cpus, available_pinnings, default_workers, memory_status
+    )
+    from daisypy.optim.runtime import RuntimePredictor, map_longest_first
+    from daisypy.optim.screening import (
+        ScreeningResult, available_screening_methods, morris_indices, screen, sobol_indices
+    )
+    from daisypy.optim.staged_problem import StagedProblem, select_scenarios
+    from daisypy.optim.parameter_sweep import SweepResult, read_sweep, sweep
+    from daisypy.optim.timing import Timings, TimingSummary, collect_timings, timed_phase
+    from daisypy.optim.trace import Tracer
+    from daisypy.optim.visualize import (
+        plot_convergence,
+        plot_result,
+        plot_result_1d,
+        plot_result_2d,
+        plot_result_3d,
+        plot_result_nd,
+        animate_result,
+        animate_result_1d,
+        animate_result_2d,
+        animate_result_nd,
+        plot_sweep_heatmap,
+        plot_sweep_slice,
+    )
+    from daisypy.optim.dlf_data_extraction import DlfDataExtractor, DlfPostProcessor, DlfSum
+
+__all__ = [
+    'version',
+    *_lazy_attributes
+]
+
+def __getattr__(name):
+    if name not in _lazy_attributes:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(_lazy_attributes[name]), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes))
@@ -1,3 +1,4 @@
+import copy
 from collections.abc import Sequence
 from .util import flatten
 from .multi_objective import MultiObjective
@@ -39,6 +40,22 @@ class AggregateObjective(Sequence):
         '''
         return { self.name : self.aggregate_fn(self.multi_objective(daisy_output_directory)) }
 
+    def with_stop(self, stop):
+        '''Copy of this objective where the aggregated objectives only use targets up to and
+        including `stop`
+
+        Parameters
+        ----------
+        stop : str OR datetime.datetime OR pandas.Timestamp
+
+        Returns
+        -------
+        AggregateObjective
+        '''
+        objective = copy.copy(self)
+        objective.multi_objective = self.multi_objective.with_stop(stop)
+        return objective
+
     def __getitem__(self, index):
         # We could consider flattening objective_fns, but not sure that there is a user case
         # If we do, we also need to update __len__
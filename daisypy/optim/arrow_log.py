@@ -0,0 +1,270 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from .log import Log
+
+__all__ = [
+    'ArrowLog',
+    'ArrowLogReader',
+    'read_arrow_log',
+]
+
+class ArrowLog(Log):
+    # pylint: disable=too-many-instance-attributes
+    '''A file backed columnar log using the Arrow IPC streaming format.
+
+    Rows are buffered and appended to the file as record batches (row groups) with typed columns.
+    The streaming format has no footer, so the file can be read while it is being written. See
+    `read_arrow_log` and `ArrowLogReader`.
+    '''
+
+    def __init__(self, path, columns=None, batch_size=100, flush_interval=10, compression=None):
+        '''
+        Parameters
+        ----------
+        path: str
+          Where to store log
+
+        columns : list of string or dict of (str, pyarrow.DataType OR str)
+          Column names and types. If a list or if a type is None, the type is inferred from the
+          first record batch. Numbers are stored as float64, so a column that starts with integers
+          can hold fractions later, and columns that are None in the whole batch are float64. Give
+          the type, e.g. 'int64', to store integers. If None determine columns from first call to
+          self.log. Values that cannot be converted to the type of their column without loss
+          raise ValueError
+
+        batch_size : int > 0
+          Number of rows to buffer before they are written as a record batch
+
+        flush_interval : float OR None
+          If not None, buffered rows are written when more than `flush_interval` seconds have
+          passed since the last write, regardless of `batch_size`. This keeps the log useful for
+          tailing an in-progress run.
+
+        compression : str OR None
+          Compression codec for record batches. One of None, 'lz4' or 'zstd'
+        '''
+        _dir = os.path.dirname(path)
+        os.makedirs(_dir, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_options = pa.ipc.IpcWriteOptions(compression=compression)
+        self._log = open(path, 'wb') # pylint: disable=consider-using-with
+        self._writer = None
+        self._rows = []
+        self._last_write = time.monotonic()
+        self._column_spec = columns
+        self._names = None
+        self.schema = None
+
+    def log(self, *args, flush=False, **kwargs):
+        '''Log a row.
+
+        Parameters
+        ----------
+        flush : Bool
+          If True write all buffered rows and flush the log after writing.
+
+        **kwargs : dict
+          If the log has a column specification, then this dict must contain the columns defined
+          there. Otherwise the dict keys are used to create a column specification.
+        '''
+        if self._log.closed:
+            raise RuntimeError('Writing to closed ArrowLog')
+        if len(args) > 0:
+            raise RuntimeError('ArrowLog requires all log arguments to be passed as keywords')
+        if self._names is None:
+            columns = self._column_spec if self._column_spec is not None else kwargs
+            self._names = list(columns)
+        row = tuple(kwargs[name] for name in self._names)
+        for name, value in zip(self._names, row):
+            dtype = self._column_type(name)
+            if dtype is not None:
+                # Raise before the row is buffered
+                _to_array([value], pa.field(name, dtype))
+        self._rows.append(row)
+        interval_passed = self.flush_interval is not None and \
+            time.monotonic() - self._last_write > self.flush_interval
+        if flush or interval_passed or len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        '''Write buffered rows as a record batch and flush the log so it is written to disk'''
+        if len(self._rows) == 0:
+            return
+        columns = list(zip(*self._rows))
+        # Rows that cannot be written are dropped, so closing the log does not fail again
+        self._rows = []
+        if self.schema is None:
+            self._setup_schema(columns)
+        arrays = [_to_array(values, field) for values, field in zip(columns, self.schema)]
+        self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._last_write = time.monotonic()
+
+    def close(self):
+        '''Write buffered rows and close the underlying file'''
+        if self._log.closed:
+            return
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+        self._log.close()
+
+    def __del__(self):
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _column_type(self, name):
+        # Type of a column if it is known before the first batch is written
+        if self.schema is not None:
+            return self.schema.field(name).type
+        if isinstance(self._column_spec, dict):
+            dtype = self._column_spec[name]
+            return pa.type_for_alias(dtype) if isinstance(dtype, str) else dtype
+        return None
+
+    def _setup_schema(self, columns):
+        fields = []
+        for name, values in zip(self._names, columns):
+            dtype = self._column_type(name)
+            if dtype is None:
+                dtype = _infer_type(values)
+            fields.append(pa.field(name, dtype))
+        self.schema = pa.schema(fields)
+        self._writer = pa.ipc.new_stream(self._log, self.schema, options=self.write_options)
+
+
+class ArrowLogReader:
+    # pylint: disable=too-few-public-methods
+    '''Incremental reader for logs written by ArrowLog.
+
+    Each call to `read_new` returns the rows in all complete record batches written since the
+    previous call. A partially written batch at the end of the file is left for the next call.
+    '''
+    def __init__(self, path, columns=None):
+        '''
+        Parameters
+        ----------
+        path : str
+          Path to log written by ArrowLog
+
+        columns : list of str OR None
+          Columns to read. If None read all columns.
+        '''
+        self.path = path
+        self.columns = columns
+        self._header = None
+        self._offset = 0
+        self._options = None
+        self._schema = None
+
+    def read_new(self):
+        '''Read rows that have been written since the last call
+
+        Returns
+        -------
+        pandas.DataFrame
+        '''
+        with open(self.path, 'rb') as infile:
+            infile.seek(self._offset)
+            data = infile.read()
+        if self._header is None:
+            if not self._read_header(data):
+                return self._empty()
+            data = data[len(self._header):]
+            self._offset = len(self._header)
+        if len(data) == 0:
+            return self._empty()
+        source = pa.BufferReader(pa.py_buffer(self._header + data))
+        reader = pa.ipc.open_stream(source, options=self._options)
+        batches = []
+        consumed = len(self._header)
+        while True:
+            try:
+                batches.append(reader.read_next_batch())
+            except StopIteration:
+                break
+            except (pa.ArrowInvalid, OSError):
+                # The last batch is still being written
+                break
+            consumed = source.tell()
+        self._offset += consumed - len(self._header)
+        if len(batches) == 0:
+            return self._empty()
+        return pa.Table.from_batches(batches, schema=reader.schema).to_pandas()
+
+    def _read_header(self, data):
+        source = pa.BufferReader(pa.py_buffer(data))
+        try:
+            schema = pa.ipc.open_stream(source).schema
+        except (pa.ArrowInvalid, OSError):
+            # Nothing has been logged yet
+            return False
+        self._header = data[:source.tell()]
+        if self.columns is not None:
+            missing = [col for col in self.columns if col not in schema.names]
+            if len(missing) > 0:
+                raise ValueError(f'Columns {missing} not in log. Got columns {schema.names}')
+            included = [schema.get_field_index(col) for col in self.columns]
+            self._options = pa.ipc.IpcReadOptions(included_fields=sorted(included))
+        self._schema = schema
+        return True
+
+    def _empty(self):
+        if self.columns is not None:
+            return pd.DataFrame(columns=self.columns)
+        if self._schema is not None:
+            return self._schema.empty_table().to_pandas()
+        return pd.DataFrame()
+
+
+def read_arrow_log(path, columns=None):
+    '''Read a log written by ArrowLog. The log can be read while it is being written, in which case
+    all complete record batches are returned.
+
+    Parameters
+    ----------
+    path : str
+      Path to log
+
+    columns : list of str OR None
+      Columns to read. If None read all columns. Only the requested columns are deserialized.
+
+    Returns
+    -------
+    pandas.DataFrame
+    '''
+    df = ArrowLogReader(path, columns).read_new()
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+def _infer_type(values):
+    # Type of the first value that is not None
+    value = next((value for value in values if value is not None), None)
+    # bool is a subclass of int, so it must be checked first
+    if isinstance(value, (bool, np.bool_)):
+        return pa.bool_()
+    if value is None or isinstance(value, (int, float, np.integer, np.floating)):
+        return pa.float64()
+    return pa.string()
+
+def _to_array(values, field):
+    # pa.array(values, type=...) silently truncates floats to integers, so let pyarrow infer the
+    # type and do a safe cast
+    try:
+        return pa.array(values).cast(field.type, safe=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise ValueError(
+            f'Cannot store values of column {field.name!r} as {field.type}: {e}'
+        ) from e
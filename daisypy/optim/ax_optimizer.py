@@ -1,10 +1,16 @@
 # pylint: disable=R0801
-import multiprocessing
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
+from time import perf_counter
 from ax.api.client import Client
 from .ax import daisy_param_to_ax_param
+from .executor import SerialExecutor, evaluation_executor, executor_max_workers
+from .history import attach_history
 from .multi_objective import MultiObjective
+from .resources import available_cpus
+from .runtime import RuntimePredictor, longest_first, observe_result
+from .timing import Timings, TimingSummary, fidelity_column, is_estimate
+from .trace import Tracer
 
 @dataclass
 class AxResult:
@@ -13,28 +19,59 @@ class AxResult:
     metrics : dict
 
 class DaisyAxOptimizer:
-    # pylint: disable=too-few-public-methods,too-many-locals
+    # pylint: disable=too-few-public-methods,too-many-locals,too-many-instance-attributes
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
     """Daisy optimizer using Ax. Can do scalar and multi objective optimization"""
-    def __init__(self, problem, logger, options=None, number_of_processes=None):
+    def __init__(
+            self, problem, logger, options=None, number_of_processes=None, tracer=None,
+            executor='process', history=None
+    ):
         """
         Parameters
         ----------
         problem : DaisyProblem
 
         options : dict
+          'max_trials' : Total number of trials. Default 10
+          'max_trials_iteration' : Maximum number of trials evaluated at the same time. Defaults
+                                   to the number of workers of the executor
+          'order_by_runtime' : If True submit new trials with the longest predicted runtime first.
+                               See `longest_first`. Default True
+          'background_generation' : If True generate new trials in a background thread while
+                                    trials are evaluated. Default True
+
+        tracer : Tracer (Optional)
+          If not None record a timeline of evaluations and optimizer activity
+
+        executor : str OR concurrent.futures.Executor (Optional)
+          'process' to evaluate in a process pool, 'thread' to evaluate in a thread pool or 'serial'
+          to evaluate one at a time in this thread. An Executor is used as is and is not shut down,
+          so it can be shared between optimizers. See `evaluation_executor`
+
+        history : pandas.DataFrame (Optional)
+          Evaluations from earlier runs, as returned by `read_history`. They are added as completed
+          trials before optimizing, and do not count towards 'max_trials'
         """
         self.problem = problem
         self.logger = logger
         if number_of_processes is None:
-            self.number_of_processes = multiprocessing.cpu_count()
+            self.number_of_processes = available_cpus()
         else:
             self.number_of_processes = number_of_processes
+        self.executor = executor
 
         if options is None:
             options = {}
         options.setdefault('max_trials', 10)
-        options.setdefault('max_trials_iteration', 3)
+        options.setdefault(
+            'max_trials_iteration', executor_max_workers(executor, self.number_of_processes)
+        )
+        options.setdefault('order_by_runtime', True)
+        options.setdefault('background_generation', True)
         self.options = options
+        self.runtime_predictor = RuntimePredictor()
+        self.completed = [] # (trial index, result) not yet passed to Ax
+        self.generation_log = []
 
         ax_parameters = [ daisy_param_to_ax_param(p) for p in self.problem.parameters ]
 
@@ -44,51 +81,102 @@ class DaisyAxOptimizer:
         # TODO: Assumes we minimize
         self.multi_objective = isinstance(problem.objective_fn, MultiObjective)
         if self.multi_objective:
-            objective_str = ','.join([f'-{f.name}' for f in problem.objective_fn.objective_fns])
+            metrics = [f.name for f in problem.objective_fn.objective_fns]
         else:
-            objective_str = f'-{problem.objective_fn.name}'
+            metrics = [problem.objective_fn.name]
+        objective_str = ','.join([f'-{name}' for name in metrics])
         self.client.configure_optimization(objective=objective_str)
+        if history is not None:
+            attach_history(self.client, history, self.problem.parameters, metrics)
+            logger.info(f'Attached {len(history)} trials from history')
+        self.timing_summary = TimingSummary()
+        self.tracer = tracer if tracer is not None else Tracer(enabled=False)
 
 
     def optimize(self):
         '''Run the optimizer and return the result. The result is a single AxResult when doing
         scalar optimization and a list of AxResult when doing multi optimization
 
+        Trials are streamed. Up to `max_trials_iteration` trials are evaluated at the same time,
+        and new trials are started as soon as others finish. With 'background_generation', new
+        trials are generated in a background thread while trials are evaluated, so that fitting
+        the model does not leave workers idle. Results that arrive while trials are generated are
+        passed to Ax when generation is done. Trials that are not completed are pending in Ax,
+        which takes them into account when generating new trials.
+
         Returns
         -------
         AxResult OR list of AxResult
         '''
+        # pylint: disable=too-many-branches
         # TODO: Log parameter distributions
-        num_trials = 0
         max_trials = self.options['max_trials']
         max_trials_iteration = self.options['max_trials_iteration']
-        with ProcessPoolExecutor(self.number_of_processes) as executor:
-            while num_trials < self.options['max_trials']:
-                max_trials_this_iteration = min(max_trials_iteration, max_trials - num_trials)
-                trials = self.client.get_next_trials(max_trials=max_trials_this_iteration)
-                trial_indices = []
-                parameter_sets = []
-                named_parameter_sets = []
-                for trial_index, sampled_parameters in trials.items():
-                    trial_indices.append(trial_index)
-                    named_params = {
-                        p.name : sampled_parameters[p.name] for p in self.problem.parameters
-                    }
-                    named_parameter_sets.append(named_params)
-                    params = [sampled_parameters[p.name] for p in self.problem.parameters]
-                    parameter_sets.append(params)
-
-                # Run simulations in parallel
-                for i, result in enumerate(executor.map(self.problem, parameter_sets)):
-                    log = { 'trial' : trial_indices[i] }
-                    for name, value in named_parameter_sets[i].items():
-                        log[f'param_{name}'] = value
-                    for name, value in result.items():
-                        log[f'metric_{name}'] = value
-                    self.logger.result(**log)
-                    self.client.complete_trial(trial_index=trial_indices[i], raw_data=result)
-                num_trials += len(trials)
+        num_requested = 0
+        pending = {}      # Future -> (trial index, parameter values)
+        ready = []        # (trial index, parameter values) generated, but not submitted
+        self.completed = [] # (trial index, result) not yet passed to Ax
+        generation = None # Future of (trials, seconds)
+        num_asked = 0     # Number of trials asked for in generation
+        wait_for_data = False # Ax gave fewer trials than asked for, wait for more results
+        if self.options['background_generation']:
+            generator = ThreadPoolExecutor(1)
+        else:
+            generator = SerialExecutor()
+        with generator, evaluation_executor(self.executor, self.number_of_processes) as executor:
+            while True:
+                if generation is not None and generation.done():
+                    trials, seconds = generation.result()
+                    generation = None
+                    num_requested -= num_asked - len(trials)
+                    wait_for_data = len(trials) < num_asked
+                    self._log_generation(
+                        len(trials), seconds, max_trials_iteration - len(pending) - len(ready)
+                    )
+                    ready += trials
+                if generation is None:
+                    # The client is not used by a generation, so results can be passed to Ax
+                    if len(self.completed) > 0:
+                        wait_for_data = False
+                    self.completed = self._complete_trials(self.completed)
+                    # Enough trials for the free workers. When all workers are busy, generate one
+                    # trial ahead, so it is ready when a worker becomes free
+                    free_workers = max_trials_iteration - len(pending) - len(ready)
+                    num_asked = 0 if wait_for_data else min(
+                        max_trials - num_requested, max(free_workers, 1 - len(ready))
+                    )
+                    if num_asked > 0:
+                        num_requested += num_asked
+                        generation = generator.submit(self._generate, num_asked)
+                        if generation.done():
+                            continue
+                ready = self._submit(executor, ready, max_trials_iteration - len(pending), pending)
+                if len(pending) == 0 and generation is None:
+                    break # Done, or Ax has no more trials to give
+                waiting = set(pending) if generation is None else { generation, *pending }
+                done, _ = wait(waiting, return_when=FIRST_COMPLETED)
+                done = [future for future in done if future in pending]
+                for future in sorted(done, key=lambda future: pending[future][0]):
+                    trial_index, params = pending.pop(future)
+                    result = future.result()
+                    self._log_result(trial_index, params, result)
+                    self.completed.append((trial_index, result))
+        self.timing_summary.log(self.logger)
+        self.tracer.log_utilization(
+            self.logger, executor_max_workers(self.executor, self.number_of_processes)
+        )
+        return self.partial_result()
+
+    def partial_result(self):
+        '''The best result of the trials completed so far, in the same format as `optimize`.
+        Returns None if no trial has been completed.
 
+        Must not be called while `optimize` is running.
+        '''
+        self.completed = self._complete_trials(self.completed)
+        summary = self.client.summarize()
+        if len(summary) == 0 or not (summary['trial_status'] == 'COMPLETED').any():
+            return None
         if self.multi_objective:
             # Handle multi objective result
             result = [
@@ -100,3 +188,66 @@ class DaisyAxOptimizer:
             parameters, metrics, _, _ = self.client.get_best_parameterization()
             result = AxResult(parameters, metrics)
         return result
+
+    def _generate(self, num_trials):
+        # Runs in the background thread
+        with self.tracer.span('get_next_trials', n_trials=num_trials):
+            start = perf_counter()
+            trials = self.client.get_next_trials(max_trials=num_trials)
+            seconds = perf_counter() - start
+        trials = [
+            (trial_index, [sampled_parameters[p.name] for p in self.problem.parameters])
+            for trial_index, sampled_parameters in trials.items()
+        ]
+        return trials, seconds
+
+    def _log_generation(self, num_trials, seconds, idle_workers):
+        # idle_workers is the number of workers without a trial when generation finished. If it is
+        # often positive, generating trials is the bottleneck.
+        self.generation_log.append({
+            'n_trials' : num_trials, 'seconds' : seconds, 'idle_workers' : idle_workers
+        })
+        self.logger.info(
+            generation=len(self.generation_log), n_trials=num_trials, seconds=seconds,
+            idle_workers=idle_workers
+        )
+        timings = Timings()
+        timings.add('get_next_trials', seconds)
+        self.timing_summary.add(timings)
+
+    def _submit(self, executor, ready, num_slots, pending):
+        # Submit up to num_slots ready trials, longest predicted runtime first. Return the trials
+        # that are not submitted
+        order = list(range(len(ready)))
+        if self.options['order_by_runtime']:
+            order = longest_first([params for _, params in ready], self.runtime_predictor)
+        for i in order[:num_slots]:
+            trial_index, params = ready[i]
+            pending[executor.submit(self.problem, params)] = (trial_index, params)
+        return [ready[i] for i in order[num_slots:]]
+
+    def _complete_trials(self, completed):
+        # Pass results to Ax. Return the empty list of results left to pass
+        for trial_index, result in completed:
+            with self.tracer.span('complete_trial', trial=trial_index):
+                if is_estimate(getattr(result, 'timings', None)):
+                    # Ax takes data as exact, so an estimate is not passed. Ax does not use
+                    # abandoned trials when fitting the model, and never returns them as best
+                    self.client.mark_trial_abandoned(trial_index=trial_index)
+                else:
+                    self.client.complete_trial(trial_index=trial_index, raw_data=dict(result))
+        return []
+
+    def _log_result(self, trial_index, params, result):
+        observe_result(self.runtime_predictor, params, result)
+        timings = getattr(result, 'timings', None)
+        self.timing_summary.add(timings)
+        self.tracer.add_evaluation(timings, trial=trial_index)
+        log = { 'trial' : trial_index }
+        for p, value in zip(self.problem.parameters, params):
+            log[f'param_{p.name}'] = value
+        for name, value in result.items():
+            log[f'metric_{name}'] = value
+        log.update(fidelity_column(timings))
+        with self.tracer.span('log', trial=trial_index):
+            self.logger.result(**log)
@@ -1,13 +1,16 @@
 # pylint: disable=R0801
-import multiprocessing
 import warnings
 import numpy as np
 import cma
 from cma.fitness_transformations import ScaleCoordinates
-from cma.optimization_tools import EvalParallel2
+from .executor import evaluation_executor, executor_max_workers
 from .problem import ScalarProblemWrapper
+from .resources import available_cpus
+from .timing import TimingSummary, fidelity_column, is_estimate
+from .trace import Tracer
 
 class DaisyCMAOptimizer:
+    # pylint: disable=too-many-instance-attributes,too-many-arguments,too-many-positional-arguments
     """Daisy optimizer using the CMA-ES method from https://github.com/CMA-ES/pycma
 
      There are many options for cma. The most important for new users is `maxfevals`, which
@@ -20,8 +23,13 @@ class DaisyCMAOptimizer:
      A simple estimate of the time it will take to compute N evaluations can be found in this way
        time_to_run_once = <time to run one simulation with Daisy>
        total_run_time = time_to_run_once * maxfevals / number_of_compute_cores
+     This assumes perfect scaling. benchmarks/benchmark_scaling.py measures the actual speedup for
+     a given number of processes and scratch location.
     """
-    def __init__(self, problem, logger, cma_options=None, number_of_processes=None):
+    def __init__(
+            self, problem, logger, cma_options=None, number_of_processes=None, tracer=None,
+            executor='process', initial_distribution=None
+    ):
         """
         Parameters
         ----------
@@ -29,13 +37,27 @@ class DaisyCMAOptimizer:
 
         cma_options : dict
           Options to pass on to cma. See cma.CMAOptions for details
+
+        tracer : Tracer (Optional)
+          If not None record a timeline of evaluations and optimizer activity
+
+        executor : str OR concurrent.futures.Executor (Optional)
+          'process' to evaluate in a process pool, 'thread' to evaluate in a thread pool or 'serial'
+          to evaluate one at a time in this thread. An Executor is used as is and is not shut down,
+          so it can be shared between optimizers. See `evaluation_executor`
+
+        initial_distribution : (array_like, array_like) (Optional)
+          Mean and standard deviation of each parameter to start from, instead of the initial
+          values and a third of the valid ranges. Means are clipped to the valid ranges. See
+          `distribution_from_history` and `read_distribution` for starting from earlier runs
         """
         self.problem = problem
         self.logger = logger
         if number_of_processes is None:
-            self.number_of_processes = multiprocessing.cpu_count()
+            self.number_of_processes = available_cpus()
         else:
             self.number_of_processes = number_of_processes
+        self.executor = executor
         lower = []
         upper = []
         x0 = []
@@ -44,16 +66,31 @@ class DaisyCMAOptimizer:
             upper.append(param.valid_range[1])
             x0.append(param.initial_value)
         self.objective = ScaleCoordinates(
-            ScalarProblemWrapper(problem), lower=lower, upper=upper, from_lower_upper=(-1,1)
+            ScalarProblemWrapper(problem, return_timings=True),
+            lower=lower, upper=upper, from_lower_upper=(-1,1)
         )
-
-        # Map the initial values to optimization domain
-        x0 = self.objective.inverse(x0)
+        self.timing_summary = TimingSummary()
+        self.tracer = tracer if tracer is not None else Tracer(enabled=False)
+        self.best_exact = None  # (x, fval) of the best evaluation that is not an estimate
+        self.num_estimates = 0
 
         # Setup options
         if cma_options is None:
             cma_options = {}
 
+        sigma0 = 1/3
+        if initial_distribution is not None:
+            means, stds = initial_distribution
+            x0 = np.clip(means, lower, upper)
+            # Standard deviations are relative to sigma0 in the optimization domain
+            sigma0 = 1
+            cma_options.setdefault(
+                'CMA_stds', list(np.asarray(stds) / np.array(self.objective.multiplier))
+            )
+
+        # Map the initial values to optimization domain
+        x0 = self.objective.inverse(x0)
+
         if "maxfevals" not in cma_options:
             warnings.warn("Max function evaluations not set, using 10")
             cma_options["maxfevals"] = 10
@@ -63,7 +100,7 @@ class DaisyCMAOptimizer:
                 "'bounds' set in cma_options will be ignored and set to match problem parameters"
             )
         cma_options['bounds'] = [-1, 1]
-        self.optimizer = cma.CMAEvolutionStrategy(x0, 1/3, cma_options)
+        self.optimizer = cma.CMAEvolutionStrategy(x0, sigma0, cma_options)
 
     def optimize(self):
         '''Run the optimizer'''
@@ -71,34 +108,33 @@ class DaisyCMAOptimizer:
         max_attempts_to_get_feasible = 3
         # TODO: Implement logging + checkpointing every n'th step
         total_f_evals = 0
-        with EvalParallel2(self.objective, self.number_of_processes) as eval_all:
+        with evaluation_executor(self.executor, self.number_of_processes) as executor:
             step = 0
             while not self.optimizer.stop():
                 step += 1
                 # Try a couple of times if we dont get at least one non nan value
                 for i in range(max_attempts_to_get_feasible):
-                    xs = self.optimizer.ask()
-                    fvals = np.array(eval_all(xs))
+                    with self.tracer.span('ask', step=step):
+                        xs = self.optimizer.ask()
+                    with self.tracer.span('evaluate', step=step):
+                        results = list(executor.map(self.objective, xs))
+                    fvals = []
+                    fidelities = []
+                    for x, (fval, timings) in zip(xs, results):
+                        fvals.append(fval)
+                        fidelities.append(fidelity_column(timings))
+                        self._update_best_exact(x, fval, timings)
+                        self.timing_summary.add(timings)
+                        self.tracer.add_evaluation(timings, step=step)
+                    fvals = np.array(fvals)
                     total_f_evals += len(fvals)
                     if np.any(np.isfinite(fvals)):
                         break
                     self.logger.warning(
                         step=step,msg=f'All are infeasible at attempt {i}', fvals=fvals
                     )
-                for x, fval in zip(xs, fvals):
-                    raw_params = {
-                        f'param_{p.name}' : value  for p, value in
-                        zip(self.problem.parameters, self.objective.transform(x))
-                    }
-                    standardized_params = {
-                        f'param_{p.name}' : value  for p, value in
-                        zip(self.problem.parameters, x)
-                    }
-                    objective_value = { f'metric_{self.problem.objective_fn.name}' : fval }
-                    self.logger.result(step=step, tag="raw", **objective_value, **raw_params)
-                    self.logger.result(
-                        step=step, tag="standardized", **objective_value, **standardized_params
-                    )
+                with self.tracer.span('log', step=step):
+                    self._log_results(step, xs, fvals, fidelities)
 
                 failed = np.isnan(fvals)
                 if np.all(failed):
@@ -114,47 +150,37 @@ class DaisyCMAOptimizer:
                     # We want them to have a bigger negative influence
                     # TODO: This assumes that are we minimizing ...
                     fvals[failed] = 2*np.max(fvals[~failed])
-                self.optimizer.tell(xs, fvals)
-
-                # Log parameter distributions in the standardized space
-                means = self.optimizer.result[5]
-                stds = self.optimizer.result[6]
-                p_mean = {
-                    f'param_{p.name}_mean' : mean for p, mean in zip(self.problem.parameters, means)
-                }
-                p_std = {
-                    f'param_{p.name}_std' : std for p, std in zip(self.problem.parameters, stds)
-                }
-                self.logger.parameters(
-                    distribution="normal",
-                    tag="standardized",
-                    step=step,
-                    **p_mean,
-                    **p_std
-                )
-
-                # Log parameter distributions in the raw space
-                means = self.objective.transform(means)
-                stds = np.array(self.objective.multiplier) * stds
-                p_mean = {
-                    f'param_{p.name}_mean' : mean for p, mean in zip(self.problem.parameters, means)
-                }
-                p_std = {
-                    f'param_{p.name}_std' : std for p, std in zip(self.problem.parameters, stds)
-                }
-                self.logger.parameters(
-                    distribution="normal",
-                    tag="raw",
-                    step=step,
-                    **p_mean,
-                    **p_std
-                )
+                with self.tracer.span('tell', step=step):
+                    self.optimizer.tell(xs, fvals)
+
+                with self.tracer.span('log', step=step):
+                    self._log_distributions(step)
 
+        self.timing_summary.log(self.logger)
+        self.tracer.log_utilization(
+            self.logger, executor_max_workers(self.executor, self.number_of_processes)
+        )
         status = self.optimizer.result[7]
         self.logger.info('Termination conditions')
         for k, v in status.items():
             self.logger.info(f'{k} = {v}')
-        best = self.objective.transform(self.optimizer.result[0])
+        result = self.partial_result()
+        if result is None:
+            self.logger.error('No solution was fully evaluated')
+            raise RuntimeError('No solution was fully evaluated')
+        return result
+
+    def partial_result(self):
+        '''The best solution and search distribution so far, in the same format as `optimize`.
+        Returns None if no solution has been told to the optimizer yet, or if there are estimates
+        and no solution has been fully evaluated.'''
+        best = self.optimizer.result[0]
+        if self.num_estimates > 0:
+            # The best solution of cma may be an estimate, so only full evaluations are used
+            best = self.best_exact[0] if self.best_exact is not None else None
+        if best is None:
+            return None
+        best = self.objective.transform(best)
         means, stds = self.optimizer.result[5], self.optimizer.result[6]
         transformed = self.objective.transform(means)
         result = {
@@ -170,6 +196,63 @@ class DaisyCMAOptimizer:
         }
         return result
 
+    def _update_best_exact(self, x, fval, timings):
+        if is_estimate(timings):
+            self.num_estimates += 1
+        elif not np.isnan(fval) and (self.best_exact is None or fval < self.best_exact[1]):
+            self.best_exact = (x, fval)
+
+    def _log_results(self, step, xs, fvals, fidelities):
+        for x, fval, fidelity in zip(xs, fvals, fidelities):
+            raw_params = {
+                f'param_{p.name}' : value  for p, value in
+                zip(self.problem.parameters, self.objective.transform(x))
+            }
+            standardized_params = {
+                f'param_{p.name}' : value  for p, value in
+                zip(self.problem.parameters, x)
+            }
+            objective_value = { f'metric_{self.problem.objective_fn.name}' : fval }
+            self.logger.result(step=step, tag="raw", **objective_value, **raw_params, **fidelity)
+            self.logger.result(
+                step=step, tag="standardized", **objective_value, **standardized_params, **fidelity
+            )
+
+    def _log_distributions(self, step):
+        # Log parameter distributions in the standardized space
+        means = self.optimizer.result[5]
+        stds = self.optimizer.result[6]
+        p_mean = {
+            f'param_{p.name}_mean' : mean for p, mean in zip(self.problem.parameters, means)
+        }
+        p_std = {
+            f'param_{p.name}_std' : std for p, std in zip(self.problem.parameters, stds)
+        }
+        self.logger.parameters(
+            distribution="normal",
+            tag="standardized",
+            step=step,
+            **p_mean,
+            **p_std
+        )
+
+        # Log parameter distributions in the raw space
+        means = self.objective.transform(means)
+        stds = np.array(self.objective.multiplier) * stds
+        p_mean = {
+            f'param_{p.name}_mean' : mean for p, mean in zip(self.problem.parameters, means)
+        }
+        p_std = {
+            f'param_{p.name}_std' : std for p, std in zip(self.problem.parameters, stds)
+        }
+        self.logger.parameters(
+            distribution="normal",
+            tag="raw",
+            step=step,
+            **p_mean,
+            **p_std
+        )
+
     def checkpoint(self, path):
         '''Save the state to disk to we can resume
 
@@ -1,9 +1,11 @@
 import os
 import warnings
 from pathlib import Path
+import pandas as pd
 from daisypy.io import parse_dai, format_dai, filter_dai
 from daisypy.io.dai import Definition, Comment, Identifier
 from .file_generator import FileGenerator
+from .timing import timed_phase
 
 class DaiFileGenerator(FileGenerator):
     """Template based generation of dai files using string replacement
@@ -78,15 +80,76 @@ class DaiFileGenerator(FileGenerator):
         """
         if tagged:
             params = params['dai']
-        os.makedirs(output_directory, exist_ok=True)
-        dai_string = self.template_text.format(**params)
-        out_path = os.path.abspath(os.path.join(output_directory, self.out_file))
-        with open(out_path, "w", encoding='utf-8') as f:
-            f.write(dai_string)
+        with timed_phase('render/dai'):
+            os.makedirs(output_directory, exist_ok=True)
+            dai_string = self.template_text.format(**params)
+            out_path = os.path.abspath(os.path.join(output_directory, self.out_file))
+            with open(out_path, "w", encoding='utf-8') as f:
+                f.write(dai_string)
         if tagged:
             return { 'dai' : out_path }
         return out_path
 
+    def with_stop(self, stop):
+        '''Copy of this DaiFileGenerator where simulations stop at a different time
+
+        All `(stop <year> <month> <day> [<hour>])` entries in the template are replaced. This is
+        used to run the same setup on a shorter horizon, e.g. by DaisyHalvingOptimizer.
+
+        Parameters
+        ----------
+        stop : str OR datetime.datetime OR pandas.Timestamp
+          New stop time. Anything accepted by pandas.Timestamp
+
+        Raises
+        ------
+        ValueError if the template has no stop time
+
+        Returns
+        -------
+        DaiFileGenerator
+        '''
+        stop = pd.Timestamp(stop)
+        stop_values = [stop.year, stop.month, stop.day]
+        if stop.hour != 0:
+            stop_values.append(stop.hour)
+        dai = parse_dai(self.template_text, extended=True)
+        if _set_stop(dai.values, stop_values) == 0:
+            raise ValueError('Template does not have a stop time')
+        return DaiFileGenerator(self.out_file, template_text=format_dai(dai))
+
+    def with_programs(self, programs):
+        '''Copy of this DaiFileGenerator where spawn programs only run some of their programs
+
+        The `(program ...)` lists of programs that inherit from spawn are reduced to `programs`.
+        This is used to run a subset of the scenarios of a setup, e.g. by StagedProblem.
+
+        Parameters
+        ----------
+        programs : list of str
+          Names of programs to keep
+
+        Raises
+        ------
+        ValueError if a program is not run by a spawn program in the template
+
+        Returns
+        -------
+        DaiFileGenerator
+        '''
+        dai = parse_dai(self.template_text, extended=True)
+        spawned = set()
+        for value in dai.values:
+            if isinstance(value, Definition) and value.parent.value == 'spawn':
+                for param in value.body:
+                    if isinstance(param, list) and param[0].value == 'program':
+                        spawned.update(str(v) for v in param[1:])
+                        param[1:] = [v for v in param[1:] if str(v) in programs]
+        missing = [name for name in programs if name not in spawned]
+        if len(missing) > 0:
+            raise ValueError(f'Programs {missing} are not run by a spawn program')
+        return DaiFileGenerator(self.out_file, template_text=format_dai(dai))
+
     def serialize(self):
         '''Serializable representation of this DaiFileGenerator
 
@@ -110,3 +173,21 @@ class DaiFileGenerator(FileGenerator):
         '''
         return DaiFileGenerator(template_text=dict_repr['template_text'],
                                 out_file=dict_repr['out_file'])
+
+def _set_stop(values, stop_values):
+    # Replace (stop y m d [h]) entries in place and return the number of replaced entries
+    count = 0
+    for value in values:
+        if isinstance(value, Definition):
+            count += _set_stop(value.body, stop_values)
+        elif isinstance(value, list) and len(value) > 0:
+            is_stop = (
+                isinstance(value[0], Identifier) and value[0].value == 'stop'
+                and 4 <= len(value) <= 5 and all(isinstance(v, int) for v in value[1:])
+            )
+            if is_stop:
+                value[1:] = stop_values
+                count += 1
+            else:
+                count += _set_stop(value, stop_values)
+    return count
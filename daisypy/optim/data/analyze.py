@@ -10,7 +10,10 @@ from daisypy.optim import (
 
 def main(run_dir):
     run_dir = Path(run_dir)
-    result_file = run_dir / 'logs' / 'result.csv'
+    # Prefer the columnar result log if the run was logged with result_format='arrow'
+    result_file = run_dir / 'logs' / 'result.arrow'
+    if not result_file.exists():
+        result_file = run_dir / 'logs' / 'result.csv'
 
     ani = animate_result(result_file)
     plt.show()
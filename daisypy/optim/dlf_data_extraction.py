@@ -5,6 +5,7 @@ from collections.abc import Mapping
 from pathlib import Path
 import pandas as pd
 from daisypy.io.dlf import read_dlf
+from .timing import timed_phase
 
 class DlfDataExtractor:
     '''Class for extracting data from Daisy log files (dlf)'''
@@ -50,14 +51,16 @@ class DlfDataExtractor:
         for log_name, var_names in self.logs_and_variables.items():
             if isinstance(var_names, str):
                 var_names = [var_names]
-            dlf = read_dlf(out_dir / log_name)
-            dlf.body['time'] = pd.to_datetime(
-                dlf.body[['year', 'month', 'mday', 'hour']].rename(columns={'mday' : 'day'})
-            )
-            dfs.append(dlf.body[['time'] + var_names].rename(columns={
-                var_name : f'{log_name}/{var_name}' for var_name in var_names
-            }))
-        processed = self.post_processor(dfs)
+            with timed_phase('objective/dlf_read'):
+                dlf = read_dlf(out_dir / log_name)
+                dlf.body['time'] = pd.to_datetime(
+                    dlf.body[['year', 'month', 'mday', 'hour']].rename(columns={'mday' : 'day'})
+                )
+                dfs.append(dlf.body[['time'] + var_names].rename(columns={
+                    var_name : f'{log_name}/{var_name}' for var_name in var_names
+                }))
+        with timed_phase('objective/post_process'):
+            processed = self.post_processor(dfs)
         if set(processed.columns) != {'time', 'value'}:
             raise RuntimeError(
                 "`post_processor` must return a DataFrame with columns 'time' and 'value'"
@@ -0,0 +1,147 @@
+'''Executors used by the optimizers to evaluate problems.
+
+All optimizers accept an `executor` argument, which is either
+  * The name of an executor kind in `available_executors`. The optimizer creates the executor and
+    shuts it down when it is done.
+  * A `concurrent.futures.Executor`. The optimizer uses it, but does not shut it down, so the same
+    executor can be reused by several optimizers, e.g. a coarse sequential search followed by CMA.
+'''
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from .resources import available_cpus, pinned_pool_arguments
+
+__all__ = [
+    'SerialExecutor',
+    'available_executors',
+    'create_executor',
+    'evaluation_executor',
+    'executor_max_workers',
+]
+
+class SerialExecutor(Executor):
+    '''Executor that runs everything in the calling thread when it is submitted.
+
+    Useful for debugging. Exceptions have a plain traceback and breakpoints in problems, objectives
+    and loss functions work as usual.
+    '''
+    def __init__(self, max_workers=None):
+        '''
+        Parameters
+        ----------
+        max_workers : ignored
+          Accepted for compatibility with the other executors
+        '''
+        del max_workers
+        self._max_workers = 1
+        self._shutdown = False
+
+    def submit(self, fn, /, *args, **kwargs):
+        if self._shutdown:
+            raise RuntimeError('cannot schedule new futures after shutdown')
+        future = Future()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e: # pylint: disable=broad-exception-caught
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self._shutdown = True
+
+
+available_executors = {
+    'process' : ProcessPoolExecutor,
+    'thread' : ThreadPoolExecutor,
+    'serial' : SerialExecutor,
+}
+
+def create_executor(kind, max_workers=None, pinning=None):
+    '''Create an executor for evaluating problems
+
+    'process' evaluates in a pool of worker processes. The problem, including targets, loss and
+    aggregate functions, is pickled and sent to the workers, so everything must be picklable.
+
+    'thread' evaluates in a pool of threads in the calling process. The problem is used in place,
+    so nothing is pickled or copied and local functions can be used. An evaluation mostly waits for
+    Daisy to finish, so threads are not held back by the GIL. Python code in the problem must be
+    thread safe.
+
+    'serial' evaluates one problem at a time in the calling thread. Use it for debugging.
+
+    With pinning, each worker of a 'process' or 'thread' pool is given a slot of CPUs, and Daisy is
+    pinned to the slot of the worker that runs it. See `daisypy.optim.resources`.
+
+    Parameters
+    ----------
+    kind : str
+      One of 'process', 'thread' and 'serial'
+
+    max_workers : int > 0 OR None
+      Maximum number of parallel evaluations. If None use available_cpus()
+
+    pinning : str OR None
+      None for no pinning, 'core' to pin to a single CPU or 'numa' to pin to a NUMA node
+
+    Returns
+    -------
+    concurrent.futures.Executor
+    '''
+    if kind not in available_executors:
+        raise ValueError(f'executor must be one of {list(available_executors)}. Got {kind}')
+    if max_workers is None:
+        max_workers = available_cpus()
+    if pinning is None:
+        return available_executors[kind](max_workers)
+    if kind == 'serial':
+        raise ValueError("pinning is not supported by the 'serial' executor")
+    return available_executors[kind](max_workers, **pinned_pool_arguments(pinning, max_workers))
+
+@contextmanager
+def evaluation_executor(executor, max_workers=None):
+    '''Context manager giving an executor to evaluate with
+
+    Parameters
+    ----------
+    executor : str OR concurrent.futures.Executor
+      If a str, an executor of that kind is created and shut down on exit. Otherwise the executor is
+      used as is and is not shut down.
+
+    max_workers : int > 0 OR None
+      Passed to `create_executor` when `executor` is a str
+
+    Yields
+    ------
+    concurrent.futures.Executor
+    '''
+    if isinstance(executor, str):
+        with create_executor(executor, max_workers) as created:
+            yield created
+    elif isinstance(executor, Executor):
+        yield executor
+    else:
+        raise TypeError(
+            f'executor must be a str or a concurrent.futures.Executor. Got {type(executor)}'
+        )
+
+def executor_max_workers(executor, max_workers=None):
+    '''Number of parallel evaluations an executor runs
+
+    Parameters
+    ----------
+    executor : str OR concurrent.futures.Executor
+
+    max_workers : int > 0 OR None
+      Number of workers requested when `executor` is a str
+
+    Returns
+    -------
+    int
+    '''
+    if isinstance(executor, str):
+        if executor == 'serial':
+            return 1
+        return max_workers if max_workers is not None else available_cpus()
+    # The standard pools do not expose their size publicly
+    return getattr(executor, '_max_workers', max_workers or available_cpus())
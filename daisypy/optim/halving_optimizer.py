@@ -0,0 +1,168 @@
+# pylint: disable=too-few-public-methods,R0801
+import math
+import numpy as np
+from .executor import evaluation_executor, executor_max_workers
+from .problem import ScalarProblemWrapper
+from .runtime import RuntimePredictor, map_longest_first
+from .timing import TimingSummary, fidelity_column, is_estimate
+from .trace import Tracer
+
+class DaisyHalvingOptimizer:
+    # pylint: disable=too-many-instance-attributes,too-many-arguments,too-many-positional-arguments
+    """Daisy optimizer using successive halving over simulation horizons
+
+    A bad parameter set is usually obviously bad after the first few years of a simulation. The
+    optimizer evaluates many candidates on a short horizon, where Daisy stops early and the loss is
+    only computed on targets up to the stop time. The best 1/eta of the candidates are evaluated
+    again on the next, longer horizon, and so on until the last horizon. This way most of the
+    CPU time is spent on the promising candidates.
+
+    The candidates are the initial values and parameter sets sampled uniformly from the valid
+    ranges and the values of categorical parameters. The problem must have a `with_stop` method,
+    like DaisyOptimizationProblem, that gives a copy of the problem on a shorter horizon.
+    """
+    def __init__(
+            self, problem, logger, options=None, number_of_processes=None, tracer=None,
+            executor='process'
+    ):
+        """
+        Parameters
+        ----------
+        problem : DaisyOptimizationProblem
+
+        logger : ...
+
+        options : dict
+          'horizons' : List of stop times, shortest first. Anything accepted by pandas.Timestamp.
+                       None as the last horizon runs the full simulation of the problem. Required
+          'eta' : Keep the best 1/eta of the candidates on each horizon. Default 3
+          'num_candidates' : Number of candidates on the first horizon. Default
+                             eta**(number of horizons - 1)
+          'seed' : Seed for sampling candidates. Default None
+          'order_by_runtime' : If True submit the candidates of a horizon with the longest
+                               predicted runtime first. See `map_longest_first`. Default True
+
+        number_of_processes: int > 0 (Optional)
+          The maximum number of processes to use when running Daisy. Defaults to
+          available_cpus(), which respects CPU affinity and cgroup CPU quotas
+
+        tracer : Tracer (Optional)
+          If not None record a timeline of evaluations and optimizer activity
+
+        executor : str OR concurrent.futures.Executor (Optional)
+          'process' to evaluate in a process pool, 'thread' to evaluate in a thread pool or 'serial'
+          to evaluate one at a time in this thread. An Executor is used as is and is not shut down,
+          so it can be shared between optimizers. See `evaluation_executor`
+        """
+        if options is None:
+            options = {}
+        if len(options.get('horizons', [])) == 0:
+            raise ValueError("options must contain a non-empty list of 'horizons'")
+        self.horizons = list(options['horizons'])
+        if None in self.horizons[:-1]:
+            raise ValueError('Only the last horizon can be None')
+        self.eta = options.get('eta', 3)
+        if self.eta < 2:
+            raise ValueError(f'eta must be at least 2. Got {self.eta}')
+        self.num_candidates = options.get('num_candidates', self.eta**(len(self.horizons) - 1))
+        self.rng = np.random.default_rng(options.get('seed'))
+        self.order_by_runtime = options.get('order_by_runtime', True)
+        self.problem = problem
+        self.objective_name = problem.objective_fn.name
+        self.logger = logger
+        self.timing_summary = TimingSummary()
+        self.tracer = tracer if tracer is not None else Tracer(enabled=False)
+        self.number_of_processes = number_of_processes
+        self.executor = executor
+        self.runtime_predictor = RuntimePredictor()
+        self.best = None  # Best candidate on the last completed horizon
+
+    def optimize(self):
+        '''Run optimization'''
+        with self.tracer.span('generate parameter sets'):
+            candidates = self._sample_candidates()
+        self.logger.info(
+            f'Evaluating {len(candidates)} candidates on {len(self.horizons)} horizons'
+        )
+        with evaluation_executor(self.executor, self.number_of_processes) as executor:
+            for step, horizon in enumerate(self.horizons, start=1):
+                fvals = self._evaluate_horizon(executor, step, horizon, candidates)
+                ok = np.flatnonzero(~np.isnan(fvals))
+                if len(ok) == 0:
+                    self.logger.error('All simulations failed. Aborting')
+                    raise RuntimeError('All simulations failed')
+                if len(ok) < len(candidates):
+                    self.logger.warning(step=step, n_failed_runs=len(candidates) - len(ok))
+                # Failed candidates are never promoted
+                ranked = ok[np.argsort(fvals[ok], kind='stable')]
+                self.logger.info(step=step, best_objective=fvals[ranked[0]])
+                if step < len(self.horizons):
+                    num_promoted = max(1, math.ceil(len(candidates) / self.eta))
+                    ranked = ranked[:num_promoted]
+                elif np.isinf(fvals[ranked[0]]):
+                    self.logger.error('No candidate was fully evaluated on the last horizon')
+                    raise RuntimeError('No candidate was fully evaluated on the last horizon')
+                candidates = [candidates[i] for i in ranked]
+                if np.isfinite(fvals[ranked[0]]):
+                    self.best = candidates[0]
+
+        self.timing_summary.log(self.logger)
+        self.tracer.log_utilization(
+            self.logger, executor_max_workers(self.executor, self.number_of_processes)
+        )
+        return self.partial_result()
+
+    def partial_result(self):
+        '''The best candidate on the last completed horizon, in the same format as `optimize`.
+        Returns None if no horizon has been completed or its best value is an estimate.'''
+        if self.best is None:
+            return None
+        return {
+            p.name : { 'best' : value } for p, value in zip(self.problem.parameters, self.best)
+        }
+
+    def _sample_candidates(self):
+        # The initial values followed by uniform samples
+        candidates = []
+        for i in range(self.num_candidates):
+            candidate = []
+            for param in self.problem.parameters:
+                if param.type == 'Continuous':
+                    value = param.initial_value if i == 0 else self.rng.uniform(*param.valid_range)
+                    candidate.append(float(value))
+                else:
+                    idx = param.initial_value_idx
+                    if i > 0:
+                        idx = self.rng.integers(len(param.values))
+                    candidate.append(param.values[idx])
+            candidates.append(candidate)
+        return candidates
+
+    def _evaluate_horizon(self, executor, step, horizon, candidates):
+        stop = 'full' if horizon is None else str(horizon)
+        self.logger.info(step=step, stop=stop, n_param_sets=len(candidates))
+        problem = self.problem if horizon is None else self.problem.with_stop(horizon)
+        problem = ScalarProblemWrapper(problem, return_timings=True)
+        if self.order_by_runtime:
+            # Runtimes depend on the horizon, so each horizon is a scenario for the predictor
+            results = map_longest_first(
+                executor, problem, candidates, self.runtime_predictor, scenario=stop
+            )
+        else:
+            results = executor.map(problem, candidates)
+        fvals = []
+        for candidate, (fval, timings) in zip(candidates, results):
+            self.timing_summary.add(timings)
+            self.tracer.add_evaluation(timings, step=step)
+            params = {
+                f'param_{p.name}' : value for p, value in zip(self.problem.parameters, candidate)
+            }
+            with self.tracer.span('log', step=step):
+                self.logger.result(
+                    step=step, tag='raw', stop=stop,
+                    **{ f'metric_{self.objective_name}' : fval }, **params,
+                    **fidelity_column(timings)
+                )
+            # Estimates are ranked after all full evaluations
+            fvals.append(np.inf if is_estimate(timings) else fval)
+        return np.array(fvals, dtype=float)
@@ -0,0 +1,186 @@
+'''Reuse evaluations from earlier optimizations.
+
+When a calibration is run again, e.g. with a tweaked objective or narrower ranges, the result logs
+of earlier runs already hold many evaluated points. They can be used to start the new run warm
+  * `read_history` reads result logs (csv or arrow) written by the optimizers
+  * `attach_history` adds the evaluations to an Ax client as completed trials. Pass the history to
+    DaisyAxOptimizer with `history=...`
+  * `distribution_from_history` and `read_distribution` give an initial mean and standard deviation
+    for CMA, from the best evaluations or from the last distribution in a parameters.csv. Pass it to
+    DaisyCMAOptimizer with `initial_distribution=...`
+
+Estimates logged by a StagedProblem, rows with a fidelity below 1, are never used, since they are
+not the objective values of the points. Parameters that are not in the new problem are ignored.
+Evaluations with values outside the valid
+range of the new parameters are either dropped or clipped to the range. Clipping keeps more points,
+but the objective value of a clipped point is the value of the original point.
+'''
+import numpy as np
+import pandas as pd
+from .parameter import CategoricalParameter
+
+__all__ = [
+    'attach_history',
+    'distribution_from_history',
+    'read_distribution',
+    'read_history',
+]
+
+def _read_log(path):
+    path = str(path)
+    if path.endswith('.arrow'):
+        # pylint: disable-next=import-outside-toplevel # pyarrow is optional
+        from .arrow_log import read_arrow_log
+        return read_arrow_log(path)
+    return pd.read_csv(path)
+
+def read_history(paths, parameters, metrics, out_of_range='filter'):
+    '''Read evaluations from result logs
+
+    Parameters
+    ----------
+    paths : str OR list of str
+      Paths to result logs, e.g. 'out/result.csv'. Files ending in '.arrow' are read as arrow logs
+
+    parameters : list of ContinuousParameter OR CategoricalParameter
+      Parameters of the new problem. Logs must have a 'param_<name>' column for each of them
+
+    metrics : str OR list of str
+      Names of the objectives. Logs must have a 'metric_<name>' column for each of them.
+      Evaluations where any of them is missing or nan are dropped. Estimates, where the log has a
+      'fidelity' below 1, are also dropped
+
+    out_of_range : str
+      'filter' to drop evaluations outside the valid range of a continuous parameter, or 'clip' to
+      clip them to the range. Values of categorical parameters that are not in the new values are
+      always dropped
+
+    Returns
+    -------
+    pandas.DataFrame
+      One row per evaluation with a column per parameter and a column per metric, named as the
+      parameters and metrics without prefix
+    '''
+    if out_of_range not in ('filter', 'clip'):
+        raise ValueError(f"out_of_range must be 'filter' or 'clip'. Got {out_of_range}")
+    if isinstance(paths, str):
+        paths = [paths]
+    if isinstance(metrics, str):
+        metrics = [metrics]
+    columns = [f'param_{p.name}' for p in parameters] + [f'metric_{name}' for name in metrics]
+    frames = []
+    for path in paths:
+        df = _read_log(path)
+        if 'tag' in df.columns:
+            # CMA also logs points in the standardized space
+            df = df[df['tag'] == 'raw']
+        if 'fidelity' in df.columns:
+            # Estimates from a StagedProblem. A missing fidelity is a full evaluation
+            df = df[~(df['fidelity'] < 1)]
+        missing = [column for column in columns if column not in df.columns]
+        if len(missing) > 0:
+            raise ValueError(f'{path} does not have the columns {missing}')
+        frames.append(df[columns])
+    history = pd.concat(frames, ignore_index=True)
+    history.columns = [p.name for p in parameters] + list(metrics)
+    history = history.dropna()
+    keep = np.ones(len(history), dtype=bool)
+    for p in parameters:
+        if isinstance(p, CategoricalParameter):
+            keep &= history[p.name].isin(p.values).to_numpy()
+        elif out_of_range == 'clip':
+            history[p.name] = history[p.name].clip(*p.valid_range)
+        else:
+            keep &= history[p.name].between(*p.valid_range).to_numpy()
+    return history[keep].reset_index(drop=True)
+
+def attach_history(client, history, parameters, metrics):
+    '''Add evaluations to an Ax client as completed trials
+
+    Parameters
+    ----------
+    client : ax.api.client.Client
+      Client with experiment and optimization configured
+
+    history : pandas.DataFrame
+      As returned by `read_history`
+
+    parameters : list of ContinuousParameter OR CategoricalParameter
+
+    metrics : list of str
+
+    Returns
+    -------
+    list of int
+      Indices of the attached trials
+    '''
+    trial_indices = []
+    for row in history.itertuples(index=False):
+        row = row._asdict()
+        # Ax wants python types, not numpy scalars
+        trial_index = client.attach_trial(
+            parameters={ p.name : np.asarray(row[p.name]).item() for p in parameters }
+        )
+        client.complete_trial(
+            trial_index=trial_index, raw_data={ name : float(row[name]) for name in metrics }
+        )
+        trial_indices.append(trial_index)
+    return trial_indices
+
+def distribution_from_history(history, parameters, metric, n_best=None):
+    '''Mean and standard deviation of the best evaluations
+
+    Parameters
+    ----------
+    history : pandas.DataFrame
+      As returned by `read_history`
+
+    parameters : list of ContinuousParameter
+
+    metric : str
+      Name of objective to minimize
+
+    n_best : int OR None
+      Number of evaluations to use. If None use the default population size of CMA,
+      4 + 3 ln(number of parameters)
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+      Mean and standard deviation of each parameter. Standard deviations are at least 1% of the
+      valid range, so no parameter is fixed
+    '''
+    if n_best is None:
+        n_best = 4 + int(3 * np.log(len(parameters)))
+    if len(history) == 0:
+        raise ValueError('history is empty')
+    best = history.nsmallest(n_best, metric)
+    names = [p.name for p in parameters]
+    means = best[names].mean().to_numpy(dtype=float)
+    stds = best[names].std(ddof=0).to_numpy(dtype=float)
+    widths = np.array([p.valid_range[1] - p.valid_range[0] for p in parameters], dtype=float)
+    return means, np.maximum(stds, 0.01 * widths)
+
+def read_distribution(path, parameters):
+    '''Read the last distribution logged by DaisyCMAOptimizer
+
+    Parameters
+    ----------
+    path : str
+      Path to parameters.csv
+
+    parameters : list of ContinuousParameter
+
+    Returns
+    -------
+    (numpy.ndarray, numpy.ndarray)
+      Mean and standard deviation of each parameter in the raw space
+    '''
+    df = pd.read_csv(path)
+    df = df[(df['distribution'] == 'normal') & (df['tag'] == 'raw')]
+    if len(df) == 0:
+        raise ValueError(f'{path} does not have a normal distribution in the raw space')
+    last = df.iloc[-1]
+    means = np.array([last[f'param_{p.name}_mean'] for p in parameters], dtype=float)
+    stds = np.array([last[f'param_{p.name}_std'] for p in parameters], dtype=float)
+    return means, stds
@@ -44,6 +44,10 @@ class Logger:
         '''Log to the result log'''
         self.log('result', *args, **kwargs)
 
+    def timing(self, *args, **kwargs):
+        '''Log to the timing log'''
+        self.log('timing', *args, **kwargs)
+
     def log(self, name, *args, **kwargs):
         '''Log to a specific named log. Fallback to `default` log if the named log does not exist
 
@@ -2,34 +2,46 @@ import os
 from daisypy.optim.terminal_log import TerminalLog
 from daisypy.optim.csv_log import CsvLog
 from daisypy.optim.logger import Logger
+from daisypy.optim.registry import LazyRegistry
 
-available_logs = {
-    "terminal" : TerminalLog,
-    "csv" : CsvLog
-}
+available_logs = LazyRegistry()
+available_logs.register("terminal", "daisypy.optim.terminal_log", "TerminalLog")
+available_logs.register("csv", "daisypy.optim.csv_log", "CsvLog")
+available_logs.register("arrow", "daisypy.optim.arrow_log", "ArrowLog", requires=["pyarrow"])
 
-def DefaultLogger(outdir): # pylint: disable=invalid-name # (It should look like a class)
+# pylint: disable-next=invalid-name # (It should look like a class)
+def DefaultLogger(outdir, result_format='csv'):
     '''Return a logger instance with the following predefined logs.
 
       'default' : Log to stdout
       'warning', 'error' : Log to stderr
       'parameters' : Log to csv file 'parameters.csv' in outdir
-      'result' : Log to csv file 'result.csv' in outdir
+      'result' : Log to csv file 'result.csv' OR arrow file 'result.arrow' in outdir
+      'timing' : Log to csv file 'timing.csv' in outdir
 
     Parameters
     ----------
     outdir : str
       Directory to store log files in
 
+    result_format : str
+      Either 'csv' or 'arrow'. Use 'arrow' for long runs, where the result log can grow to millions
+      of rows. Requires pyarrow.
+
     Returns
     -------
     daisypy.optim.Logger
     '''
+    if result_format not in ('csv', 'arrow'):
+        raise ValueError(f"result_format must be 'csv' or 'arrow'. Got {result_format}")
+    if result_format == 'arrow' and 'arrow' not in available_logs:
+        raise ValueError("result_format 'arrow' requires pyarrow")
     logs = {
         'default' : TerminalLog(),
         'warning' : TerminalLog(error=True),
         'error' : TerminalLog(error=True),
         'parameters' : CsvLog(os.path.join(outdir, 'parameters.csv')),
-        'result' : CsvLog(os.path.join(outdir, 'result.csv')),
+        'result' : available_logs[result_format](os.path.join(outdir, f'result.{result_format}')),
+        'timing' : CsvLog(os.path.join(outdir, 'timing.csv')),
     }
     return Logger(**logs)
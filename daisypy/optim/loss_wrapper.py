@@ -1,5 +1,6 @@
 # pylint: disable=too-few-public-methods
 import pandas as pd
+from .timing import timed_phase
 
 class LossWrapper:
     """Loss wrappeer for use with DaisyObjective"""
@@ -35,6 +36,10 @@ class LossWrapper:
         -------
         loss as computed by self.loss_fn
         """
+        with timed_phase('objective/loss'):
+            return self._loss(actual, target)
+
+    def _loss(self, actual, target):
         # Only compute loss for time point with measurements
         target = target.dropna()
         target_time = target['time']
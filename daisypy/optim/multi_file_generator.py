@@ -38,3 +38,35 @@ class MultiFileGenerator(FileGenerator):
         if not tagged:
             return list(paths.values())
         return paths
+
+    def with_stop(self, stop):
+        """Copy where generators that support it, e.g. DaiFileGenerator, stop at `stop`
+
+        Parameters
+        ----------
+        stop : str OR datetime.datetime OR pandas.Timestamp
+
+        Returns
+        -------
+        MultiFileGenerator
+        """
+        return self._with('with_stop', stop)
+
+    def with_programs(self, programs):
+        """Copy where generators that support it, e.g. DaiFileGenerator, only run `programs`
+
+        Parameters
+        ----------
+        programs : list of str
+
+        Returns
+        -------
+        MultiFileGenerator
+        """
+        return self._with('with_programs', programs)
+
+    def _with(self, method, *args):
+        return MultiFileGenerator({
+            name : getattr(generator, method)(*args) if hasattr(generator, method) else generator
+            for name, generator in self.generators.items()
+        })
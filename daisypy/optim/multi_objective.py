@@ -1,3 +1,4 @@
+import copy
 from collections.abc import Sequence
 from .util import flatten
 
@@ -33,6 +34,21 @@ class MultiObjective(Sequence):
         '''
         return { k:v for f in self.objective_fns for k,v in f(daisy_output_directory).items() }
 
+    def with_stop(self, stop):
+        '''Copy of this objective where all objectives only use targets up to and including `stop`
+
+        Parameters
+        ----------
+        stop : str OR datetime.datetime OR pandas.Timestamp
+
+        Returns
+        -------
+        MultiObjective
+        '''
+        objective = copy.copy(self)
+        objective.objective_fns = [f.with_stop(stop) for f in self.objective_fns]
+        return objective
+
     def __getitem__(self, index):
         return self.objective_fns[index]
 
@@ -1,16 +1,44 @@
-# pylint: disable=wrong-import-position
-available_optimizers = {}
-try:
+'''Available optimizers. Optimizer backends are only imported when they are selected'''
+import importlib
+from typing import TYPE_CHECKING
+from daisypy.optim.registry import LazyRegistry
+
+available_optimizers = LazyRegistry()
+available_optimizers.register(
+    "cma", "daisypy.optim.cma_optimizer", "DaisyCMAOptimizer", requires=["cma"]
+)
+available_optimizers.register(
+    "ax", "daisypy.optim.ax_optimizer", "DaisyAxOptimizer", requires=["ax"]
+)
+available_optimizers.register(
+    "sequential", "daisypy.optim.sequential_optimizer", "DaisySequentialOptimizer"
+)
+available_optimizers.register(
+    "halving", "daisypy.optim.halving_optimizer", "DaisyHalvingOptimizer"
+)
+
+_lazy_attributes = {
+    'DaisyCMAOptimizer' : 'daisypy.optim.cma_optimizer',
+    'DaisyAxOptimizer' : 'daisypy.optim.ax_optimizer',
+    'AxResult' : 'daisypy.optim.ax_optimizer',
+    'DaisySequentialOptimizer' : 'daisypy.optim.sequential_optimizer',
+    'DaisyHalvingOptimizer' : 'daisypy.optim.halving_optimizer',
+}
+
+if TYPE_CHECKING:
     from daisypy.optim.cma_optimizer import DaisyCMAOptimizer
-    available_optimizers["cma"] = DaisyCMAOptimizer
-except ImportError:
-    pass
+    from daisypy.optim.ax_optimizer import DaisyAxOptimizer, AxResult
+    from daisypy.optim.sequential_optimizer import DaisySequentialOptimizer
+    from daisypy.optim.halving_optimizer import DaisyHalvingOptimizer
 
-try:
-    from daisypy.optim.ax_optimizer import DaisyAxOptimizer, AxResult #pylint: disable=unused-import
-    available_optimizers["ax"] = DaisyAxOptimizer
-except ImportError:
-    pass
+__all__ = [
+    'available_optimizers',
+    *_lazy_attributes
+]
 
-from daisypy.optim.sequential_optimizer import DaisySequentialOptimizer
-available_optimizers["sequential"] = DaisySequentialOptimizer
+def __getattr__(name):
+    if name not in _lazy_attributes:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(_lazy_attributes[name]), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,412 @@
+'''Run several optimizations concurrently on one shared pool of workers.
+
+Each study is an optimizer with its own problem and logs. The optimizers run in their own threads
+and submit evaluations to a `SharedPool`, which puts all requests in one queue and dispatches them
+to a single executor, never more than `max_workers` at a time. This keeps the machine full without
+oversubscribing it, which is what happens when every optimizer sizes its own pool to the number of
+cores.
+
+When a worker is free, the next request is taken from
+  'fair'     : the study that has been given the least evaluations relative to its priority
+  'priority' : the study with the highest priority. Ties are broken fairly
+
+A pool can also be given a `MemoryAwareLimiter`, which lowers the number of evaluations running
+when memory gets scarce. `AdaptiveExecutor` is such a pool used by a single optimizer.
+'''
+import os
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from typing import Any
+from .executor import create_executor
+from .logging import DefaultLogger
+from .optimizer import available_optimizers
+from .resources import MemoryAwareLimiter, available_cpus
+from .timing import result_timings
+
+__all__ = [
+    'AdaptiveExecutor',
+    'BudgetExhausted',
+    'MultiStudyOrchestrator',
+    'SharedPool',
+    'Study',
+    'StudyResult',
+]
+
+scheduling_policies = ['fair', 'priority']
+
+class BudgetExhausted(RuntimeError):
+    '''Raised when a study submits more evaluations than its budget allows'''
+
+
+class SharedPool:
+    # pylint: disable=too-many-instance-attributes
+    '''Pool of workers shared by several studies, with one queue of evaluation requests'''
+    def __init__(self, max_workers=None, executor='process', policy='fair', limiter=None):
+        '''
+        Parameters
+        ----------
+        max_workers : int > 0 OR None
+          Maximum number of evaluations running at the same time. If None use available_cpus()
+
+        executor : str OR concurrent.futures.Executor
+          Executor that runs the evaluations. If a str it is created with `create_executor` and
+          shut down by `shutdown`. An Executor must be able to run at least `max_workers`
+          evaluations in parallel, and is not shut down.
+
+        policy : str
+          One of 'fair' and 'priority'
+
+        limiter : MemoryAwareLimiter OR None
+          If not None, at most `limiter.limit(running)` evaluations run at the same time. Peak
+          resident set sizes recorded in the Timings of results are passed to `limiter.observe`
+        '''
+        if policy not in scheduling_policies:
+            raise ValueError(f'policy must be one of {scheduling_policies}. Got {policy}')
+        self.max_workers = max_workers if max_workers is not None else available_cpus()
+        self.policy = policy
+        self.limiter = limiter
+        self._owns_executor = isinstance(executor, str)
+        if self._owns_executor:
+            executor = create_executor(executor, self.max_workers)
+        self._executor = executor
+        self._queues = {}
+        self._priorities = {}
+        self._dispatched = {}
+        self._in_flight = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def executor(self, name, priority=1, budget=None):
+        '''Create an executor that submits evaluations for a study to this pool
+
+        Parameters
+        ----------
+        name : str
+          Unique name of study
+
+        priority : float > 0
+          Share of the pool relative to other studies when policy is 'fair', and precedence when
+          policy is 'priority'
+
+        budget : int OR None
+          Maximum number of evaluations. If None there is no limit
+
+        Returns
+        -------
+        StudyExecutor
+        '''
+        if priority <= 0:
+            raise ValueError(f'priority must be positive. Got {priority}')
+        with self._condition:
+            if name in self._queues:
+                raise ValueError(f'Study {name} already exists')
+            # A study that joins late should not be given a burst of evaluations to catch up
+            shares = [self._dispatched[n] / self._priorities[n] for n in self._queues]
+            self._dispatched[name] = min(shares, default=0) * priority
+            self._queues[name] = deque()
+            self._priorities[name] = priority
+        return StudyExecutor(self, name, budget)
+
+    def shutdown(self, wait=True):
+        '''Stop dispatching when the queue is empty, and shut down the executor if it was created by
+        this pool'''
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if wait:
+            self._dispatcher.join()
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def _submit(self, name, fn, args, kwargs):
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+            self._queues[name].append((future, fn, args, kwargs))
+            self._condition.notify_all()
+        return future
+
+    def _cancel(self, name):
+        # Cancel the evaluations of a study that are waiting in the queue
+        with self._condition:
+            queue = self._queues[name]
+            while len(queue) > 0:
+                future, *_ = queue.popleft()
+                future.cancel()
+
+    def _next_study(self):
+        waiting = [name for name, queue in self._queues.items() if len(queue) > 0]
+        def share(name):
+            return self._dispatched[name] / self._priorities[name]
+        if self.policy == 'priority':
+            return min(waiting, key=lambda name: (-self._priorities[name], share(name)))
+        return min(waiting, key=share)
+
+    def _has_waiting(self):
+        return any(len(queue) > 0 for queue in self._queues.values())
+
+    def _capacity(self):
+        if self.limiter is None:
+            return self.max_workers
+        return min(self.max_workers, self.limiter.limit(self._in_flight))
+
+    def _dispatch(self):
+        # The limit of a limiter changes without notice, so wake up regularly to check it
+        timeout = self.limiter.interval if self.limiter is not None else None
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: (
+                    self._closed or self._has_waiting()
+                ) and self._in_flight < self._capacity(), timeout)
+                if not self._has_waiting():
+                    if self._closed:
+                        return # Nothing left to do
+                    continue
+                if self._in_flight >= self._capacity():
+                    continue
+                name = self._next_study()
+                future, fn, args, kwargs = self._queues[name].popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self._dispatched[name] += 1
+                self._in_flight += 1
+            try:
+                inner = self._executor.submit(fn, *args, **kwargs)
+            except Exception as e: # pylint: disable=broad-exception-caught
+                future.set_exception(e)
+                self._done()
+            else:
+                inner.add_done_callback(lambda inner, future=future: self._forward(inner, future))
+
+    def _forward(self, inner, future):
+        exception = inner.exception()
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            result = inner.result()
+            if self.limiter is not None:
+                self.limiter.observe(getattr(result_timings(result), 'peak_rss', None))
+            future.set_result(result)
+        self._done()
+
+    def _done(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+
+class StudyExecutor(Executor):
+    '''Executor that submits evaluations for one study to a SharedPool. Shutting it down does not
+    affect the pool, but with cancel_futures=True the evaluations of the study that are waiting in
+    the queue are cancelled.'''
+    def __init__(self, pool, name, budget=None):
+        self.pool = pool
+        self.name = name
+        self.budget = budget
+        self.submitted = 0
+        self._max_workers = pool.max_workers
+        self._lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self._lock:
+            if self.budget is not None and self.submitted >= self.budget:
+                raise BudgetExhausted(f'Study {self.name} has used its budget of {self.budget}')
+            self.submitted += 1
+        return self.pool._submit(self.name, fn, args, kwargs) # pylint: disable=protected-access
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        if cancel_futures:
+            self.pool._cancel(self.name) # pylint: disable=protected-access
+
+
+class AdaptiveExecutor(Executor):
+    '''Executor that runs as many evaluations in parallel as CPUs and memory allow
+
+    The number of evaluations running is lowered when free memory drops or swap is used, and raised
+    again when memory recovers. See `MemoryAwareLimiter`.
+
+    Example
+    -------
+    >>> with AdaptiveExecutor(peak_rss=4 * 2**30) as executor:
+    ...     DaisyCMAOptimizer(problem, logger, options, executor=executor).optimize()
+    '''
+    def __init__(self, max_workers=None, executor='process', limiter=None, peak_rss=None):
+        '''
+        Parameters
+        ----------
+        max_workers : int > 0 OR None
+          Maximum number of evaluations running at the same time. If None use available_cpus()
+
+        executor : str OR concurrent.futures.Executor
+          Executor that runs the evaluations. See `SharedPool`
+
+        limiter : MemoryAwareLimiter OR None
+          If None a MemoryAwareLimiter with `max_workers` and `peak_rss` is used
+
+        peak_rss : int OR None
+          Initial estimate of the peak resident set size of an evaluation in bytes. If None it is
+          estimated from the evaluations
+        '''
+        if limiter is None:
+            limiter = MemoryAwareLimiter(max_workers, peak_rss)
+        self.limiter = limiter
+        self._pool = SharedPool(max_workers, executor, limiter=limiter)
+        self._executor = self._pool.executor('default')
+        self._max_workers = self._pool.max_workers
+
+    def submit(self, fn, /, *args, **kwargs):
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self._pool.shutdown(wait)
+
+
+class Study:
+    # pylint: disable=too-few-public-methods,too-many-arguments,too-many-positional-arguments
+    '''An optimization problem and the optimizer to solve it with'''
+    def __init__(
+            self, name, problem, optimizer, options=None, priority=1, budget=None, logger=None
+    ):
+        '''
+        Parameters
+        ----------
+        name : str
+          Unique name of study. Used as name of the log directory
+
+        problem : DaisyOptimizationProblem
+
+        optimizer : str OR optimizer class
+          Name in `available_optimizers` or a class with the same constructor as the optimizers
+
+        options : dict
+          Options passed to the optimizer
+
+        priority : float > 0
+          See `SharedPool.executor`
+
+        budget : int OR None
+          Maximum number of evaluations submitted to the pool. If None there is no limit beyond
+          what the optimizer options give
+
+        logger : daisypy.optim.Logger OR None
+          If None a DefaultLogger logging to <out_dir>/<name> is used
+        '''
+        self.name = name
+        self.problem = problem
+        self.optimizer = optimizer
+        self.options = options
+        self.priority = priority
+        self.budget = budget
+        self.logger = logger
+
+
+@dataclass
+class StudyResult:
+    '''Outcome of a study
+
+    status is one of 'completed', 'budget_exhausted' and 'failed'. result is what the optimizer
+    returned, and error is the exception if the study did not complete. When the budget is
+    exhausted, result is the best found so far as returned by `optimizer.partial_result()`, or None
+    if the optimizer has none yet.
+    '''
+    status : str
+    result : Any = None
+    error : BaseException = None
+
+
+class MultiStudyOrchestrator:
+    # pylint: disable=too-few-public-methods
+    '''Run several studies concurrently on one SharedPool
+
+    Example
+    -------
+    >>> studies = [
+    ...     Study(site, problems[site], 'cma', { 'maxfevals' : 200 }, budget=200) for site in sites
+    ... ]
+    ... orchestrator = MultiStudyOrchestrator(studies, 'out', max_workers=32)
+    ... results = orchestrator.run()
+    '''
+    def __init__(self, studies, out_dir, max_workers=None, executor='process', policy='fair'):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        '''
+        Parameters
+        ----------
+        studies : list of Study
+          Studies must have unique names
+
+        out_dir : str
+          Each study without a logger logs to <out_dir>/<study name>
+
+        max_workers, executor, policy
+          See `SharedPool`
+        '''
+        names = [study.name for study in studies]
+        if len(set(names)) != len(names):
+            raise ValueError('Study names must be unique')
+        self.studies = studies
+        self.out_dir = out_dir
+        self.max_workers = max_workers
+        self.executor = executor
+        self.policy = policy
+
+    def run(self):
+        '''Run all studies and wait for them to finish
+
+        Returns
+        -------
+        dict of (str, StudyResult)
+          Map from study name to result
+        '''
+        results = {}
+        with SharedPool(self.max_workers, self.executor, self.policy) as pool:
+            threads = [
+                threading.Thread(target=self._run_study, args=(study, pool, results))
+                for study in self.studies
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return results
+
+    def _run_study(self, study, pool, results):
+        executor = pool.executor(study.name, study.priority, study.budget)
+        optimizer_class = study.optimizer
+        if isinstance(optimizer_class, str):
+            optimizer_class = available_optimizers[optimizer_class]
+        logger = study.logger
+        if logger is None:
+            logger = DefaultLogger(os.path.join(self.out_dir, study.name))
+        optimizer = None
+        try:
+            optimizer = optimizer_class(
+                study.problem, logger, study.options, number_of_processes=pool.max_workers,
+                executor=executor
+            )
+            results[study.name] = StudyResult('completed', optimizer.optimize())
+        except BudgetExhausted as e:
+            logger.warning(str(e))
+            partial = getattr(optimizer, 'partial_result', None)
+            results[study.name] = StudyResult(
+                'budget_exhausted', partial() if partial is not None else None, e
+            )
+        except Exception as e: # pylint: disable=broad-exception-caught
+            # One failing study should not stop the others
+            logger.error(f'Study {study.name} failed with {type(e).__name__}: {e}')
+            results[study.name] = StudyResult('failed', error=e)
+        finally:
+            # Evaluations of a study that has stopped must not take slots from the others
+            executor.shutdown(cancel_futures=True)
+            if study.logger is None:
+                logger.close()
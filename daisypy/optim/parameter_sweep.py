@@ -0,0 +1,245 @@
+'''Full factorial parameter sweeps stored in memory mapped arrays.
+
+A sweep evaluates a problem at every point of the Cartesian product of per-parameter grids. The
+values of each objective are written to an N-d array with one axis per parameter, stored as a
+memory mapped .npy file in the output directory
+  sweep.json                : Parameter names, grids and objective names
+  objective_<objective>.npy : Objective values. nan where the evaluation failed or is not done
+  done.npy                  : True where the evaluation is done
+  failed.npy                : True where the last evaluation failed
+Objective names are percent encoded in file names, so any name is safe, e.g. 'done' is stored in
+objective_done.npy and 'a/b' in objective_a%2Fb.npy. Arrays can be opened with
+numpy.load(path, mmap_mode='r') while the sweep is running. Points are evaluated in C order, the
+last parameter changing fastest, so results are written to consecutive memory. The arrays are
+flushed every `flush_every` evaluations, and a sweep that was interrupted is resumed by running it
+again with the same grids, which evaluates the points that are not done. A failed evaluation, where
+all objective values are nan, is not done, so it is retried when the sweep is resumed.
+
+  grids = { 'K_aquitard' : np.linspace(0.1, 0.7, 13), 'Z_aquitard' : [150, 200, 250] }
+  result = sweep(problem, grids, 'out/sweep')
+  plot_sweep_heatmap('out/sweep', 'K_aquitard', 'Z_aquitard')
+'''
+import json
+import os
+from dataclasses import dataclass
+from urllib.parse import quote
+import numpy as np
+from .executor import evaluation_executor, executor_max_workers
+
+__all__ = [
+    'SweepResult',
+    'read_sweep',
+    'sweep',
+]
+
+METADATA_FILE = 'sweep.json'
+DONE_FILE = 'done.npy'
+FAILED_FILE = 'failed.npy'
+
+@dataclass
+class SweepResult:
+    '''Memory mapped result of a sweep
+
+    Attributes
+    ----------
+    parameters : list of str
+      Parameter names in axis order
+
+    coordinates : dict of (str, numpy.ndarray)
+      Grid of each parameter
+
+    values : dict of (str, numpy.memmap)
+      Objective values with one axis per parameter
+
+    done : numpy.memmap
+      True where the evaluation is done
+
+    failed : numpy.memmap
+      True where the last evaluation failed. Failed points are not done
+    '''
+    parameters: list
+    coordinates: dict
+    values: dict
+    done: np.ndarray
+    failed: np.ndarray
+
+    @property
+    def complete(self):
+        '''True if all points are evaluated'''
+        return bool(self.done.all())
+
+    def index(self, **values):
+        '''Index of the grid points nearest to the given parameter values
+
+        Parameters
+        ----------
+        **values : dict of (str, value)
+          Parameter values. Numeric values are matched to the nearest grid value, other values must
+          be in the grid
+
+        Returns
+        -------
+        dict of (str, int)
+        '''
+        index = {}
+        for name, value in values.items():
+            grid = self.coordinates[name]
+            if np.issubdtype(grid.dtype, np.number):
+                index[name] = int(np.argmin(np.abs(grid - value)))
+            else:
+                index[name] = int(np.flatnonzero(grid == value)[0])
+        return index
+
+def _metadata_path(out_dir):
+    return os.path.join(out_dir, METADATA_FILE)
+
+def _objective_path(out_dir, name):
+    # Prefixed so an objective cannot overwrite the other files, and encoded so any name is a valid
+    # file name
+    return os.path.join(out_dir, f"objective_{quote(name, safe='')}.npy")
+
+def read_sweep(out_dir, mode='r'):
+    '''Open the result of a sweep
+
+    Parameters
+    ----------
+    out_dir : str
+      Output directory of the sweep
+
+    mode : str
+      'r' to open read only or 'r+' to open for writing
+
+    Returns
+    -------
+    SweepResult
+    '''
+    with open(_metadata_path(out_dir), encoding='utf-8') as f:
+        metadata = json.load(f)
+    coordinates = {
+        name : np.array(grid) for name, grid in zip(metadata['parameters'], metadata['grids'])
+    }
+    values = {
+        name : np.load(_objective_path(out_dir, name), mmap_mode=mode)
+        for name in metadata['objectives']
+    }
+    done = np.load(os.path.join(out_dir, DONE_FILE), mmap_mode=mode)
+    failed = np.load(os.path.join(out_dir, FAILED_FILE), mmap_mode=mode)
+    return SweepResult(metadata['parameters'], coordinates, values, done, failed)
+
+def _create(out_dir, parameters, grids):
+    os.makedirs(out_dir, exist_ok=True)
+    metadata = { 'parameters' : parameters, 'grids' : grids, 'objectives' : [] }
+    shape = tuple(len(grid) for grid in grids)
+    for path in (DONE_FILE, FAILED_FILE):
+        np.lib.format.open_memmap(
+            os.path.join(out_dir, path), mode='w+', dtype=bool, shape=shape
+        ).flush()
+    with open(_metadata_path(out_dir), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f)
+    return read_sweep(out_dir, 'r+')
+
+def _add_objectives(out_dir, result, names):
+    # Create arrays for objectives that are seen for the first time
+    with open(_metadata_path(out_dir), encoding='utf-8') as f:
+        metadata = json.load(f)
+    for name in names:
+        array = np.lib.format.open_memmap(
+            _objective_path(out_dir, name), mode='w+', dtype=float, shape=result.done.shape
+        )
+        array[...] = np.nan
+        array.flush()
+        result.values[name] = array
+        metadata['objectives'].append(name)
+    with open(_metadata_path(out_dir), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f)
+
+def _flush(result):
+    for array in result.values.values():
+        array.flush()
+    result.done.flush()
+    result.failed.flush()
+
+def sweep(
+        problem, grids, out_dir, executor='process', number_of_processes=None, flush_every=None,
+        logger=None
+):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    '''Evaluate a problem at all points of a grid
+
+    Parameters
+    ----------
+    problem : DaisyOptimizationProblem
+
+    grids : dict of (str, array_like)
+      Grid of values for each parameter, in axis order. Parameters of the problem that are not in
+      grids are fixed at their initial values, see `DaisyOptimizationProblem.with_parameters`.
+      Grid values must be JSON serializable, e.g. numbers or strings
+
+    out_dir : str
+      Directory to store the arrays in. If it has a sweep with the same grids, the points that are
+      not done are evaluated, including the points where the evaluation failed
+
+    executor : str OR concurrent.futures.Executor
+      See `evaluation_executor`
+
+    number_of_processes : int > 0 OR None
+      Passed to `evaluation_executor`
+
+    flush_every : int > 0 OR None
+      Flush arrays to disk after this many evaluations. Defaults to 4 times the number of workers
+
+    logger : Logger (Optional)
+      If not None log progress to the info log
+
+    Returns
+    -------
+    SweepResult
+      Opened for writing
+    '''
+    names = list(grids)
+    grid_lists = [np.asarray(grid).tolist() for grid in grids.values()]
+    if set(names) != {p.name for p in problem.parameters}:
+        problem = problem.with_parameters(names)
+    # Map from axis order to the order of the problem parameters
+    order = [names.index(p.name) for p in problem.parameters]
+
+    if os.path.exists(_metadata_path(out_dir)):
+        result = read_sweep(out_dir, 'r+')
+        if result.parameters != names or [
+                result.coordinates[name].tolist() for name in names
+        ] != grid_lists:
+            raise ValueError(f'{out_dir} has a sweep with other parameters or grids')
+    else:
+        result = _create(out_dir, names, grid_lists)
+
+    pending = np.flatnonzero(~result.done.reshape(-1))
+    if logger is not None:
+        logger.info(
+            f'Sweep of {result.done.size} points, {len(pending)} left to evaluate of which '
+            f'{int(result.failed.sum())} failed before'
+        )
+    if flush_every is None:
+        flush_every = 4 * executor_max_workers(executor, number_of_processes)
+    indices = [np.unravel_index(i, result.done.shape) for i in pending]
+    parameter_sets = [
+        [grid_lists[axis][index[axis]] for axis in order] for index in indices
+    ]
+    with evaluation_executor(executor, number_of_processes) as pool:
+        for n, (index, values) in enumerate(zip(indices, pool.map(problem, parameter_sets)), 1):
+            values = dict(values)
+            new = [name for name in values if name not in result.values]
+            # A failed evaluation of a multi objective only has the name of the objective
+            failed = bool(np.all(np.isnan(list(values.values()))))
+            if len(new) > 0 and not failed:
+                _add_objectives(out_dir, result, new)
+            for name, value in values.items():
+                if name in result.values:
+                    result.values[name][index] = value
+            result.failed[index] = failed
+            result.done[index] = not failed
+            if n % flush_every == 0:
+                _flush(result)
+                if logger is not None:
+                    logger.info(f'Evaluated {n} of {len(pending)} points')
+    _flush(result)
+    return result
@@ -1,20 +1,43 @@
+import copy
 import tempfile
 import os
 import platform
 import numpy as np
+from .timing import collect_timings, timed_phase
+
+class ObjectiveMap(dict):
+    '''Mapping from objective names to objective values. Also holds the timings of the evaluation
+    that computed the objective values.'''
+    def __init__(self, values, timings=None):
+        '''
+        Parameters
+        ----------
+        values : dict of [str, float]
+          Mapping from objective names to objective values
+
+        timings : Timings OR None
+          Time spent in each phase of the evaluation
+        '''
+        super().__init__(values)
+        self.timings = timings
+
 
 class ScalarProblemWrapper:
     # pylint: disable=too-few-public-methods
     '''Helper class that evalues a DaisyOptimizationProblem and extract the value from the returned
     dict'''
 
-    def __init__(self, problem):
+    def __init__(self, problem, return_timings=False):
         '''
         Parameters
         ----------
         problem : DaisyOptimizationProblem
+
+        return_timings : bool
+          If True return a tuple of (value, Timings OR None) instead of the value
         '''
         self.problem = problem
+        self.return_timings = return_timings
 
     def __call__(self, parameter_values):
         '''
@@ -25,21 +48,25 @@ class ScalarProblemWrapper:
 
         Returns
         -------
-        float
+        float OR (float, Timings OR None)
         '''
         result = self.problem(parameter_values)
+        timings = getattr(result, 'timings', None)
         err_msg = 'Expected a dict with exactly one scalar valued objective mapping'
         try:
             value = result.popitem()[1]
             if len(result) != 0 or not isinstance(value, (int, float)):
                 raise RuntimeError(err_msg)
-            return value
         except (KeyError, AttributeError, TypeError) as e:
             raise RuntimeError(err_msg) from e
+        if self.return_timings:
+            return value, timings
+        return value
 
 
 class DaisyOptimizationProblem:
     # pylint: disable=too-many-arguments,too-many-positional-arguments,too-few-public-methods
+    # pylint: disable=too-many-instance-attributes
     '''Class that knows how to run simulation and compute objective for a parameter set'''
     def __init__(
             self, runner, file_generator, objective_fn, parameters, data_dir=None, debug=False
@@ -82,6 +109,8 @@ class DaisyOptimizationProblem:
                     )
                 self.parameter_kind[param.name] = kind
                 self.parameters.append(param)
+        # Values of parameters that are in the templates but not optimized. See `with_parameters`
+        self.fixed_values = {}
 
         self.data_dir = data_dir
         if data_dir is None and platform.system().lower() == 'linux':
@@ -104,10 +133,13 @@ class DaisyOptimizationProblem:
 
         Returns
         -------
-        objective_map : dict of [str, float]
-          Mapping from objective names to objective values
+        objective_map : ObjectiveMap
+          Mapping from objective names to objective values. The time spent in each phase of the
+          evaluation is available as `objective_map.timings`
         """
         named_parameters = { 'dai' : {} }
+        for name, value in self.fixed_values.items():
+            named_parameters.setdefault(self.parameter_kind[name], {})[name] = value
         for p, value in zip(self.parameters, parameter_values):
             kind = self.parameter_kind[p.name]
             if kind not in named_parameters:
@@ -115,20 +147,82 @@ class DaisyOptimizationProblem:
             else:
                 named_parameters[kind][p.name] = value
 
-        # If we debug then we dont want the directory to be deleted after use
-        # From python 3.12 we can pass delete=False to TemporaryDirectory, but prior to that we need
-        # to use mkdtemp.
-        if self.debug:
-            output_directory = tempfile.mkdtemp(dir=self.data_dir)
-            return self._run(output_directory, named_parameters)
+        with collect_timings() as timings:
+            # If we debug then we dont want the directory to be deleted after use
+            # From python 3.12 we can pass delete=False to TemporaryDirectory, but prior to that we
+            # need to use mkdtemp.
+            if self.debug:
+                with timed_phase('setup'):
+                    output_directory = tempfile.mkdtemp(dir=self.data_dir)
+                objective_map = self._run(output_directory, named_parameters)
+            else:
+                with timed_phase('setup'):
+                    # Cleanup is timed separately, so we do not use it as a context manager
+                    tmp_dir = tempfile.TemporaryDirectory( # pylint: disable=consider-using-with
+                        dir=self.data_dir
+                    )
+                try:
+                    objective_map = self._run(tmp_dir.name, named_parameters)
+                finally:
+                    with timed_phase('teardown'):
+                        tmp_dir.cleanup()
+        return ObjectiveMap(objective_map, timings)
+
+    def with_parameters(self, parameters):
+        '''Copy of this problem that only optimizes some of the parameters. The other parameters
+        are fixed at their initial values. Use it to optimize the parameters that matter, e.g. as
+        found by `screen`
 
-        with tempfile.TemporaryDirectory(dir=self.data_dir) as output_directory:
-            return self._run(output_directory, named_parameters)
+        Parameters
+        ----------
+        parameters : list of str OR list of ContinuousParameter OR CategoricalParameter
+          Parameters, or names of parameters, of this problem to optimize
+
+        Returns
+        -------
+        DaisyOptimizationProblem
+        '''
+        names = [p if isinstance(p, str) else p.name for p in parameters]
+        known = [p.name for p in self.parameters]
+        unknown = [name for name in names if name not in known]
+        if len(unknown) > 0:
+            raise ValueError(f'Parameters {unknown} are not optimized by the problem')
+        problem = copy.copy(self)
+        problem.parameters = [p for p in self.parameters if p.name in names]
+        problem.fixed_values = dict(self.fixed_values)
+        for p in self.parameters:
+            if p.name not in names:
+                if p.type == 'Continuous':
+                    problem.fixed_values[p.name] = p.initial_value
+                else:
+                    problem.fixed_values[p.name] = p.values[p.initial_value_idx]
+        return problem
+
+    def with_stop(self, stop):
+        '''Copy of this problem where Daisy stops at `stop` and the objective only uses targets up
+        to and including `stop`. Used to evaluate parameters on a shorter horizon.
+
+        Parameters
+        ----------
+        stop : str OR datetime.datetime OR pandas.Timestamp
+          Anything accepted by pandas.Timestamp
+
+        Returns
+        -------
+        DaisyOptimizationProblem
+        '''
+        problem = copy.copy(self)
+        problem.file_generator = self.file_generator.with_stop(stop)
+        problem.objective_fn = self.objective_fn.with_stop(stop)
+        return problem
 
     def _run(self, output_directory, named_parameters):
-        dai_file = self.file_generator(output_directory, named_parameters, tagged=True)['dai']
-        sim_result = self.runner(dai_file, output_directory)
+        with timed_phase('render'):
+            dai_file = self.file_generator(output_directory, named_parameters, tagged=True)['dai']
+        with timed_phase('simulate'):
+            sim_result = self.runner(dai_file, output_directory)
         if sim_result.returncode != 0:
             print(sim_result)
             return { self.objective_fn.name : np.nan }
-        return self.objective_fn(output_directory)
+        with timed_phase('objective'):
+            return self.objective_fn(output_directory)
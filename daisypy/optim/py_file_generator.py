@@ -1,5 +1,6 @@
 import os
 from .file_generator import FileGenerator
+from .timing import timed_phase
 
 class PyFileGenerator(FileGenerator):
     """Template based generation of python files using string replacement
@@ -62,11 +63,12 @@ class PyFileGenerator(FileGenerator):
         """
         if tagged:
             params = params['py']
-        os.makedirs(output_directory, exist_ok=True)
-        py_string = self.template_text.format(**params)
-        out_path = os.path.abspath(os.path.join(output_directory, self.out_file))
-        with open(out_path, "w", encoding='utf-8') as f:
-            f.write(py_string)
+        with timed_phase('render/py'):
+            os.makedirs(output_directory, exist_ok=True)
+            py_string = self.template_text.format(**params)
+            out_path = os.path.abspath(os.path.join(output_directory, self.out_file))
+            with open(out_path, "w", encoding='utf-8') as f:
+                f.write(py_string)
         if tagged:
             return { 'py' : out_path }
         return out_path
@@ -0,0 +1,86 @@
+'''Registry of named objects that are imported on first use'''
+import importlib
+import importlib.util
+from collections.abc import Mapping
+
+__all__ = [
+    'LazyRegistry',
+]
+
+class LazyRegistry(Mapping):
+    '''Mapping from names to objects defined in modules that are only imported when looked up.
+
+    An entry is available if all the packages it requires can be found. Finding a package does not
+    import it, so iterating over the registry is cheap. Unavailable entries behave as if they were
+    not in the registry.
+
+    Example
+    -------
+    >>> optimizers = LazyRegistry()
+    ... optimizers.register('cma', 'daisypy.optim.cma_optimizer', 'DaisyCMAOptimizer', ['cma'])
+    ... 'cma' in optimizers # Does not import cma
+    True
+    >>> optimizers['cma'] # Imports cma
+    <class 'daisypy.optim.cma_optimizer.DaisyCMAOptimizer'>
+    '''
+    def __init__(self):
+        self._entries = {}
+        self._loaded = {}
+
+    def register(self, name, module, attribute, requires=()):
+        '''Register an object
+
+        Parameters
+        ----------
+        name : str
+          Name to register object under
+
+        module : str
+          Absolute name of module defining the object
+
+        attribute : str
+          Name of object in module
+
+        requires : sequence of str
+          Top level packages that must be installed for the object to be available
+        '''
+        self._entries[name] = (module, attribute, tuple(requires))
+        self._loaded.pop(name, None)
+
+    def is_available(self, name):
+        '''Check if an entry is available without importing it
+
+        Parameters
+        ----------
+        name : str
+
+        Returns
+        -------
+        bool
+        '''
+        if name not in self._entries:
+            return False
+        return all(importlib.util.find_spec(package) is not None
+                   for package in self._entries[name][2])
+
+    def __getitem__(self, name):
+        if name in self._loaded:
+            return self._loaded[name]
+        if not self.is_available(name):
+            raise KeyError(name)
+        module, attribute, _ = self._entries[name]
+        value = getattr(importlib.import_module(module), attribute)
+        self._loaded[name] = value
+        return value
+
+    def __contains__(self, name):
+        return self.is_available(name)
+
+    def __iter__(self):
+        return (name for name in self._entries if self.is_available(name))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({list(self)})'
@@ -0,0 +1,546 @@
+'''CPU and memory available to this process.
+
+`os.cpu_count()` is the number of cores on the machine. In a container, a batch job or with
+`taskset` only some of them can be used. `available_cpus` takes the CPU affinity mask and the cgroup
+CPU quota into account, and is the default number of parallel evaluations in all optimizers.
+
+A single Daisy run can use several GB of memory, e.g. with a fine soil discretization, so the
+number of parallel evaluations can also be limited by memory. `MemoryAwareLimiter` computes how
+many evaluations fit in the available memory, given the peak resident set size of a Daisy run, and
+backs off when swap is being used. Use it through `AdaptiveExecutor` or `SharedPool`.
+
+Memory is read from /proc/meminfo and the cgroup of this process (v2 or v1). Where these are not
+available, memory does not limit the number of evaluations.
+
+Long simulations can be slowed down when the kernel migrates Daisy between NUMA nodes. A pool
+created with `create_executor(kind, max_workers, pinning=...)` gives each worker a slot of CPUs,
+and DaisyRunner pins Daisy to the slot of the worker that runs it. Slots are assigned round-robin
+across NUMA nodes, so that workers are spread evenly over the sockets
+  'core' : Each slot is a single CPU
+  'numa' : Each slot is all CPUs of a NUMA node
+Pinning is only available on Linux.
+'''
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import zip_longest
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+__all__ = [
+    'MemoryAwareLimiter',
+    'MemoryStatus',
+    'available_cpus',
+    'available_pinnings',
+    'children_peak_rss',
+    'default_workers',
+    'memory_status',
+    'numa_nodes',
+    'pinned_thread',
+    'pinning_slots',
+    'process_peak_rss',
+    'slot_cpus',
+    'wait_process',
+]
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+PROC_SELF_CGROUP = '/proc/self/cgroup'
+PROC_MEMINFO = '/proc/meminfo'
+NODE_ROOT = '/sys/devices/system/node'
+
+available_pinnings = ['core', 'numa']
+
+def _read(path, dir_fd=None):
+    def opener(path, flags):
+        return os.open(path, flags, dir_fd=dir_fd)
+    try:
+        with open(path, encoding='utf-8', opener=opener) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _cgroup_v2_dir():
+    # The cgroup of this process, or the root if it cannot be found, e.g. in a container where the
+    # cgroup namespace root is mounted at CGROUP_ROOT
+    content = _read(PROC_SELF_CGROUP)
+    if content is not None:
+        for line in content.splitlines():
+            if line.startswith('0::'):
+                path = os.path.join(CGROUP_ROOT, line[3:].lstrip('/'))
+                if os.path.isdir(path):
+                    return path
+    return CGROUP_ROOT
+
+def cgroup_cpu_quota():
+    '''Number of CPUs allowed by the cgroup CPU quota
+
+    Returns
+    -------
+    float OR None
+      None if there is no quota
+    '''
+    cpu_max = _read(os.path.join(_cgroup_v2_dir(), 'cpu.max'))
+    if cpu_max is not None:
+        quota, period = cpu_max.split()[:2]
+        if quota == 'max':
+            return None
+        return int(quota) / int(period)
+    quota = _read(os.path.join(CGROUP_ROOT, 'cpu', 'cpu.cfs_quota_us'))
+    period = _read(os.path.join(CGROUP_ROOT, 'cpu', 'cpu.cfs_period_us'))
+    if quota is None or period is None or int(quota) <= 0:
+        return None
+    return int(quota) / int(period)
+
+def _affinity():
+    if hasattr(os, 'sched_getaffinity'):
+        return os.sched_getaffinity(0)
+    return set(range(os.cpu_count() or 1))
+
+def available_cpus():
+    '''Number of CPUs this process can use
+
+    This is the smallest of the number of CPUs in the affinity mask of the process and the cgroup
+    CPU quota, rounded up.
+
+    Returns
+    -------
+    int
+    '''
+    cpus = len(_affinity())
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+@dataclass
+class MemoryStatus:
+    '''Memory available to this process in bytes
+
+    available is the memory that can be used without swapping, and swap_used is the swap currently
+    in use. Either is None if it cannot be determined.
+    '''
+    available : int = None
+    swap_used : int = None
+
+def _meminfo():
+    content = _read(PROC_MEMINFO)
+    if content is None:
+        return {}
+    values = {}
+    for line in content.splitlines():
+        name, _, value = line.partition(':')
+        fields = value.split()
+        if len(fields) > 0:
+            values[name] = int(fields[0]) * 1024 # kB
+    return values
+
+def _cgroup_memory():
+    # Returns (limit, usage, swap) of the cgroup. Any of them can be None
+    path = _cgroup_v2_dir()
+    limit = _read(os.path.join(path, 'memory.max'))
+    if limit is not None:
+        usage = _read(os.path.join(path, 'memory.current'))
+        swap = _read(os.path.join(path, 'memory.swap.current'))
+    else:
+        path = os.path.join(CGROUP_ROOT, 'memory')
+        limit = _read(os.path.join(path, 'memory.limit_in_bytes'))
+        usage = _read(os.path.join(path, 'memory.usage_in_bytes'))
+        swap = None
+    def to_int(value):
+        return int(value) if value is not None and value != 'max' else None
+    limit = to_int(limit)
+    if limit is not None and limit >= 2**60:
+        limit = None # cgroup v1 reports no limit as a very large number
+    return limit, to_int(usage), to_int(swap)
+
+def memory_status():
+    '''Read the memory available to this process
+
+    Returns
+    -------
+    MemoryStatus
+    '''
+    meminfo = _meminfo()
+    available = meminfo.get('MemAvailable')
+    swap_used = None
+    if 'SwapTotal' in meminfo and 'SwapFree' in meminfo:
+        swap_used = meminfo['SwapTotal'] - meminfo['SwapFree']
+    limit, usage, cgroup_swap = _cgroup_memory()
+    if limit is not None and usage is not None:
+        cgroup_available = max(0, limit - usage)
+        available = cgroup_available if available is None else min(available, cgroup_available)
+    if cgroup_swap is not None:
+        swap_used = cgroup_swap if swap_used is None else max(swap_used, cgroup_swap)
+    return MemoryStatus(available, swap_used)
+
+def rusage_peak_rss(rusage):
+    '''Peak resident set size in bytes from a resource.struct_rusage'''
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == 'darwin':
+        return rusage.ru_maxrss
+    return rusage.ru_maxrss * 1024
+
+def children_peak_rss():
+    '''Peak resident set size of the largest terminated child process of this process
+
+    This is the largest child so far, not the most recent one, so it is an upper bound on the peak
+    of the most recent child. On Linux the peak of a child includes the resident set size of this
+    process when the child was started, so use `wait_process` to measure a single program.
+
+    Returns
+    -------
+    int OR None
+      Bytes. None if not available on this platform
+    '''
+    if resource is None:
+        return None
+    return rusage_peak_rss(resource.getrusage(resource.RUSAGE_CHILDREN))
+
+def process_peak_rss(pid):
+    '''Peak resident set size of a running process, from VmHWM in /proc/<pid>/status
+
+    Parameters
+    ----------
+    pid : int
+
+    Returns
+    -------
+    int OR None
+      Bytes. None if the process has exited or /proc is not available
+    '''
+    return _vm_hwm(_read(f'/proc/{pid}/status'))
+
+def _vm_hwm(status):
+    if status is None:
+        return None
+    for line in status.splitlines():
+        name, _, value = line.partition(':')
+        if name == 'VmHWM':
+            return int(value.split()[0]) * 1024 # kB
+    return None
+
+def _sample_peak_rss(proc_dir, stop, interval, peak):
+    # Runs in a thread. Reading through the directory of the process, rather than its pid, fails
+    # once the process has been waited for, so another process reusing the pid is never read
+    delay = 0.001
+    while not stop.wait(delay):
+        polled = _vm_hwm(_read('status', dir_fd=proc_dir))
+        if polled is not None:
+            peak[0] = polled # The high water mark never decreases
+        delay = min(2 * delay, interval)
+
+def wait_process(pid, interval=0.5):
+    '''Wait for a child process to exit and measure its peak resident set size
+
+    On Linux, ru_maxrss of a child is at least the high water mark of the address space it was
+    created from, even after exec. A program started from a worker holding a large heap, e.g. Ax
+    models, therefore reports the heap of the worker as its own peak. Instead the high water mark
+    of the program itself is polled in a separate thread while this thread blocks in `os.wait4`,
+    so waiting is as fast as `subprocess.Popen.wait`. ru_maxrss is only used when it is larger than
+    the peak of this process, so it cannot come from this process.
+
+    Parameters
+    ----------
+    pid : int
+      Child process that has not been waited for
+
+    interval : float
+      Maximum number of seconds between polls. Polling starts fast, so short runs are measured.
+      Memory allocated in the last interval before the program exits is missed
+
+    Returns
+    -------
+    (int, int OR None)
+      Exit code as returned by `os.waitstatus_to_exitcode` and peak resident set size in bytes, or
+      None if it is not known
+    '''
+    own_peak = None
+    if resource is not None:
+        own_peak = rusage_peak_rss(resource.getrusage(resource.RUSAGE_SELF))
+    peak = [None]
+    stop = threading.Event()
+    sampler = None
+    try:
+        proc_dir = os.open(f'/proc/{pid}', os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        proc_dir = None # Not Linux
+    else:
+        sampler = threading.Thread(
+            target=_sample_peak_rss, args=(proc_dir, stop, interval, peak), daemon=True
+        )
+        sampler.start()
+    try:
+        _, status, rusage = os.wait4(pid, 0)
+    finally:
+        stop.set()
+        if sampler is not None:
+            sampler.join()
+            os.close(proc_dir)
+    peak_rss = peak[0]
+    child_peak = rusage_peak_rss(rusage)
+    if own_peak is not None and child_peak > own_peak:
+        peak_rss = child_peak
+    return os.waitstatus_to_exitcode(status), peak_rss
+
+def default_workers(peak_rss=None, reserve=2**30):
+    '''Number of parallel evaluations that fit the CPUs and memory available
+
+    Parameters
+    ----------
+    peak_rss : int OR None
+      Peak resident set size of a single evaluation in bytes. If None memory is not considered
+
+    reserve : int
+      Bytes of available memory to leave free
+
+    Returns
+    -------
+    int
+    '''
+    workers = available_cpus()
+    if peak_rss:
+        available = memory_status().available
+        if available is not None:
+            workers = min(workers, max(1, (available - reserve) // peak_rss))
+    return workers
+
+
+class MemoryAwareLimiter:
+    # pylint: disable=too-many-instance-attributes
+    '''Number of parallel evaluations allowed by the memory available right now
+
+    The limit is the number of evaluations running plus the number of additional evaluations that
+    fit in the available memory, never more than `max_workers` and never less than one. The peak
+    resident set size of an evaluation is the largest observed so far, see `observe`. Until one is
+    observed, only swap limits the number of evaluations.
+
+    When swap use grows, the limit is halved. When it stops growing, the limit is raised by one per
+    check until it is back at what memory allows.
+
+    Safe to use from multiple threads.
+    '''
+    def __init__(
+            self, max_workers=None, peak_rss=None, reserve=2**30, interval=1.0,
+            swap_tolerance=64 * 2**20
+    ):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        '''
+        Parameters
+        ----------
+        max_workers : int > 0 OR None
+          Upper limit. If None use available_cpus()
+
+        peak_rss : int OR None
+          Initial estimate of the peak resident set size of an evaluation in bytes
+
+        reserve : int
+          Bytes of available memory to leave free
+
+        interval : float
+          Seconds between reading memory status. In between the previous limit is used
+
+        swap_tolerance : int
+          Growth in swap use, in bytes, that is ignored
+        '''
+        self.max_workers = max_workers if max_workers is not None else available_cpus()
+        self.peak_rss = peak_rss
+        self.reserve = reserve
+        self.interval = interval
+        self.swap_tolerance = swap_tolerance
+        self.current_limit = self.max_workers
+        self._swap_used = None
+        self._last_check = None
+        self._lock = threading.Lock()
+
+    def observe(self, peak_rss):
+        '''Update the estimate of the peak resident set size of an evaluation
+
+        Parameters
+        ----------
+        peak_rss : int OR None
+          Bytes. If None nothing is updated
+        '''
+        if peak_rss is None:
+            return
+        with self._lock:
+            self.peak_rss = peak_rss if self.peak_rss is None else max(self.peak_rss, peak_rss)
+
+    def limit(self, in_flight):
+        '''Number of evaluations allowed to run at the same time
+
+        Parameters
+        ----------
+        in_flight : int
+          Number of evaluations running now
+
+        Returns
+        -------
+        int
+        '''
+        with self._lock:
+            now = time.monotonic()
+            if self._last_check is not None and now - self._last_check < self.interval:
+                return self.current_limit
+            self._last_check = now
+            status = memory_status()
+            target = self.max_workers
+            if self.peak_rss and status.available is not None:
+                fit = in_flight + (status.available - self.reserve) // self.peak_rss
+                target = max(1, min(target, fit))
+            swapping = (
+                status.swap_used is not None and self._swap_used is not None and
+                status.swap_used - self._swap_used > self.swap_tolerance
+            )
+            if status.swap_used is not None:
+                self._swap_used = status.swap_used
+            if swapping:
+                self.current_limit = max(1, min(target, self.current_limit // 2))
+            elif target > self.current_limit:
+                self.current_limit += 1
+            else:
+                self.current_limit = target
+            return self.current_limit
+
+
+def parse_cpulist(text):
+    '''Parse a Linux CPU list, e.g. '0-3,8,10-11'
+
+    Returns
+    -------
+    set of int
+    '''
+    cpus = set()
+    for part in text.split(','):
+        part = part.strip()
+        if part == '':
+            continue
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+def numa_nodes():
+    '''CPUs this process can use, grouped by NUMA node
+
+    Returns
+    -------
+    list of list of int
+      One sorted list of CPUs per NUMA node that has any. A single group with all CPUs if the NUMA
+      topology is not available
+    '''
+    allowed = _affinity()
+    nodes = []
+    try:
+        names = sorted(
+            (name for name in os.listdir(NODE_ROOT) if name.startswith('node')),
+            key=lambda name: int(name[4:])
+        )
+    except (OSError, ValueError):
+        names = []
+    for name in names:
+        cpulist = _read(os.path.join(NODE_ROOT, name, 'cpulist'))
+        if cpulist is not None:
+            cpus = sorted(parse_cpulist(cpulist) & allowed)
+            if len(cpus) > 0:
+                nodes.append(cpus)
+    if len(nodes) == 0:
+        nodes = [sorted(allowed)]
+    return nodes
+
+def pinning_slots(pinning, slots):
+    '''CPUs of each worker slot, round-robin across NUMA nodes
+
+    Parameters
+    ----------
+    pinning : str
+      'core' for a single CPU per slot or 'numa' for all CPUs of a NUMA node per slot
+
+    slots : int > 0
+      Number of slots. If there are more slots than CPUs, CPUs are shared
+
+    Returns
+    -------
+    list of set of int
+    '''
+    if pinning not in available_pinnings:
+        raise ValueError(f'pinning must be one of {available_pinnings}. Got {pinning}')
+    nodes = numa_nodes()
+    if pinning == 'numa':
+        return [set(nodes[i % len(nodes)]) for i in range(slots)]
+    # Take the first CPU of each node, then the second, and so on
+    cores = [cpu for group in zip_longest(*nodes) for cpu in group if cpu is not None]
+    return [{cores[i % len(cores)]} for i in range(slots)]
+
+_slot = threading.local()
+
+def assign_slot(counter, slots):
+    '''Give the calling worker the next slot. Used as initializer of pinned pools
+
+    Parameters
+    ----------
+    counter : multiprocessing.Value
+      Shared counter of assigned slots
+
+    slots : list of set of int
+      CPUs of each slot
+    '''
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    _slot.cpus = slots[index % len(slots)]
+
+def pinned_pool_arguments(pinning, slots):
+    '''Keyword arguments that make a ProcessPoolExecutor or ThreadPoolExecutor assign slots
+
+    Returns
+    -------
+    dict
+    '''
+    if not hasattr(os, 'sched_setaffinity'):
+        raise ValueError('pinning is only available on Linux')
+    return {
+        'initializer' : assign_slot,
+        'initargs' : (multiprocessing.Value('i', 0), pinning_slots(pinning, slots)),
+    }
+
+def slot_cpus():
+    '''CPUs of the slot of the calling worker
+
+    Returns
+    -------
+    set of int OR None
+      None if the worker is not in a pinned pool
+    '''
+    return getattr(_slot, 'cpus', None)
+
+@contextmanager
+def pinned_thread(cpus):
+    '''Restrict the calling thread to a set of CPUs while in the context
+
+    A process started from the thread in the context inherits the mask, so it is pinned before it
+    runs any code. Pinning a process after it is started races with the threads and allocations it
+    makes on startup.
+
+    Parameters
+    ----------
+    cpus : iterable of int OR None
+      If None the mask is not changed
+    '''
+    if cpus is None:
+        yield
+        return
+    # On Linux pid 0 is the calling thread, not the whole process
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cpus)
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, previous)
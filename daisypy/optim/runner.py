@@ -1,10 +1,31 @@
 import os
+import shutil
 import subprocess
+from .resources import pinned_thread, slot_cpus, wait_process
+from .spawn_helper import get_spawn_helper
+from .timing import record_peak_rss
+
+available_launchers = ['subprocess', 'posix_spawn', 'helper']
 
 class DaisyRunner:
-    """Class that knows how to run run daisy"""
+    """Class that knows how to run run daisy
+
+    Daisy can be launched in three ways
+      'subprocess'  : subprocess.run. Default
+      'posix_spawn' : os.posix_spawn, which does not copy the address space of the calling process.
+                      Only available on POSIX systems.
+      'helper'      : A small helper process, started when the runner is created, launches Daisy
+                      on request. Use this when the process calling the runner holds a large heap,
+                      e.g. Ax models, and is not a pool worker. Only available on POSIX systems.
+
+    The peak resident set size of Daisy is recorded in the Timings of the evaluation, where the
+    platform allows. See `wait_process`.
+
+    Daisy can be pinned to a set of CPUs. By default it is pinned to the slot of the worker running
+    it, if the worker is in a pool created with pinning. See `create_executor`.
+    """
 
-    def __init__(self, daisy_bin, daisy_home=None):
+    def __init__(self, daisy_bin, daisy_home=None, launcher='subprocess', cpus=None):
         """
         Parameters
         ----------
@@ -14,10 +35,29 @@ class DaisyRunner:
         daisy_home : str
           Path to daisy home directory containing lib/ and sample/
           If not None set DAISYHOME environment variable to daisy_home. Otherwise dont set DAISYHOME
+
+        launcher : str
+          How to launch Daisy. One of 'subprocess', 'posix_spawn' and 'helper'
+
+        cpus : iterable of int OR None
+          CPUs to pin Daisy to. If None pin to the slot of the worker, if any. Linux only
         """
+        if launcher not in available_launchers:
+            raise ValueError(f'launcher must be one of {available_launchers}. Got {launcher}')
+        if launcher == 'posix_spawn' and not hasattr(os, 'posix_spawn'):
+            raise ValueError('posix_spawn is not available on this platform')
+        if launcher == 'helper' and os.name != 'posix':
+            raise ValueError('helper is only available on POSIX systems')
+        if cpus is not None and not hasattr(os, 'sched_setaffinity'):
+            raise ValueError('cpus is only supported on Linux')
         self.daisy_bin = daisy_bin
+        self.launcher = launcher
+        self.cpus = sorted(cpus) if cpus is not None else None
         if daisy_home is not None:
-            os.environ.update('DAISYHOME', daisy_home)
+            os.environ['DAISYHOME'] = daisy_home
+        if launcher == 'helper':
+            # Start the helper now, while the heap of this process is small
+            get_spawn_helper()
 
     def __call__(self, dai_file, output_directory):
         """Run daisy
@@ -40,7 +80,21 @@ class DaisyRunner:
             "-d", output_directory,
             dai_file
         ]
-        return subprocess.run(args, check=False)
+        cpus = self.cpus if self.cpus is not None else slot_cpus()
+        if self.launcher == 'posix_spawn':
+            return _posix_spawn_run(args, cpus)
+        if self.launcher == 'helper':
+            result = get_spawn_helper().run(args, cpus=cpus)
+            record_peak_rss(result.peak_rss)
+            return result
+        with pinned_thread(cpus):
+            process = subprocess.Popen(args) # pylint: disable=consider-using-with
+        with process:
+            if not hasattr(os, 'wait4'): # Windows
+                return subprocess.CompletedProcess(args, process.wait())
+            process.returncode, peak_rss = wait_process(process.pid)
+        record_peak_rss(peak_rss)
+        return subprocess.CompletedProcess(args, process.returncode)
 
 
     def serialize(self):
@@ -52,7 +106,9 @@ class DaisyRunner:
         """
         return {
             'daisy_bin' : self.daisy_bin,
-            'daisy_home' : os.environ.get('DAISYHOME', None)
+            'daisy_home' : os.environ.get('DAISYHOME', None),
+            'launcher' : self.launcher,
+            'cpus' : self.cpus,
         }
 
     @staticmethod
@@ -65,5 +121,27 @@ class DaisyRunner:
           Must contain
             daisy_bin : path to daisy binary
             daisy_home : path to daisy home
+          May contain
+            launcher : how to launch daisy. Defaults to 'subprocess'
+            cpus : CPUs to pin daisy to. Defaults to None
         """
-        return DaisyRunner(dict_repr['daisy_bin'], dict_repr['daisy_home'])
+        return DaisyRunner(
+            dict_repr['daisy_bin'],
+            dict_repr['daisy_home'],
+            dict_repr.get('launcher', 'subprocess'),
+            dict_repr.get('cpus', None)
+        )
+
+
+def _posix_spawn_run(args, cpus=None):
+    # Like subprocess.run(args, check=False), but without forking the calling process
+    path = args[0]
+    if os.path.dirname(path) == '':
+        path = shutil.which(path)
+        if path is None:
+            raise FileNotFoundError(f'No such file or directory: {args[0]!r}')
+    with pinned_thread(cpus):
+        pid = os.posix_spawn(path, args, os.environ)
+    returncode, peak_rss = wait_process(pid)
+    record_peak_rss(peak_rss)
+    return subprocess.CompletedProcess(args, returncode)
@@ -0,0 +1,215 @@
+'''Predict the runtime of evaluations and submit the slowest first.
+
+The runtime of Daisy depends on the parameters and the scenario. When a batch of evaluations is
+submitted in list order, a slow evaluation that is submitted last stretches the time until the
+whole batch is done. `map_longest_first` submits the evaluations with the longest predicted runtime
+first, and returns results in the order of the batch, like `Executor.map`.
+
+Runtimes are predicted from the runtimes observed so far, with either
+  'nearest' : Mean runtime of the k nearest observed parameter sets, with each numeric parameter
+              scaled to the observed range. Non-numeric parameters add one to the distance when
+              they differ
+  'linear'  : Least squares fit of runtime on numeric parameters
+Only observations of the same scenario are used, unless there are none.
+'''
+import threading
+import numpy as np
+from .timing import result_timings
+
+__all__ = [
+    'RuntimePredictor',
+    'available_runtime_predictors',
+    'longest_first',
+    'map_longest_first',
+    'observe_result',
+]
+
+available_runtime_predictors = ['nearest', 'linear']
+
+def _split(params):
+    # Split parameter values into numeric and other values
+    numeric = []
+    other = []
+    for value in params:
+        try:
+            numeric.append(float(value))
+        except (TypeError, ValueError):
+            other.append(str(value))
+    return numeric, other
+
+
+class RuntimePredictor:
+    '''Predict the runtime of an evaluation from observed runtimes. Safe to use from multiple
+    threads.'''
+    def __init__(self, method='nearest', k=3):
+        '''
+        Parameters
+        ----------
+        method : str
+          'nearest' or 'linear'
+
+        k : int > 0
+          Number of neighbours used by 'nearest'
+        '''
+        if method not in available_runtime_predictors:
+            raise ValueError(
+                f'method must be one of {available_runtime_predictors}. Got {method}'
+            )
+        self.method = method
+        self.k = k
+        self._observations = {}
+        self._lock = threading.Lock()
+
+    def observe(self, params, seconds, scenario=None):
+        '''Record the runtime of an evaluation
+
+        Parameters
+        ----------
+        params : list
+          Parameter values
+
+        seconds : float
+          Runtime
+
+        scenario : hashable OR None
+          Scenario the parameters were evaluated in
+        '''
+        numeric, other = _split(params)
+        with self._lock:
+            self._observations.setdefault(scenario, []).append((numeric, other, seconds))
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(observations) for observations in self._observations.values())
+
+    def predict(self, params, scenario=None):
+        '''Predict the runtime of an evaluation
+
+        Parameters
+        ----------
+        params : list
+          Parameter values
+
+        scenario : hashable OR None
+          Scenario the parameters will be evaluated in
+
+        Returns
+        -------
+        float OR None
+          Seconds. None if nothing has been observed
+        '''
+        with self._lock:
+            observations = self._observations.get(scenario)
+            if not observations:
+                observations = [o for group in self._observations.values() for o in group]
+            observations = list(observations)
+        if len(observations) == 0:
+            return None
+        numeric, other = _split(params)
+        # Parameters of different types cannot be compared, use the observations that match
+        observations = [
+            o for o in observations if len(o[0]) == len(numeric) and len(o[1]) == len(other)
+        ]
+        if len(observations) == 0:
+            return None
+        x = np.array([o[0] for o in observations], dtype=float).reshape(len(observations), -1)
+        y = np.array([o[2] for o in observations])
+        if self.method == 'linear':
+            return self._predict_linear(x, y, np.array(numeric))
+        scale = x.max(axis=0) - x.min(axis=0)
+        scale[scale == 0] = 1
+        distance = (((x - numeric) / scale)**2).sum(axis=1)
+        distance += np.array([sum(a != b for a, b in zip(o[1], other)) for o in observations])
+        nearest = np.argsort(distance, kind='stable')[:self.k]
+        return float(y[nearest].mean())
+
+    @staticmethod
+    def _predict_linear(x, y, numeric):
+        features = np.column_stack([x, np.ones(len(x))])
+        if len(x) < features.shape[1]:
+            return float(y.mean())
+        coefficients, *_ = np.linalg.lstsq(features, y, rcond=None)
+        return float(np.append(numeric, 1) @ coefficients)
+
+
+def longest_first(parameter_sets, predictor, scenario=None):
+    '''Order parameter sets by predicted runtime, longest first
+
+    Parameters
+    ----------
+    parameter_sets : list of list
+
+    predictor : RuntimePredictor
+
+    scenario : hashable OR None
+      Passed to the predictor
+
+    Returns
+    -------
+    list of int
+      Indices into parameter_sets. Without predictions the order is unchanged
+    '''
+    predictions = [predictor.predict(params, scenario) for params in parameter_sets]
+    # Sorting is stable, so without predictions the order is unchanged
+    return sorted(
+        range(len(parameter_sets)),
+        key=lambda i: -predictions[i] if predictions[i] is not None else 0
+    )
+
+def observe_result(predictor, params, result, scenario=None):
+    '''Pass the total time of an evaluation, from the Timings of its result, to the predictor
+
+    Parameters
+    ----------
+    predictor : RuntimePredictor
+
+    params : list
+      Parameter values of the evaluation
+
+    result : ObjectiveMap OR (float, Timings OR None)
+      Results without Timings are ignored
+
+    scenario : hashable OR None
+    '''
+    timings = result_timings(result)
+    if timings is not None and 'total' in timings.phases:
+        predictor.observe(params, timings.phases['total'], scenario)
+
+def map_longest_first(executor, fn, parameter_sets, predictor, scenario=None):
+    '''Like `executor.map(fn, parameter_sets)`, but submit the longest predicted evaluations first
+
+    The total time of each evaluation, from the Timings of the result, is passed to the predictor.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+
+    fn : callable
+      Called with each parameter set. Usually a problem
+
+    parameter_sets : list of list
+
+    predictor : RuntimePredictor
+
+    scenario : hashable OR None
+      Passed to the predictor
+
+    Returns
+    -------
+    iterator
+      Results in the order of parameter_sets
+    '''
+    futures = [None] * len(parameter_sets)
+    for i in longest_first(parameter_sets, predictor, scenario):
+        futures[i] = executor.submit(fn, parameter_sets[i])
+
+    def results():
+        try:
+            for params, future in zip(parameter_sets, futures):
+                result = future.result()
+                observe_result(predictor, params, result, scenario)
+                yield result
+        finally:
+            for future in futures:
+                future.cancel()
+    return results()
@@ -1,3 +1,4 @@
+import copy
 import pandas as pd
 from .loss_wrapper import LossWrapper
 
@@ -56,3 +57,22 @@ class ScalarObjective:
         """
         actual = self.data_extractor(daisy_output_directory)
         return { self.name : self.loss_fn(actual, self.target) }
+
+    def with_stop(self, stop):
+        """Copy of this objective that only uses targets up to and including `stop`
+
+        Use it to compute the loss of a simulation that stops early. See
+        `DaiFileGenerator.with_stop`
+
+        Parameters
+        ----------
+        stop : str OR datetime.datetime OR pandas.Timestamp
+          Anything accepted by pandas.Timestamp
+
+        Returns
+        -------
+        ScalarObjective
+        """
+        objective = copy.copy(self)
+        objective.target = self.target[self.target["time"] <= pd.Timestamp(stop)]
+        return objective
@@ -0,0 +1,425 @@
+'''Global sensitivity screening of parameters.
+
+Before calibrating many parameters, screening finds the parameters that matter, so the budget of
+the optimizer is not spent on inert ones. Two methods are available
+  'morris' : Elementary effects along random one-at-a-time trajectories. Cheap, r * (k + 1)
+             evaluations for r trajectories and k parameters. Parameters are ranked by mu_star,
+             the mean absolute elementary effect
+  'sobol'  : Sobol indices from a Saltelli design. N * (k + 2) evaluations for N samples. S1 is the
+             share of the variance explained by a parameter alone and ST is the share including
+             interactions with other parameters
+
+Sobol designs are built from the valid ranges of the parameters with a scrambled Halton sequence,
+which covers the parameter space more evenly than random sampling. Morris trajectories start at
+random points of the level grid. All evaluations of a design are independent, so
+they are submitted as one batch to the executor. Confidence intervals of the indices are from
+bootstrap resampling of trajectories or samples.
+
+  result = screen(problem, 'morris', num_samples=20)
+  problem = problem.with_parameters(result.select(0.1))
+'''
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from .executor import evaluation_executor
+
+__all__ = [
+    'ScreeningResult',
+    'available_screening_methods',
+    'evaluate_design',
+    'halton',
+    'morris_design',
+    'morris_indices',
+    'screen',
+    'sobol_design',
+    'sobol_indices',
+]
+
+available_screening_methods = ['morris', 'sobol']
+
+def _primes(n):
+    primes = []
+    candidate = 2
+    while len(primes) < n:
+        if all(candidate % p != 0 for p in primes):
+            primes.append(candidate)
+        candidate += 1
+    return primes
+
+def _bounds(parameters):
+    for p in parameters:
+        if p.type != 'Continuous':
+            raise ValueError(f'Screening requires continuous parameters. {p.name} is {p.type}')
+    lower = np.array([p.valid_range[0] for p in parameters], dtype=float)
+    upper = np.array([p.valid_range[1] for p in parameters], dtype=float)
+    return lower, upper
+
+def _confidence(samples, conf_level):
+    # Half width of the central conf_level interval of bootstrap samples
+    low, high = np.nanpercentile(samples, [50 * (1 - conf_level), 50 * (1 + conf_level)], axis=0)
+    return (high - low) / 2
+
+def halton(n, d, seed=None, scramble=True):
+    '''Points of the Halton sequence in the unit cube
+
+    Without scrambling, the dimensions with bases larger than n are all i / base for i = 1, ..., n
+    and strongly correlated, which ruins designs with many parameters. Scrambling permutes the
+    digits of the radical inverse with a random permutation for each dimension and digit, which
+    removes the correlation and keeps the low discrepancy of the sequence.
+
+    Parameters
+    ----------
+    n : int
+      Number of points
+
+    d : int
+      Number of dimensions
+
+    seed : int OR None
+      Seed for the scrambling
+
+    scramble : bool
+      If False return the plain Halton sequence
+
+    Returns
+    -------
+    numpy.ndarray of shape (n, d)
+    '''
+    rng = np.random.default_rng(seed)
+    points = np.empty((n, d))
+    for j, base in enumerate(_primes(d)):
+        # Radical inverse of 1, ..., n. The first point of the sequence, 0, is skipped
+        i = np.arange(1, n + 1)
+        # Enough digits to reach double precision, so scrambled trailing zeros are random too
+        num_digits = int(np.ceil(53 * np.log(2) / np.log(base))) if scramble else None
+        scale = 1.0
+        value = np.zeros(n)
+        digit = 0
+        while np.any(i > 0) or (scramble and digit < num_digits):
+            scale /= base
+            if scramble:
+                value += scale * rng.permutation(base)[i % base]
+            else:
+                value += scale * (i % base)
+            i //= base
+            digit += 1
+        points[:, j] = value
+    return points
+
+def morris_design(parameters, num_trajectories=10, num_levels=4, seed=None):
+    '''Morris trajectories over the valid ranges of the parameters
+
+    Parameters
+    ----------
+    parameters : list of ContinuousParameter
+
+    num_trajectories : int > 0
+
+    num_levels : int > 1
+      Number of grid levels in each dimension. Steps are num_levels / (2 * (num_levels - 1)) of the
+      valid range
+
+    seed : int OR None
+
+    Returns
+    -------
+    numpy.ndarray of shape (num_trajectories * (k + 1), k)
+      Parameter values, one trajectory of k + 1 rows after the other. Consecutive rows of a
+      trajectory differ in one parameter
+    '''
+    lower, upper = _bounds(parameters)
+    k = len(parameters)
+    rng = np.random.default_rng(seed)
+    delta = num_levels / (2 * (num_levels - 1))
+    # Start points drawn uniformly from the grid
+    starts = rng.integers(num_levels, size=(num_trajectories, k)) / (num_levels - 1)
+    design = []
+    for x in starts:
+        design.append(x.copy())
+        for j in rng.permutation(k):
+            x[j] = x[j] + delta if x[j] + delta <= 1 + 1e-12 else x[j] - delta
+            design.append(x.copy())
+    return lower + np.array(design) * (upper - lower)
+
+def sobol_design(parameters, num_samples=64, seed=None):
+    '''Saltelli design for Sobol indices over the valid ranges of the parameters
+
+    Parameters
+    ----------
+    parameters : list of ContinuousParameter
+
+    num_samples : int > 0
+      Number of base samples N
+
+    seed : int OR None
+
+    Returns
+    -------
+    numpy.ndarray of shape (num_samples * (k + 2), k)
+      Parameter values as blocks of N rows: A, B and A with column i from B for each parameter i
+    '''
+    lower, upper = _bounds(parameters)
+    k = len(parameters)
+    samples = halton(num_samples, 2 * k, seed)
+    a, b = samples[:, :k], samples[:, k:]
+    blocks = [a, b]
+    for i in range(k):
+        ab = a.copy()
+        ab[:, i] = b[:, i]
+        blocks.append(ab)
+    return lower + np.vstack(blocks) * (upper - lower)
+
+def evaluate_design(problem, design, executor='process', number_of_processes=None):
+    '''Evaluate all parameter sets of a design as one batch
+
+    Parameters
+    ----------
+    problem : DaisyOptimizationProblem
+
+    design : numpy.ndarray of shape (n, k)
+
+    executor : str OR concurrent.futures.Executor
+      See `evaluation_executor`
+
+    number_of_processes : int > 0 OR None
+      Passed to `evaluation_executor`
+
+    Returns
+    -------
+    pandas.DataFrame
+      One row per parameter set and one column per objective. Failed evaluations are nan
+    '''
+    with evaluation_executor(executor, number_of_processes) as pool:
+        results = [dict(result) for result in pool.map(problem, [list(x) for x in design])]
+    # A failed evaluation of a multi objective only has the name of the objective
+    return pd.DataFrame(results, dtype=float).dropna(axis=1, how='all')
+
+def morris_indices(
+        parameters, design, values, num_resamples=1000, conf_level=0.95, seed=None
+):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    '''Elementary effect statistics of a Morris design
+
+    Parameters
+    ----------
+    parameters : list of ContinuousParameter
+
+    design : numpy.ndarray
+      As returned by `morris_design`
+
+    values : array_like
+      Objective value of each row of the design. Effects involving nan values are ignored
+
+    num_resamples : int
+      Number of bootstrap resamples for the confidence interval of mu_star
+
+    conf_level : float in (0, 1)
+
+    seed : int OR None
+
+    Returns
+    -------
+    pandas.DataFrame
+      Columns 'mu', 'mu_star', 'sigma' and 'mu_star_conf', the half width of the confidence
+      interval of mu_star, indexed by parameter name. Effects are per unit of the valid range
+    '''
+    lower, upper = _bounds(parameters)
+    k = len(parameters)
+    unit = ((np.asarray(design) - lower) / (upper - lower)).reshape(-1, k + 1, k)
+    values = np.asarray(values, dtype=float).reshape(-1, k + 1)
+    effects = np.full((len(unit), k), np.nan)
+    for t, (x, y) in enumerate(zip(unit, values)):
+        dx = np.diff(x, axis=0)
+        changed = np.argmax(np.abs(dx), axis=1)
+        effects[t, changed] = np.diff(y) / dx[np.arange(k), changed]
+    rng = np.random.default_rng(seed)
+    conf = np.full(k, np.nan)
+    for j in range(k):
+        valid = np.abs(effects[~np.isnan(effects[:, j]), j])
+        if len(valid) > 0:
+            resamples = rng.choice(valid, (num_resamples, len(valid)))
+            conf[j] = _confidence(resamples.mean(axis=1), conf_level)
+    with np.errstate(invalid='ignore'):
+        return pd.DataFrame({
+            'mu' : np.nanmean(effects, axis=0),
+            'mu_star' : np.nanmean(np.abs(effects), axis=0),
+            'sigma' : np.nanstd(effects, axis=0, ddof=1),
+            'mu_star_conf' : conf,
+        }, index=pd.Index([p.name for p in parameters], name='parameter'))
+
+def _sobol(y_a, y_b, y_ab):
+    variance = np.var(np.concatenate([y_a, y_b], axis=-1), axis=-1)
+    # Saltelli (2010) estimator of S1 and Jansen estimator of ST
+    first = np.mean(y_b[..., None, :] * (y_ab - y_a[..., None, :]), axis=-1)
+    total = 0.5 * np.mean((y_a[..., None, :] - y_ab)**2, axis=-1)
+    return first / variance[..., None], total / variance[..., None]
+
+def sobol_indices(parameters, values, num_resamples=1000, conf_level=0.95, seed=None):
+    '''First order and total Sobol indices of a Saltelli design
+
+    Parameters
+    ----------
+    parameters : list of ContinuousParameter
+
+    values : array_like
+      Objective value of each row of the design returned by `sobol_design`. Samples with a nan value
+      in any block are ignored
+
+    num_resamples : int
+      Number of bootstrap resamples for the confidence intervals
+
+    conf_level : float in (0, 1)
+
+    seed : int OR None
+
+    Returns
+    -------
+    pandas.DataFrame
+      Columns 'S1', 'S1_conf', 'ST' and 'ST_conf', where the _conf columns are half widths of the
+      confidence intervals, indexed by parameter name
+    '''
+    k = len(parameters)
+    values = np.asarray(values, dtype=float).reshape(k + 2, -1)
+    values = values[:, ~np.isnan(values).any(axis=0)]
+    y_a, y_b, y_ab = values[0], values[1], values[2:]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        first, total = _sobol(y_a, y_b, y_ab)
+        resamples = np.random.default_rng(seed).integers(
+            values.shape[1], size=(num_resamples, values.shape[1])
+        )
+        first_resampled, total_resampled = _sobol(
+            y_a[resamples], y_b[resamples], np.moveaxis(y_ab[:, resamples], 0, 1)
+        )
+    return pd.DataFrame({
+        'S1' : first,
+        'S1_conf' : _confidence(first_resampled, conf_level),
+        'ST' : total,
+        'ST_conf' : _confidence(total_resampled, conf_level),
+    }, index=pd.Index([p.name for p in parameters], name='parameter'))
+
+
+@dataclass
+class ScreeningResult:
+    '''Result of `screen`
+
+    Attributes
+    ----------
+    method : str
+      'morris' OR 'sobol'
+
+    parameters : list of ContinuousParameter
+
+    design : numpy.ndarray
+      Evaluated parameter sets
+
+    values : pandas.DataFrame
+      Objective values of the parameter sets, one column per objective
+
+    indices : dict of (str, pandas.DataFrame)
+      Sensitivity indices for each objective. See `morris_indices` and `sobol_indices`
+    '''
+    method: str
+    parameters: list
+    design: np.ndarray
+    values: pd.DataFrame
+    indices: dict
+
+    def select(self, threshold=0.1, objective=None):
+        '''Parameters that matter
+
+        Parameters
+        ----------
+        threshold : float
+          For 'morris', keep parameters with mu_star at least threshold times the largest mu_star.
+          For 'sobol', keep parameters with ST at least threshold
+
+        objective : str OR None
+          Name of objective. If None keep parameters that matter for any objective
+
+        Returns
+        -------
+        list of ContinuousParameter
+          In the order of the problem. Pass them to `DaisyOptimizationProblem.with_parameters`
+        '''
+        objectives = list(self.indices) if objective is None else [objective]
+        keep = set()
+        for name in objectives:
+            indices = self.indices[name]
+            if self.method == 'morris':
+                mu_star = indices['mu_star']
+                keep.update(indices.index[mu_star >= threshold * mu_star.max()])
+            else:
+                keep.update(indices.index[indices['ST'] >= threshold])
+        return [p for p in self.parameters if p.name in keep]
+
+
+def screen(
+        problem, method='morris', num_samples=None, num_levels=4, num_resamples=1000,
+        conf_level=0.95, seed=None, executor='process', number_of_processes=None, logger=None
+):
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    '''Screen the parameters of a problem
+
+    Parameters
+    ----------
+    problem : DaisyOptimizationProblem
+      Problem with continuous parameters
+
+    method : str
+      'morris' OR 'sobol'
+
+    num_samples : int > 0 (Optional)
+      Number of trajectories for 'morris', default 10, or number of base samples for 'sobol',
+      default 64
+
+    num_levels : int > 1
+      Number of grid levels for 'morris'
+
+    num_resamples : int
+      Number of bootstrap resamples for confidence intervals
+
+    conf_level : float in (0, 1)
+
+    seed : int OR None
+
+    executor : str OR concurrent.futures.Executor
+      See `evaluation_executor`
+
+    number_of_processes : int > 0 OR None
+      Passed to `evaluation_executor`
+
+    logger : Logger (Optional)
+      If not None log each evaluation to the result log, so it can be read with `read_history`
+
+    Returns
+    -------
+    ScreeningResult
+    '''
+    if method not in available_screening_methods:
+        raise ValueError(f'method must be one of {available_screening_methods}. Got {method}')
+    parameters = problem.parameters
+    if method == 'morris':
+        num_samples = 10 if num_samples is None else num_samples
+        design = morris_design(parameters, num_samples, num_levels, seed)
+    else:
+        num_samples = 64 if num_samples is None else num_samples
+        design = sobol_design(parameters, num_samples, seed)
+    if logger is not None:
+        logger.info(f'Screening with {method} using {len(design)} function evaluations')
+    values = evaluate_design(problem, design, executor, number_of_processes)
+    if logger is not None:
+        for i, (x, row) in enumerate(zip(design, values.itertuples(index=False))):
+            params = { f'param_{p.name}' : value for p, value in zip(parameters, x) }
+            metrics = { f'metric_{name}' : value for name, value in zip(values.columns, row) }
+            logger.result(sample=i, tag='raw', **metrics, **params)
+    indices = {}
+    for name in values.columns:
+        if method == 'morris':
+            indices[name] = morris_indices(
+                parameters, design, values[name], num_resamples, conf_level, seed
+            )
+        else:
+            indices[name] = sobol_indices(
+                parameters, values[name], num_resamples, conf_level, seed
+            )
+    return ScreeningResult(method, parameters, design, values, indices)
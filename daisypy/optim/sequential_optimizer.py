@@ -1,17 +1,26 @@
 # pylint: disable=too-few-public-methods,R0801
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, wait
+from functools import partial
 import numpy as np
+from .executor import evaluation_executor, executor_max_workers
 from .parameter import CategoricalParameter
 from .problem import ScalarProblemWrapper
+from .runtime import RuntimePredictor, longest_first, map_longest_first, observe_result
+from .timing import TimingSummary, fidelity_column, is_estimate
+from .trace import Tracer
 
 class DaisySequentialOptimizer:
+    # pylint: disable=too-many-instance-attributes,too-many-arguments,too-many-positional-arguments
     """Daisy optimizer using a sequential approach
 
     The method starts from the initial parameters. Then it changes each parameter in turn.
     The single parameter leading to best performance is then fixed and the process repeated
     untill all parameters are fixed.
     """
-    def __init__(self, problem, logger, options=None, number_of_processes=None):
+    def __init__(
+            self, problem, logger, options=None, number_of_processes=None, tracer=None,
+            executor='process'
+    ):
         """
         Parameters
         ----------
@@ -20,20 +29,60 @@ class DaisySequentialOptimizer:
         logger : ...
 
         options : dict
+          'num_samples' : Number of values to try for continuous parameters. Default 3
+          'order_by_runtime' : If True submit the parameter sets of a step with the longest
+                               predicted runtime first. See `map_longest_first`. Default True
+          'refinement_passes' : Number of passes after the first, where each continuous parameter
+                                is sampled again with 'num_samples' values in an interval around
+                                its current value. Default 0
+          'refinement_shrink' : The interval of a pass is this fraction of the interval of the
+                                previous pass. The interval of the first pass is the spacing of the
+                                initial samples. Default 0.5
+          'fix_multiple' : If True, fix every parameter whose best value improves the objective in
+                           a step, if a run with all of them changed together confirms the
+                           improvement. If the joint run is worse than the best single change, only
+                           the best single parameter is fixed. Default False
+          'speculative' : If True, evaluate the initial parameters in the first batch, and while
+                          the results of a step come in, start the parameter sets of the next step
+                          for the currently leading parameter on idle workers. They are used if
+                          that parameter is fixed and cancelled otherwise. Default False
 
         number_of_processes: int > 0 (Optional)
           The maximum number of processes to use when running Daisy. Defaults to
-          os.process_cpu_count()
+          available_cpus(), which respects CPU affinity and cgroup CPU quotas
+
+        tracer : Tracer (Optional)
+          If not None record a timeline of evaluations and optimizer activity
+
+        executor : str OR concurrent.futures.Executor (Optional)
+          'process' to evaluate in a process pool, 'thread' to evaluate in a thread pool or 'serial'
+          to evaluate one at a time in this thread. An Executor is used as is and is not shut down,
+          so it can be shared between optimizers. See `evaluation_executor`
         """
         if options is None:
             options = {}
         self.objective_name = problem.objective_fn.name
-        self.problem = ScalarProblemWrapper(problem)
+        self.problem = ScalarProblemWrapper(problem, return_timings=True)
         self.logger = logger
+        self.timing_summary = TimingSummary()
+        self.tracer = tracer if tracer is not None else Tracer(enabled=False)
         self.number_of_processes = number_of_processes
+        self.executor = executor
+        self.order_by_runtime = options.get('order_by_runtime', True)
+        self.runtime_predictor = RuntimePredictor()
 
         # Convert any continuous parameters to categorical parameters by uniform sampling
         num_samples = options.get("num_samples", 3)
+        self.num_samples = num_samples
+        self.refinement_passes = options.get('refinement_passes', 0)
+        self.refinement_shrink = options.get('refinement_shrink', 0.5)
+        self.fix_multiple = options.get('fix_multiple', False)
+        self.speculative = options.get('speculative', False)
+        self._speculation = {}  # Map from speculatively submitted parameter sets to futures
+        self.num_speculative_reused = 0
+        self.current = None
+        self.valid_ranges = {}  # Valid ranges of continuous parameters
+        self.grid_spacing = {}  # Spacing of the initial samples of continuous parameters
         self.parameters = []
         for param in problem.parameters:
             # Standardize parameters such that they are all categorical and the initial value is the
@@ -55,6 +104,10 @@ class DaisySequentialOptimizer:
                     np.linspace(param.valid_range[0], param.valid_range[1], num_samples-1)
                 ])
                 self.parameters.append(CategoricalParameter(param.name, values, 0))
+                self.valid_ranges[param.name] = param.valid_range
+                self.grid_spacing[param.name] = (
+                    (param.valid_range[1] - param.valid_range[0]) / max(num_samples - 2, 1)
+                )
             elif param.type == 'Categorical':
                 if param.initial_value_idx != 0:
                     values = np.concatenate([
@@ -67,11 +120,8 @@ class DaisySequentialOptimizer:
 
     def optimize(self):
         '''Run optimization'''
-        # pylint: disable=too-many-locals,too-many-statements
         # Recall that we are working with categorical parameters, so there is no sampling of new
         # parameters.
-        step = 0
-        fixed = set()   # The parameters that are already fixed
         floating = {}   # The parameters that we need to fix
         current = {}    # The parameter values that we are currently using
         order = []      # Order that parameters are passed to the problem.
@@ -81,88 +131,275 @@ class DaisySequentialOptimizer:
             current[param.name] = param.values[0] # Parameter values are tried in order
             order.append(param.name)
             num_param_values.append(len(param.values))
+        self.current = current
 
-        min_evals, max_evals = _count_min_max_param_evals(num_param_values)
+        min_evals, max_evals = _count_min_max_param_evals(num_param_values, self.fix_multiple)
         self.logger.info(f'Using at least {min_evals} and at most {max_evals} function evaluations')
 
-        # Compute the initial loss
-        self.logger.info('Evaluating initial parameters')
-        current_fval = self.problem([current[name] for name in order])
-        if np.isnan(current_fval):
+        state = { 'current' : current, 'fval' : None, 'step' : 0, 'f_evals' : 0 }
+        if not self.speculative:
+            # Compute the initial loss
+            self.logger.info('Evaluating initial parameters')
+            with self.tracer.span('initial evaluation'):
+                current_fval, timings = self.problem([current[name] for name in order])
+            self.timing_summary.add(timings)
+            self.tracer.add_evaluation(timings, step=0)
+            state['fval'] = self._initial_objective(current_fval)
+            state['f_evals'] = 1
+        self.logger.info('Optimizing')
+        with evaluation_executor(self.executor, self.number_of_processes) as executor:
+            try:
+                self._optimize_pass(executor, floating, order, state)
+                self._refine(executor, order, state)
+            finally:
+                self._speculate(executor, [])
+
+        if self.speculative:
+            self.logger.info(f'Reused {self.num_speculative_reused} speculative evaluations')
+        self.timing_summary.log(self.logger)
+        self.tracer.log_utilization(
+            self.logger, executor_max_workers(self.executor, self.number_of_processes)
+        )
+        return self.partial_result()
+
+    def partial_result(self):
+        '''The parameter values fixed so far, in the same format as `optimize`. The parameters that
+        have not been fixed yet have their initial value. Returns None if optimization has not
+        started.'''
+        if self.current is None:
+            return None
+        result = {}
+        for k,v in self.current.items():
+            result[k] = { 'best': v }
+        return result
+
+    def _initial_objective(self, fval):
+        if np.isnan(fval):
             self.logger.error('Initial parameters failed, aborting')
             raise RuntimeError('Initial parameters failed')
+        self.logger.info(f'Initial objective = {fval}')
+        return fval
 
-        self.logger.info(f'Initial objective = {current_fval}')
-        total_f_evals = 1
-        self.logger.info('Optimizing')
-        with ProcessPoolExecutor(self.number_of_processes) as executor:
-            while len(floating) > 0:
-                # We fix a parameter in each step, so we will always do as many steps as there are
-                # parameters.
-                step += 1
-
-                # Log the parameter distribution
-                params = {
-                    f'param_{name}_choices' : ','.join([str(v) for v in values])
-                    for name, values in floating.items()
-                }
-                for name in fixed:
+    def _refine(self, executor, order, state):
+        # Half the width of the interval sampled around each continuous parameter
+        half_widths = dict(self.grid_spacing)
+        for refinement in range(1, self.refinement_passes + 1):
+            floating = {}
+            for name, half_width in half_widths.items():
+                half_widths[name] = half_width * self.refinement_shrink
+                values = self._refined_values(name, state['current'][name], half_widths[name])
+                if len(values) > 1:
+                    floating[name] = values
+            if len(floating) == 0:
+                return
+            self.logger.info(f'Refinement pass {refinement}')
+            self._optimize_pass(executor, floating, order, state)
+
+    def _refined_values(self, name, value, half_width):
+        # Values in an interval around value, clipped to the valid range. value is first, so it is
+        # the current value of the parameter
+        low, high = self.valid_ranges[name]
+        values = np.linspace(
+            max(low, value - half_width), min(high, value + half_width), self.num_samples
+        )
+        return np.concatenate([[value], values[values != value]])
+
+    def _optimize_pass(self, executor, floating, order, state):
+        '''Fix the parameters in floating one at a time, starting from the values in state. state
+        is updated in place'''
+        # pylint: disable=too-many-locals
+        current = state['current']
+        while len(floating) > 0:
+            # We fix a parameter in each step, so we will always do as many steps as there are
+            # parameters.
+            state['step'] += 1
+            step = state['step']
+
+            # Log the parameter distribution
+            params = {
+                f'param_{name}_choices' : ','.join([str(v) for v in values])
+                for name, values in floating.items()
+            }
+            for name in order:
+                if name not in floating:
                     params[f'param_{name}_choices'] = str(current[name])
-                self.logger.parameters(distribution='categorical', tag='raw', step=step, **params)
+            with self.tracer.span('log', step=step):
+                self.logger.parameters(
+                    distribution='categorical', tag='raw', step=step, **params
+                )
 
+            with self.tracer.span('generate parameter sets', step=step):
                 param_sets, param_sets_ids = _generate_parameter_sets(floating, current, order)
-                self.logger.info(step=step, n_param_sets=len(param_sets))
-
-                best = np.inf
-                best_idx = None
-                num_failures = 0
-                # executor.map runs the problems in parallel and yields results in order matching
-                # param_sets.
-                for i, fval in enumerate(executor.map(self.problem, param_sets)):
-                    objective_value = { f'metric_{self.objective_name}' : fval }
-                    params = {
-                        f'param_{name}' : value for name, value in zip(order, param_sets[i])
-                    }
-                    self.logger.result(
-                        step=step, tag="raw", **objective_value, **params
-                    )
-                    if np.isnan(fval):
-                        num_failures += 1
-                    elif fval < best:
-                        best = fval
-                        best_idx = i # Index into param_sets
-                if best_idx is None:
-                    # Maybe not raise an exception if we have had at least one successful run in a
-                    # previous step?
-                    self.logger.error('All simulations failed. Aborting')
-                    raise RuntimeError('All simulations failed')
-
-                total_f_evals += len(param_sets)
-                self.logger.info(step=step, total_function_evaluations=total_f_evals)
-                if num_failures > 0:
-                    self.logger.warning(step=step, n_failed_runs=num_failures)
-                self.logger.info(step=step, best_objective=best)
-                if best > current_fval:
-                    # Nothing is better than using current values of all parameters, so we stop.
-                    # We could consider setting a random parameter to a random value, or something
-                    # similar.
-                    self.logger.info('No improvement in objective. Stopping')
-                    break
-
-                current_fval = best
-                name, idx = param_sets_ids[best_idx]
+            self.logger.info(step=step, n_param_sets=len(param_sets))
+
+            speculate = None
+            if self.speculative:
+                if state['fval'] is None:
+                    # The initial parameters are evaluated with the first step
+                    param_sets.insert(0, [float(current[name]) for name in order])
+                    param_sets_ids.insert(0, None)
+                speculate = partial(_next_parameter_sets, floating, current, order, param_sets_ids)
+            fvals = self._evaluate_step(executor, param_sets, order, step, speculate)
+            if state['fval'] is None:
+                state['fval'] = self._initial_objective(fvals[0])
+                state['f_evals'] += 1
+                param_sets, param_sets_ids, fvals = param_sets[1:], param_sets_ids[1:], fvals[1:]
+            num_failures = int(np.sum(np.isnan(fvals)))
+            if num_failures == len(fvals):
+                # Maybe not raise an exception if we have had at least one successful run in a
+                # previous step?
+                self.logger.error('All simulations failed. Aborting')
+                raise RuntimeError('All simulations failed')
+            best_idx = int(np.nanargmin(fvals)) # Index into param_sets
+            best = fvals[best_idx]
+
+            state['f_evals'] += len(param_sets)
+            self.logger.info(step=step, total_function_evaluations=state['f_evals'])
+            if num_failures > 0:
+                self.logger.warning(step=step, n_failed_runs=num_failures)
+            self.logger.info(step=step, best_objective=best)
+            if best > state['fval']:
+                # Nothing is better than using current values of all parameters, so we stop.
+                # We could consider setting a random parameter to a random value, or something
+                # similar.
+                self.logger.info('No improvement in objective. Stopping')
+                break
+
+            if self.fix_multiple:
+                fixes, state['fval'] = self._joint_fixes(
+                    executor, floating, order, state, fvals, param_sets_ids
+                )
+            else:
+                fixes, state['fval'] = [param_sets_ids[best_idx]], best
+            for name, idx in fixes:
                 value = floating.pop(name)[idx]
                 current[name] = value
-                fixed.add(name)
                 self.logger.info(f'step={step},Fixing {name} to {value}')
 
-        result = {}
-        for k,v in current.items():
-            result[k] = { 'best': v }
-        return result
+    def _joint_fixes(self, executor, floating, order, state, fvals, param_sets_ids):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+        '''Find the parameters to fix when all improving parameters are fixed at once
+
+        Returns the best alternative of each parameter that improves on state['fval'], if changing
+        them together is at least as good as the single best alternative. Otherwise returns the
+        single best alternative. Also returns the objective value of the returned changes
+        '''
+        best_idx = int(np.nanargmin(fvals))
+        single = [param_sets_ids[best_idx]], fvals[best_idx]
+        improvements = {}
+        for fval, (name, idx) in zip(fvals, param_sets_ids):
+            # Strict improvement, alternatives that are as good as the current values are not fixed
+            if fval < state['fval'] and fval < improvements.get(name, (np.inf, None))[0]:
+                improvements[name] = (fval, idx)
+        if len(improvements) < 2:
+            return single
+        step = state['step']
+        joint = dict(state['current'])
+        for name, (_, idx) in improvements.items():
+            joint[name] = floating[name][idx]
+        joint_fval = self._evaluate_step(
+            executor, [[float(joint[name]) for name in order]], order, step
+        )[0]
+        state['f_evals'] += 1
+        self.logger.info(step=step, n_joint_params=len(improvements), joint_objective=joint_fval)
+        if np.isnan(joint_fval) or joint_fval > single[1]:
+            self.logger.info(f'step={step},Joint change is worse. Fixing a single parameter')
+            return single
+        return [(name, idx) for name, (_, idx) in improvements.items()], joint_fval
+
+    def _evaluate_step(self, executor, param_sets, order, step, speculate=None):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        # Evaluate and log the parameter sets. Returns the objective values, nan for failed runs and
+        # inf for estimates, so a parameter is never fixed based on an estimate
+        if speculate is None:
+            results = self._evaluate(executor, param_sets)
+        else:
+            results = self._evaluate_speculative(executor, param_sets, speculate)
+        fvals = []
+        for param_set, (fval, timings) in zip(param_sets, results):
+            self.timing_summary.add(timings)
+            self.tracer.add_evaluation(timings, step=step)
+            objective_value = { f'metric_{self.objective_name}' : fval }
+            params = { f'param_{name}' : value for name, value in zip(order, param_set) }
+            with self.tracer.span('log', step=step):
+                self.logger.result(
+                    step=step, tag="raw", **objective_value, **params, **fidelity_column(timings)
+                )
+            fvals.append(np.inf if is_estimate(timings) else fval)
+        return np.array(fvals, dtype=float)
+
+    def _evaluate(self, executor, param_sets):
+        # Run the problems in parallel and yield results in order matching param_sets
+        if self.order_by_runtime:
+            return map_longest_first(executor, self.problem, param_sets, self.runtime_predictor)
+        return executor.map(self.problem, param_sets)
+
+    def _evaluate_speculative(self, executor, param_sets, speculate):
+        '''Evaluate param_sets, reusing speculative evaluations of the previous step. While results
+        come in and workers are idle, speculatively submit speculate(i), the parameter sets of the
+        next step if param_sets[i] wins. Returns the results in the order of param_sets'''
+        speculation, self._speculation = self._speculation, {}
+        order = range(len(param_sets))
+        if self.order_by_runtime:
+            order = longest_first(param_sets, self.runtime_predictor)
+        pending = {}
+        for i in order:
+            future = speculation.pop(tuple(param_sets[i]), None)
+            if future is None:
+                future = executor.submit(self.problem, param_sets[i])
+            else:
+                self.num_speculative_reused += 1
+            pending[future] = i
+        for future in speculation.values():
+            future.cancel()
+
+        max_workers = executor_max_workers(executor, self.number_of_processes)
+        results = [None] * len(param_sets)
+        leader = None
+        speculated = None
+        while len(pending) > 0:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                results[i] = future.result()
+                observe_result(self.runtime_predictor, param_sets[i], results[i])
+                if not np.isnan(results[i][0]) and (
+                        leader is None or results[i][0] < results[leader][0]
+                ):
+                    leader = i
+            # Only speculate when a worker would otherwise be idle
+            if leader not in (None, speculated) and 0 < len(pending) < max_workers:
+                self._speculate(executor, speculate(leader))
+                speculated = leader
+        return results
+
+    def _speculate(self, executor, param_sets):
+        # Cancel the current speculation and submit param_sets instead
+        for future in self._speculation.values():
+            future.cancel()
+        self._speculation = {
+            tuple(param_set) : executor.submit(self.problem, param_set) for param_set in param_sets
+        }
+
+def _next_parameter_sets(floating, current, order, param_sets_ids, i):
+    # Parameter sets of the next step if the change in param_sets_ids[i] is fixed
+    if param_sets_ids[i] is None:
+        # The initial parameters
+        return []
+    name, idx = param_sets_ids[i]
+    rest = { n : values for n, values in floating.items() if n != name }
+    leading = dict(current)
+    leading[name] = floating[name][idx]
+    return _generate_parameter_sets(rest, leading, order)[0]
 
-def _count_min_max_param_evals(num_param_values):
+def _count_min_max_param_evals(num_param_values, fix_multiple=False):
     # Count the minimum and maximum number of function evaluations
+    if fix_multiple and len(num_param_values) > 1:
+        # Best case is that all parameters are fixed after the first step and a joint run.
+        # Worst case is a rejected joint run in every step with more than one parameter
+        _, max_evals = _count_min_max_param_evals(num_param_values)
+        min_evals = 2 + sum(n - 1 for n in num_param_values)
+        return min_evals, max_evals + len(num_param_values) - 1
     # Worst case is that we always fix the parameter with fewest values
     num_param_values = sorted(num_param_values)
     max_evals = 1 # We always do one with the current parameter set
@@ -0,0 +1,180 @@
+'''Helper process that launches programs on request.
+
+Starting a program with subprocess from a process with a large heap (Ax/PyTorch models, large
+target data) can be slow, and can fail under memory pressure, because the process is forked before
+the program is executed. The helper is a small process that is started early, and launches
+programs on behalf of its parent. Requests and replies are sent as json lines over a pair of pipes.
+The launched programs inherit stdout and stderr from the helper, which inherits them from the
+parent.
+
+The helper is started with `python -m daisypy.optim.spawn_helper <request fd> <reply fd>`. It only
+imports the standard library and `daisypy.optim.resources`, which measures the peak resident set
+size of the programs.
+'''
+import atexit
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future
+from daisypy.optim.resources import pinned_thread, wait_process
+
+__all__ = [
+    'SpawnHelper',
+    'get_spawn_helper',
+]
+
+class SpawnHelper:
+    '''Client for a helper process that runs programs on request. Safe to use from multiple
+    threads.'''
+    def __init__(self):
+        request_read, self._request_write = os.pipe()
+        self._reply_read, reply_write = os.pipe()
+        self.process = subprocess.Popen( # pylint: disable=consider-using-with
+            [sys.executable, '-m', 'daisypy.optim.spawn_helper', str(request_read),
+             str(reply_write)],
+            pass_fds=(request_read, reply_write),
+            stdin=subprocess.DEVNULL
+        )
+        os.close(request_read)
+        os.close(reply_write)
+        self._requests = os.fdopen(self._request_write, 'w', encoding='utf-8')
+        self._pending = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        threading.Thread(target=self._read_replies, daemon=True).start()
+
+    def run(self, args, env=None, cpus=None):
+        '''Run a program in the helper and wait for it to finish
+
+        Parameters
+        ----------
+        args : list of str
+          Program and arguments
+
+        env : dict of (str, str) OR None
+          Environment of the program. If None use the current environment of this process
+
+        cpus : iterable of int OR None
+          If not None pin the program to these CPUs
+
+        Returns
+        -------
+        subprocess.CompletedProcess
+          With the peak resident set size of the program in bytes, or None if it is not known, as
+          the attribute `peak_rss`
+        '''
+        if env is None:
+            env = dict(os.environ)
+        future = Future()
+        with self._lock:
+            if self._requests.closed:
+                raise RuntimeError('SpawnHelper is closed')
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = future
+            self._requests.write(json.dumps({
+                'id' : request_id,
+                'args' : args,
+                'env' : env,
+                'cpus' : sorted(cpus) if cpus is not None else None,
+            }))
+            self._requests.write('\n')
+            self._requests.flush()
+        returncode, peak_rss = future.result()
+        result = subprocess.CompletedProcess(args, returncode)
+        result.peak_rss = peak_rss
+        return result
+
+    def close(self):
+        '''Stop the helper after running programs have finished'''
+        with self._lock:
+            if self._requests.closed:
+                return
+            self._requests.close()
+        self.process.wait()
+
+    def _read_replies(self):
+        with os.fdopen(self._reply_read, 'r', encoding='utf-8') as replies:
+            for line in replies:
+                reply = json.loads(line)
+                with self._lock:
+                    future = self._pending.pop(reply['id'])
+                future.set_result((reply['returncode'], reply.get('peak_rss')))
+        # The helper is gone. Fail anything still waiting
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(RuntimeError('SpawnHelper exited'))
+
+
+_helper = None # pylint: disable=invalid-name
+_helper_lock = threading.Lock()
+
+def get_spawn_helper():
+    '''Get the helper of this process, starting it if needed. A forked child process does not
+    share the helper of its parent, but starts its own when needed.
+
+    Returns
+    -------
+    SpawnHelper
+    '''
+    global _helper # pylint: disable=global-statement
+    with _helper_lock:
+        if _helper is None:
+            _helper = SpawnHelper()
+            atexit.register(_helper.close)
+        return _helper
+
+def _detach_after_fork():
+    # A forked child must not keep the request pipe of its parent's helper open, otherwise the
+    # helper does not see end of file when the parent closes it. Point the inherited descriptor at
+    # /dev/null and let the child start its own helper.
+    global _helper, _helper_lock # pylint: disable=global-statement
+    _helper_lock = threading.Lock()
+    if _helper is not None:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, _helper._request_write) # pylint: disable=protected-access
+        os.close(devnull)
+        _helper = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_detach_after_fork)
+
+
+def _serve(request_fd, reply_fd):
+    reply_lock = threading.Lock()
+    with os.fdopen(request_fd, 'r', encoding='utf-8') as requests, \
+         os.fdopen(reply_fd, 'w', encoding='utf-8') as replies:
+        def run(request):
+            try:
+                # Each request runs in its own thread, so the mask of the thread can be changed
+                with pinned_thread(request.get('cpus')):
+                    # pylint: disable-next=consider-using-with
+                    process = subprocess.Popen(request['args'], env=request['env'])
+                with process:
+                    process.returncode, peak_rss = wait_process(process.pid)
+                    returncode = process.returncode
+            except OSError as e:
+                print(f'spawn_helper: {e}', file=sys.stderr)
+                returncode, peak_rss = 127, None
+            with reply_lock:
+                replies.write(json.dumps({
+                    'id' : request['id'], 'returncode' : returncode, 'peak_rss' : peak_rss
+                }))
+                replies.write('\n')
+                replies.flush()
+
+        threads = []
+        for line in requests:
+            threads = [thread for thread in threads if thread.is_alive()]
+            thread = threading.Thread(target=run, args=(json.loads(line),))
+            thread.start()
+            threads.append(thread)
+        # Finish running programs before replies are closed
+        for thread in threads:
+            thread.join()
+
+if __name__ == '__main__':
+    _serve(int(sys.argv[1]), int(sys.argv[2]))
@@ -0,0 +1,230 @@
+'''Evaluate candidates on a subset of the scenarios first.
+
+A calibration over many sites uses a spawn program that runs one Daisy program per site and an
+AggregateObjective with one objective per site. Every candidate costs a Daisy run per site, even
+when a few sites are enough to tell that the candidate is bad. `StagedProblem` evaluates a
+candidate in two stages
+  1. Run the scenarios in a small subset and estimate the aggregated objective from their losses
+  2. Only if the estimate is promising, run the remaining scenarios and aggregate all losses
+
+The subset and the estimate come from the per-scenario losses of the candidates that were
+evaluated on all scenarios. `select_scenarios` greedily picks the scenarios whose losses, in a
+least squares fit, correlate best with the aggregated objective. Until enough candidates have
+been evaluated on all scenarios, or if no subset correlates well enough, all scenarios are run.
+
+The fidelity of an evaluation is the fraction of scenarios that were run. It is stored in the
+Timings of the result, and the optimizers log it in a 'fidelity' column of the result log. An
+estimate is only used to rank candidates. The optimizers never fix or return parameters based on an
+estimate, and DaisyAxOptimizer marks the trial as abandoned instead of passing the estimate to Ax
+as data.
+'''
+import copy
+import math
+import threading
+import numpy as np
+from .multi_objective import MultiObjective
+from .problem import ObjectiveMap
+from .timing import collect_timings
+
+__all__ = [
+    'StagedProblem',
+    'select_scenarios',
+]
+
+def _fit(losses, scores):
+    # Least squares fit of scores on losses. Returns coefficients and correlation of fit and scores
+    features = np.column_stack([losses, np.ones(len(losses))])
+    coefficients, *_ = np.linalg.lstsq(features, scores, rcond=None)
+    fit = features @ coefficients
+    if np.std(fit) == 0 or np.std(scores) == 0:
+        return coefficients, 0.0
+    return coefficients, float(np.corrcoef(fit, scores)[0, 1])
+
+def select_scenarios(losses, scores, size):
+    '''Greedily select the scenarios whose losses best predict the aggregated objective
+
+    Parameters
+    ----------
+    losses : array_like of shape (n, m)
+      Losses of n evaluations in each of m scenarios
+
+    scores : array_like of shape (n,)
+      Aggregated objective of the evaluations
+
+    size : int > 0
+      Number of scenarios to select
+
+    Returns
+    -------
+    (list of int, numpy.ndarray, float)
+      Indices of the selected scenarios, coefficients of the least squares fit of the aggregated
+      objective on their losses with the intercept last, and the correlation of the fit with the
+      aggregated objective
+    '''
+    losses = np.asarray(losses, dtype=float)
+    scores = np.asarray(scores, dtype=float)
+    selected = []
+    for _ in range(min(size, losses.shape[1])):
+        fits = {
+            j : _fit(losses[:, selected + [j]], scores)
+            for j in range(losses.shape[1]) if j not in selected
+        }
+        best, (coefficients, correlation) = max(fits.items(), key=lambda item: item[1][1])
+        selected.append(best)
+    return selected, coefficients, correlation
+
+
+class StagedProblem:
+    # pylint: disable=too-many-instance-attributes,too-many-arguments,too-many-positional-arguments
+    '''Problem that runs a subset of the scenarios first and the rest only for promising
+    candidates.
+
+    The losses seen so far are kept in the problem, so evaluate it with executor='thread' or
+    'serial'. Daisy runs in its own process, so threads are enough to keep the CPUs busy. A process
+    pool pickles the problem for every evaluation, so nothing would be learned. Pickling a
+    StagedProblem therefore raises TypeError.
+    '''
+    def __init__(
+            self, problem, programs=None, subset_size=None, warmup=None, promote_quantile=0.5,
+            min_correlation=0.8
+    ):
+        '''
+        Parameters
+        ----------
+        problem : DaisyOptimizationProblem
+          Problem with an AggregateObjective, where each objective is the loss of one scenario,
+          and a dai template with a spawn program that runs the scenarios
+
+        programs : dict of (str, str) (Optional)
+          Map from objective names to the names of the programs in the spawn program. Defaults to
+          the objective names
+
+        subset_size : int > 0 (Optional)
+          Number of scenarios in the first stage. Defaults to the square root of the number of
+          scenarios, rounded up
+
+        warmup : int > 0 (Optional)
+          Number of candidates to evaluate on all scenarios before staging. Defaults to
+          max(10, 2 * (subset_size + 1))
+
+        promote_quantile : float in (0, 1]
+          A candidate is evaluated on the remaining scenarios if its estimated objective is at most
+          this quantile of the objectives of candidates evaluated on all scenarios
+
+        min_correlation : float
+          Only stage when the fit on the subset correlates at least this well with the aggregated
+          objective
+        '''
+        self.problem = problem
+        self.parameters = problem.parameters
+        self.objective_fn = problem.objective_fn
+        self.scenarios = [f.name for f in problem.objective_fn.objective_fns]
+        if programs is None:
+            programs = {}
+        self.programs = [programs.get(name, name) for name in self.scenarios]
+        if subset_size is None:
+            subset_size = math.ceil(math.sqrt(len(self.scenarios)))
+        self.subset_size = subset_size
+        if warmup is None:
+            warmup = max(10, 2 * (subset_size + 1))
+        self.warmup = warmup
+        self.promote_quantile = promote_quantile
+        self.min_correlation = min_correlation
+        self.losses = []
+        self.scores = []
+        self.subset = None
+        self.coefficients = None
+        self.correlation = None
+        self.threshold = None
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        raise TypeError(
+            "StagedProblem learns from its evaluations and cannot be sent to a process pool. "
+            "Evaluate it with executor='thread'"
+        )
+
+    def __call__(self, parameter_values):
+        '''Evaluate the first stage, and the second if the candidate is promising
+
+        Parameters
+        ----------
+        parameter_values : sequence
+
+        Returns
+        -------
+        objective_map : ObjectiveMap
+          Mapping from the name of the aggregated objective to its value, or to the estimated value
+          if only the first stage was run. The fraction of scenarios that were run is available as
+          `objective_map.timings.fidelity`
+        '''
+        with self._lock:
+            subset, coefficients, threshold = self.subset, self.coefficients, self.threshold
+        with collect_timings() as timings:
+            if subset is None:
+                losses = self._run_stage(range(len(self.scenarios)), parameter_values, timings)
+            else:
+                losses = self._run_stage(subset, parameter_values, timings)
+                estimate = np.append(losses[subset], 1) @ coefficients
+                # A failed first stage gives a nan estimate
+                if np.isnan(estimate) or estimate > threshold:
+                    timings.fidelity = len(subset) / len(self.scenarios)
+                    return ObjectiveMap({ self.objective_fn.name : float(estimate) }, timings)
+                rest = [i for i in range(len(self.scenarios)) if i not in subset]
+                losses[rest] = self._run_stage(rest, parameter_values, timings)[rest]
+            timings.fidelity = 1.0
+            if np.any(np.isnan(losses)):
+                return ObjectiveMap({ self.objective_fn.name : np.nan }, timings)
+            score = self.objective_fn.aggregate_fn(dict(zip(self.scenarios, losses)))
+            self._observe(losses, score)
+        return ObjectiveMap({ self.objective_fn.name : score }, timings)
+
+    def _stage_problem(self, indices):
+        key = tuple(indices)
+        with self._lock:
+            if key not in self._stages:
+                problem = copy.copy(self.problem)
+                problem.file_generator = self.problem.file_generator.with_programs(
+                    [self.programs[i] for i in indices]
+                )
+                problem.objective_fn = MultiObjective(
+                    'stage', [self.objective_fn.objective_fns[i] for i in indices]
+                )
+                self._stages[key] = problem
+            return self._stages[key]
+
+    def _run_stage(self, indices, parameter_values, timings):
+        # Losses of all scenarios with nan for those that were not run or failed
+        result = self._stage_problem(indices)(parameter_values)
+        stage_timings = getattr(result, 'timings', None)
+        if stage_timings is not None:
+            for name, seconds in stage_timings.phases.items():
+                if name != 'total':
+                    timings.add(name, seconds)
+            timings.spans.extend(stage_timings.spans)
+            if stage_timings.peak_rss is not None:
+                timings.peak_rss = max(timings.peak_rss or 0, stage_timings.peak_rss)
+        losses = np.full(len(self.scenarios), np.nan)
+        for i in indices:
+            losses[i] = result.get(self.scenarios[i], np.nan)
+        return losses
+
+    def _observe(self, losses, score):
+        with self._lock:
+            self.losses.append(losses)
+            self.scores.append(score)
+            if len(self.scores) < self.warmup:
+                return
+            subset, coefficients, correlation = select_scenarios(
+                self.losses, self.scores, self.subset_size
+            )
+            self.correlation = correlation
+            if correlation < self.min_correlation or len(subset) == len(self.scenarios):
+                self.subset = None
+                return
+            self.subset = sorted(subset)
+            # Coefficients follow the selection order, sort them with the subset
+            order = np.argsort(subset)
+            self.coefficients = np.append(coefficients[:-1][order], coefficients[-1])
+            self.threshold = np.quantile(self.scores, self.promote_quantile)
@@ -0,0 +1,243 @@
+'''Per-phase timing of evaluations.
+
+Timing is always switched on. A phase costs two calls to `time.perf_counter` and a dict update,
+which is negligible compared to running Daisy. Phases are recorded in the `Timings` instance that
+is active in the current context, so nested components (file generators, data extractors, loss
+functions) can time themselves without passing a timer around. Outside of `collect_timings`,
+`timed_phase` does nothing.
+
+Timestamps are from `time.perf_counter`, which uses a system wide monotonic clock on Linux, macOS
+and Windows. Timestamps recorded in different worker processes are therefore comparable.
+'''
+import os
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+import numpy as np
+
+__all__ = [
+    'Timings',
+    'TimingSummary',
+    'collect_timings',
+    'fidelity_column',
+    'is_estimate',
+    'record_peak_rss',
+    'result_timings',
+    'timed_phase',
+]
+
+_active_timings = ContextVar('daisypy_optim_timings', default=None)
+
+class Timings:
+    # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    '''Wall clock time spent in named phases of a single evaluation. Also holds the peak resident
+    set size in bytes of the programs run in the evaluation, if it is known, and the fidelity of
+    the objective values, if the problem evaluates with varying fidelity. See StagedProblem.'''
+    def __init__(self):
+        self.phases = {}
+        self.peak_rss = None
+        self.fidelity = None
+        self.spans = []
+        self.start = None
+        self.end = None
+        self.pid = os.getpid()
+        self.thread_id = threading.get_ident()
+
+    def add(self, name, seconds):
+        '''Add time to a phase. Time spent in the same phase multiple times is accumulated
+
+        Parameters
+        ----------
+        name : str
+          Name of phase
+
+        seconds : float
+          Time spent in phase
+        '''
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def collect_timings():
+    '''Collect timings of all phases entered in the current context.
+
+    The total time is stored as the phase 'total'.
+
+    Yields
+    ------
+    Timings
+    '''
+    timings = Timings()
+    token = _active_timings.set(timings)
+    timings.start = perf_counter()
+    try:
+        yield timings
+    finally:
+        timings.end = perf_counter()
+        timings.add('total', timings.end - timings.start)
+        _active_timings.reset(token)
+
+@contextmanager
+def timed_phase(name):
+    '''Time a phase and add it to the active Timings, if any.
+
+    Parameters
+    ----------
+    name : str
+      Name of phase. Use '/' to indicate sub phases, e.g. 'objective/loss'
+    '''
+    timings = _active_timings.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        end = perf_counter()
+        timings.add(name, end - start)
+        timings.spans.append((name, start, end))
+
+def record_peak_rss(peak_rss):
+    '''Record the peak resident set size of a program run in the current evaluation, if any.
+
+    Parameters
+    ----------
+    peak_rss : int OR None
+      Bytes. If None nothing is recorded
+    '''
+    timings = _active_timings.get()
+    if timings is None or peak_rss is None:
+        return
+    timings.peak_rss = peak_rss if timings.peak_rss is None else max(timings.peak_rss, peak_rss)
+
+def result_timings(result):
+    '''Timings of an evaluation result
+
+    Parameters
+    ----------
+    result : ObjectiveMap OR (float, Timings OR None) OR any
+      Result of a problem or of a ScalarProblemWrapper returning timings
+
+    Returns
+    -------
+    Timings OR None
+    '''
+    timings = getattr(result, 'timings', None)
+    if timings is None and isinstance(result, tuple) and len(result) == 2:
+        timings = result[1]
+    return timings if isinstance(timings, Timings) else None
+
+def fidelity_column(timings):
+    '''Column with the fidelity of an evaluation for the result log
+
+    Parameters
+    ----------
+    timings : Timings OR None
+
+    Returns
+    -------
+    dict
+      { 'fidelity' : fidelity } OR an empty dict if the fidelity is not known, so logs of problems
+      without fidelity are unchanged
+    '''
+    fidelity = getattr(timings, 'fidelity', None)
+    return {} if fidelity is None else { 'fidelity' : fidelity }
+
+def is_estimate(timings):
+    '''True if the objective values of an evaluation are estimated from a part of the scenarios
+
+    Optimizers use estimates to rank candidates, but never fix or return parameters based on them.
+
+    Parameters
+    ----------
+    timings : Timings OR None
+
+    Returns
+    -------
+    bool
+    '''
+    fidelity = getattr(timings, 'fidelity', None)
+    return fidelity is not None and fidelity < 1
+
+
+class TimingSummary:
+    '''Aggregate timings of many evaluations into per phase statistics
+
+    Count and total are exact. The percentiles are computed from a uniform random sample of at most
+    `reservoir_size` timings per phase (reservoir sampling), so memory does not grow with the number
+    of evaluations. They are exact while a phase has at most `reservoir_size` timings.
+    '''
+    def __init__(self, reservoir_size=1000, seed=None):
+        '''
+        Parameters
+        ----------
+        reservoir_size : int > 0 (Optional)
+          Maximum number of timings kept per phase for computing percentiles
+
+        seed : int OR None (Optional)
+          Seed for choosing the timings that are kept
+        '''
+        if reservoir_size < 1:
+            raise ValueError(f'reservoir_size must be at least 1. Got {reservoir_size}')
+        self.reservoir_size = reservoir_size
+        self.rng = np.random.default_rng(seed)
+        self.counts = defaultdict(int)
+        self.totals = defaultdict(float)
+        self.reservoirs = defaultdict(list)
+
+    def add(self, timings):
+        '''Add the timings of an evaluation
+
+        Parameters
+        ----------
+        timings : Timings OR None
+          If None nothing is added. This is the case for problems that do not record timings.
+        '''
+        if timings is None:
+            return
+        for name, seconds in timings.phases.items():
+            self.counts[name] += 1
+            self.totals[name] += seconds
+            reservoir = self.reservoirs[name]
+            if len(reservoir) < self.reservoir_size:
+                reservoir.append(seconds)
+            else:
+                # Keep each of the timings seen so far with probability reservoir_size / count
+                i = self.rng.integers(self.counts[name])
+                if i < self.reservoir_size:
+                    reservoir[i] = seconds
+
+    def summary(self):
+        '''Compute per phase statistics
+
+        Returns
+        -------
+        dict of (str, dict of (str, float))
+          Map from phase name to 'count', 'total', 'mean', 'p50' and 'p95' in seconds. See the
+          class documentation for the accuracy of 'p50' and 'p95'
+        '''
+        result = {}
+        for name in sorted(self.counts):
+            count, total = self.counts[name], self.totals[name]
+            p50, p95 = np.percentile(self.reservoirs[name], [50, 95])
+            result[name] = {
+                'count' : count,
+                'total' : total,
+                'mean' : total / count,
+                'p50' : p50,
+                'p95' : p95,
+            }
+        return result
+
+    def log(self, logger):
+        '''Write the summary to the timing log. One row per phase.
+
+        Parameters
+        ----------
+        logger : daisypy.optim.Logger
+        '''
+        for name, stats in self.summary().items():
+            logger.timing(phase=name, **stats)
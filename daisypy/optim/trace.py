@@ -0,0 +1,157 @@
+# pylint: disable=R0801
+'''Timeline tracing of evaluations and optimizer activity'''
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+__all__ = [
+    'Tracer',
+]
+
+class Tracer:
+    '''Record a timeline of worker and optimizer activity and export it in the Chrome trace event
+    format, which can be opened in https://ui.perfetto.dev or chrome://tracing.
+
+    Each evaluation is shown as an 'evaluation' event on the worker that ran it, with the phases
+    recorded in its Timings nested below. Optimizer side events (ask, tell, logging, ...) are shown
+    on the optimizer process. Idle gaps between evaluations on a worker are time where the worker
+    waited for the optimizer.
+
+    Example
+    -------
+    >>> tracer = Tracer()
+    ... optimizer = DaisyCMAOptimizer(problem, logger, cma_options, tracer=tracer)
+    ... optimizer.optimize()
+    ... tracer.export('trace.json')
+    '''
+    def __init__(self, enabled=True):
+        '''
+        Parameters
+        ----------
+        enabled : bool
+          If False nothing is recorded. Optimizers use a disabled tracer when no tracer is given.
+        '''
+        self.enabled = enabled
+        self.pid = os.getpid()
+        self.events = []
+        self.evaluations = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **args):
+        '''Record an optimizer side event
+
+        Parameters
+        ----------
+        name : str
+          Name of event, e.g. 'ask' or 'tell'
+
+        **args : dict
+          Extra information to attach to the event
+        '''
+        if not self.enabled:
+            yield
+            return
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            end = perf_counter()
+            self._add_event(name, 'optimizer', self.pid, threading.get_ident(), start, end, args)
+
+    def add_evaluation(self, timings, **args):
+        '''Record an evaluation and its phases on the worker that ran it
+
+        Parameters
+        ----------
+        timings : Timings OR None
+          Timings returned with the objective map. If None nothing is recorded.
+
+        **args : dict
+          Extra information to attach to the evaluation event
+        '''
+        if not self.enabled or timings is None or timings.start is None:
+            return
+        with self._lock:
+            self.evaluations.append((timings.start, timings.end))
+        self._add_event(
+            'evaluation', 'evaluation', timings.pid, timings.thread_id, timings.start, timings.end,
+            args
+        )
+        for name, start, end in timings.spans:
+            self._add_event(name, 'phase', timings.pid, timings.thread_id, start, end, {})
+
+    def utilization(self, number_of_workers):
+        '''Compute the percentage of worker time spent evaluating.
+
+        The available worker time is the time from the first to the last recorded event multiplied
+        by the number of workers.
+
+        Parameters
+        ----------
+        number_of_workers : int
+          Number of workers in the pool
+
+        Returns
+        -------
+        float OR None
+          Pool utilization in percent. None if no evaluations have been recorded
+        '''
+        if len(self.evaluations) == 0:
+            return None
+        first = min(event['ts'] for event in self.events) / 1e6
+        last = max(event['ts'] + event['dur'] for event in self.events) / 1e6
+        busy = sum(end - start for start, end in self.evaluations)
+        return 100 * busy / ((last - first) * number_of_workers)
+
+    def log_utilization(self, logger, number_of_workers):
+        '''Log the pool utilization to the info log, if any evaluations have been recorded
+
+        Parameters
+        ----------
+        logger : daisypy.optim.Logger
+
+        number_of_workers : int
+          Number of workers in the pool
+        '''
+        utilization = self.utilization(number_of_workers)
+        if utilization is not None:
+            logger.info(pool_utilization_percent=utilization)
+
+    def export(self, path):
+        '''Write the trace to a json file
+
+        Parameters
+        ----------
+        path : str
+          Path to output file, e.g. 'trace.json'
+        '''
+        metadata = []
+        for pid in sorted({ event['pid'] for event in self.events }):
+            name = 'optimizer' if pid == self.pid else f'worker {pid}'
+            metadata.append({
+                'name' : 'process_name', 'ph' : 'M', 'pid' : pid, 'args' : { 'name' : name }
+            })
+        with open(path, 'w', encoding='utf-8') as outfile:
+            json.dump({
+                'traceEvents' : metadata + self.events,
+                'displayTimeUnit' : 'ms'
+            }, outfile, default=str)
+
+    def _add_event(self, name, category, pid, tid, start, end, args):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        # Complete events ('X') with timestamps and durations in microseconds
+        event = {
+            'name' : name,
+            'cat' : category,
+            'ph' : 'X',
+            'pid' : pid,
+            'tid' : tid,
+            'ts' : start * 1e6,
+            'dur' : (end - start) * 1e6,
+            'args' : args,
+        }
+        with self._lock:
+            self.events.append(event)
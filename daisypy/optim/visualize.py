@@ -6,6 +6,7 @@ import matplotlib.pyplot as plt
 from matplotlib import animation
 from matplotlib.colors import Normalize
 import matplotlib as mpl
+from .parameter_sweep import SweepResult, read_sweep
 
 __all__ = [
     'plot_convergence',
@@ -18,6 +19,8 @@ __all__ = [
     'animate_result_1d',
     'animate_result_2d',
     'animate_result_nd',
+    'plot_sweep_heatmap',
+    'plot_sweep_slice',
 ]
 
 def plot_convergence(df, step_var='step', f_var='objective_value', log_transform=True):
@@ -26,7 +29,7 @@ def plot_convergence(df, step_var='step', f_var='objective_value', log_transform
     Parameters
     ----------
     df : pandas.DataFrame OR str
-      If str assume it is a path to a csv file with optimization results
+      If str assume it is a path to a csv or arrow file with optimization results
 
     step_var : str
       Name of step variable
@@ -42,8 +45,7 @@ def plot_convergence(df, step_var='step', f_var='objective_value', log_transform
     -------
     (matplotlib.Figure, matplotlib.Axes)
     '''
-    if not isinstance(df, pd.DataFrame):
-        df = pd.read_csv(df)
+    df = _read_result(df, [step_var, f_var])
     step = df[step_var]
     f = df[f_var]
     if log_transform:
@@ -67,7 +69,7 @@ def plot_result(df, step_var='step', f_var='objective_value'):
     Parameters
     ----------
     df : pandas.DataFrame OR str
-      If str assume it is a path to a csv file with optimization results
+      If str assume it is a path to a csv or arrow file with optimization results
 
     step_var : str
       Name of step variable
@@ -83,8 +85,7 @@ def plot_result(df, step_var='step', f_var='objective_value'):
     --------
     plot_result_1d, plot_result_2d, plot_result_3d, plot_result_nd
     '''
-    if not isinstance(df, pd.DataFrame):
-        df = pd.read_csv(df)
+    df = _read_result(df)
     params = df.columns[~df.columns.isin({step_var, f_var})]
     match len(params):
         case 1: return plot_result_1d(df, params[0], step_var, f_var)
@@ -97,7 +98,7 @@ def plot_result_1d(df, var, step_var='step', f_var='objective_value'):
     Parameters
     ----------
     df : pandas.DataFrame OR str
-      If str assume it is a path to a csv file with optimization results
+      If str assume it is a path to a csv or arrow file with optimization results
 
     var : str
       Name of parameter variable
@@ -116,8 +117,7 @@ def plot_result_1d(df, var, step_var='step', f_var='objective_value'):
     --------
     plot_result, plot_result_2d, plot_result_3d, plot_result_nd
     '''
-    if not isinstance(df, pd.DataFrame):
-        df = pd.read_csv(df)
+    df = _read_result(df, [step_var, var, f_var])
     fig, ax = plt.subplots()
     x = df[step_var]
     y = df[var]
@@ -138,7 +138,7 @@ def plot_result_2d(df, x_var, y_var, step_var='step', f_var='objective_value'):
     Parameters
     ----------
     df : pandas.DataFrame OR str
-      If str assume it is a path to a csv file with optimization results
+      If str assume it is a path to a csv or arrow file with optimization results
 
     x_var : str
       Name of parameter variable on x-axis
@@ -160,8 +160,7 @@ def plot_result_2d(df, x_var, y_var, step_var='step', f_var='objective_value'):
     --------
     plot_result, plot_result_1d, plot_result_3d, plot_result_nd
     '''
-    if not isinstance(df, pd.DataFrame):
-        df = pd.read_csv(df)
+    df = _read_result(df, [step_var, x_var, y_var, f_var])
     fig, ax = plt.subplots()
     transform, transform_text = _find_cmap_transform(df[f_var])
     c = transform(df[f_var])
@@ -184,7 +183,7 @@ def plot_result_3d(df, x_var, y_var, z_var, f_var):
     Parameters
     ----------
     df : pandas.DataFrame OR str
-      If str assume it is a path to a csv file with optimization results
+      If str assume it is a path to a csv or arrow file with optimization results
 
     x_var : str
       Name of parameter variable on x-axis
@@ -206,8 +205,7 @@ def plot_result_3d(df, x_var, y_var, z_var, f_var):
     --------
     plot_result, plot_result_1d, plot_result_2d, plot_result_nd
     '''
-    if not isinstance(df, pd.DataFrame):
-        df = pd.read_csv(df)
+    df = _read_result(df, [x_var, y_var, z_var, f_var])
     fig = plt.figure()
     ax = fig.add_subplot(projection='3d')
     x = df[x_var]
@@ -227,7 +225,7 @@ def plot_result_nd(df, params, step_var='step', f_var='objective_value', max_plo
     Parameters
     ----------
     df : pandas.DataFrame OR str
-      If str assume it is a path to a csv file with optimization results
+      If str assume it is a path to a csv or arrow file with optimization results
 
     params : list of str
       Names of parameter variables to plot
@@ -250,8 +248,7 @@ def plot_result_nd(df, params, step_var='step', f_var='objective_value', max_plo
     plot_result, plot_result_1d, plot_result_2d, plot_result_3d
     '''
     # pylint: disable=too-many-locals
-    if not isinstance(df, pd.DataFrame):
-        df = pd.read_csv(df)
+    df = _read_result(df, [step_var, *params, f_var])
     n = len(params)
     if n > max_plots_in_figure:
         return [
@@ -286,7 +283,7 @@ def animate_result(df, step_var='step', f_var='objective_value'):
     Parameters
     ----------
     df : pandas.DataFrame OR str
-      If str assume it is a path to a csv file with optimization results
+      If str assume it is a path to a csv or arrow file with optimization results
 
     step_var : str
       Name of step variable
@@ -302,8 +299,7 @@ def animate_result(df, step_var='step', f_var='objective_value'):
     --------
     animate_result_1d, animate_result_2d, animate_result_nd
     '''
-    if not isinstance(df, pd.DataFrame):
-        df = pd.read_csv(df)
+    df = _read_result(df)
     params = df.columns[~df.columns.isin({step_var, f_var})]
 
     match len(params):
@@ -317,7 +313,7 @@ def animate_result_1d(df, var, step_var='step', f_var='objective_value'):
     Parameters
     ----------
     df : pandas.DataFrame OR str
-      If str assume it is a path to a csv file with optimization results
+      If str assume it is a path to a csv or arrow file with optimization results
 
     var : str
       Name of parameter variable
@@ -337,8 +333,7 @@ def animate_result_1d(df, var, step_var='step', f_var='objective_value'):
     animate_result, animate_result_2d, animate_result_nd
     '''
     # pylint: disable=too-many-locals
-    if not isinstance(df, pd.DataFrame):
-        df = pd.read_csv(df)
+    df = _read_result(df, [step_var, var, f_var])
     # TODO: Add boundary lines showing parameter extents
     cmap = mpl.colormaps[mpl.rcParams['image.cmap']]
 
@@ -384,7 +379,7 @@ def animate_result_2d(df, x_var, y_var, step_var='step', f_var='objective_value'
     Parameters
     ----------
     df : pandas.DataFrame OR str
-      If str assume it is a path to a csv file with optimization results
+      If str assume it is a path to a csv or arrow file with optimization results
 
     x_var : str
       Name of parameter variable on x-axis
@@ -407,8 +402,7 @@ def animate_result_2d(df, x_var, y_var, step_var='step', f_var='objective_value'
     animate_result, animate_result_1d, animate_result_nd
     '''
     # pylint: disable=too-many-locals
-    if not isinstance(df, pd.DataFrame):
-        df = pd.read_csv(df)
+    df = _read_result(df, [step_var, x_var, y_var, f_var])
     cmap = mpl.colormaps[mpl.rcParams['image.cmap']]
 
     # Find x and y limits that cover full data set
@@ -455,7 +449,7 @@ def animate_result_nd(df, params, step_var='step', f_var='objective_value'):
     Parameters
     ----------
     df : pandas.DataFrame OR str
-      If str assume it is a path to a csv file with optimization results
+      If str assume it is a path to a csv or arrow file with optimization results
 
     params : list of str
       Names of parameter variables
@@ -483,6 +477,132 @@ def animate_result_nd(df, params, step_var='step', f_var='objective_value'):
     return animate_result_2d(df, x_var, y_var, step_var, f_var)
 
 ## Utilities
+def plot_sweep_heatmap(result, x_var, y_var, objective=None, fixed=None):
+    '''Make a heatmap of an objective over two parameters of a sweep. Other parameters are fixed.
+
+    Parameters
+    ----------
+    result : SweepResult OR str
+      If str assume it is the output directory of a sweep
+
+    x_var : str
+      Name of parameter on x-axis
+
+    y_var : str
+      Name of parameter on y-axis
+
+    objective : str (Optional)
+      Name of objective. Can be left out if the sweep has a single objective
+
+    fixed : dict of (str, value) (Optional)
+      Values of the other parameters. Values are matched to the nearest grid values. Parameters
+      that are not given are fixed at the point with the lowest objective value
+
+    Returns
+    -------
+    (matplotlib.Figure, matplotlib.Axes)
+
+    See also
+    --------
+    plot_sweep_slice, sweep
+    '''
+    result, objective, values = _read_sweep_values(result, objective)
+    index, title = _sweep_index(result, values, [x_var, y_var], fixed)
+    z = np.asarray(values[index], dtype=float)
+    if result.parameters.index(x_var) < result.parameters.index(y_var):
+        z = z.T # Rows are y values
+    fig, ax = plt.subplots()
+    x = _sweep_axis(result.coordinates[x_var], ax.set_xticks)
+    y = _sweep_axis(result.coordinates[y_var], ax.set_yticks)
+    mesh = ax.pcolormesh(x, y, z, shading='nearest')
+    ax.set_xlabel(x_var)
+    ax.set_ylabel(y_var)
+    ax.set_title(title)
+    fig.colorbar(mesh, label=objective)
+    fig.tight_layout()
+    return fig, ax
+
+def plot_sweep_slice(result, var, objective=None, fixed=None):
+    '''Plot an objective along one parameter of a sweep. Other parameters are fixed.
+
+    Parameters
+    ----------
+    result : SweepResult OR str
+      If str assume it is the output directory of a sweep
+
+    var : str
+      Name of parameter on x-axis
+
+    objective : str (Optional)
+      Name of objective. Can be left out if the sweep has a single objective
+
+    fixed : dict of (str, value) (Optional)
+      Values of the other parameters. Values are matched to the nearest grid values. Parameters
+      that are not given are fixed at the point with the lowest objective value
+
+    Returns
+    -------
+    (matplotlib.Figure, matplotlib.Axes)
+
+    See also
+    --------
+    plot_sweep_heatmap, sweep
+    '''
+    result, objective, values = _read_sweep_values(result, objective)
+    index, title = _sweep_index(result, values, [var], fixed)
+    fig, ax = plt.subplots()
+    x = _sweep_axis(result.coordinates[var], ax.set_xticks)
+    ax.plot(x, np.asarray(values[index], dtype=float), marker='.', c='black')
+    ax.set_xlabel(var)
+    ax.set_ylabel(objective)
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig, ax
+
+def _read_sweep_values(result, objective):
+    if not isinstance(result, SweepResult):
+        result = read_sweep(result)
+    if objective is None:
+        if len(result.values) != 1:
+            raise ValueError(f'objective must be one of {list(result.values)}')
+        objective = next(iter(result.values))
+    return result, objective, result.values[objective]
+
+def _sweep_index(result, values, free, fixed):
+    # Index of the slice where only the free parameters vary and a title describing it
+    fixed = result.index(**(fixed if fixed is not None else {}))
+    if np.all(np.isnan(values)):
+        raise ValueError('The sweep has no objective values')
+    best = np.unravel_index(np.nanargmin(values), values.shape)
+    index = []
+    title = []
+    for axis, name in enumerate(result.parameters):
+        if name in free:
+            index.append(slice(None))
+        else:
+            index.append(fixed.get(name, best[axis]))
+            title.append(f'{name}={result.coordinates[name][index[-1]]}')
+    return tuple(index), ', '.join(title)
+
+def _sweep_axis(coordinates, set_ticks):
+    # Positions of grid values on an axis. Non numeric values are placed at 0, 1, ... and used as
+    # tick labels
+    if np.issubdtype(coordinates.dtype, np.number):
+        return coordinates
+    positions = np.arange(len(coordinates))
+    set_ticks(positions, [str(c) for c in coordinates])
+    return positions
+
+def _read_result(df, columns=None):
+    # Read optimization results, but only the columns that are needed
+    if isinstance(df, pd.DataFrame):
+        return df
+    columns = None if columns is None else list(dict.fromkeys(columns))
+    if str(df).endswith('.arrow'):
+        from daisypy.optim.arrow_log import read_arrow_log # pylint: disable=import-outside-toplevel
+        return read_arrow_log(df, columns)
+    return pd.read_csv(df, usecols=columns)
+
 def _compute_limits(x):
     lim = [np.min(x), np.max(x)]
     w = (lim[1] - lim[0]) * 1.1
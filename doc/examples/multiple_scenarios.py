@@ -16,8 +16,9 @@ from daisypy.optim import (
     DefaultLogger
 )
 
-# We use the multiprocessing module, which uses pickle, so we cannot use local functions for loss
-# functions and aggregate functions
+# By default we evaluate in a process pool, which uses pickle, so we cannot use local functions for
+# loss functions and aggregate functions. Pass executor='thread' to the optimizer to evaluate in
+# threads, which allows local functions
 def mse(actual, target):
     """Mean squared error"""
     return ((actual - target)**2).mean()
@@ -19,8 +19,8 @@ from daisypy.optim import (
 # The function that combines log files is called with a list of DataFrames with a 'time' column
 # and some value columns.
 # It should return a single DataFrame with columns 'time' and 'value'
-# And it has to be defined at the top-level because we cannot pass local functions due to
-# multiprocessing.
+# And it has to be defined at the top-level because we cannot pass local functions to the default
+# process pool. Pass executor='thread' to the optimizer to allow local functions.
 def combine_logs(data_frames):
     '''
     Combine outputs by summing "Residuals-*" in field_nitrogen.dlf and multiplying by
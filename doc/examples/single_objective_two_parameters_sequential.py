@@ -18,7 +18,8 @@ from daisypy.optim import (
 )
 
 # We want to optimize the sum of squared distance.
-# We use the multiprocessing module, which uses pickle, so we cannot use local functions.
+# By default we evaluate in a process pool, which uses pickle, so we cannot use local functions.
+# Pass executor='thread' to the optimizer to evaluate in threads, which allows local functions.
 def ssd(actual, target):
     '''Sum of squared distance'''
     return ((actual - target)**2).sum()
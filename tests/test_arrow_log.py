@@ -0,0 +1,84 @@
+import pytest
+pa = pytest.importorskip('pyarrow')
+# pylint: disable=wrong-import-position
+from daisypy.optim.arrow_log import ArrowLog, ArrowLogReader, read_arrow_log
+from daisypy.optim import DefaultLogger
+
+def test_arrow_log(tmp_path):
+    '''Test that ArrowLog writes typed columns and that they can be read with projection'''
+    path = tmp_path / 'test-log.arrow'
+    columns = { 'tag' : None, 'step' : 'int64', 'value' : None, 'ok' : None }
+    with ArrowLog(path, columns, batch_size=2, compression='zstd') as log:
+        log.log(tag='test', step=1, value=0.1, ok=True)
+        log.log(tag='test', step=2, value=0.2, ok=False)
+        log.log(tag='done', step=3, value=0.3, ok=True)
+
+    df = read_arrow_log(path)
+    assert list(df.columns) == ['tag', 'step', 'value', 'ok']
+    assert list(df['tag']) == ['test', 'test', 'done']
+    assert list(df['step']) == [1, 2, 3]
+    assert df['step'].dtype == 'int64'
+    assert list(df['ok']) == [True, False, True]
+
+    df = read_arrow_log(path, ['value', 'step'])
+    assert list(df.columns) == ['value', 'step']
+    assert list(df['value']) == [0.1, 0.2, 0.3]
+
+def test_arrow_log_types(tmp_path):
+    '''Test that inferred columns do not truncate later values'''
+    path = tmp_path / 'test-log.arrow'
+    with ArrowLog(path, batch_size=1) as log:
+        log.log(metric_f=0, metric_g=None, name='a')
+        log.log(metric_f=0.5, metric_g=1.5, name=None)
+        # After the first batch, values are checked when they are logged
+        with pytest.raises(ValueError):
+            log.log(metric_f='a', metric_g=0, name='b')
+    df = read_arrow_log(path)
+    assert len(df) == 2
+    assert list(df['metric_f']) == [0, 0.5]
+    assert df['metric_g'].iloc[1] == 1.5
+    assert df['name'].iloc[0] == 'a'
+    assert df['name'].isna().iloc[1]
+
+    with ArrowLog(tmp_path / 'typed.arrow', { 'step' : 'int64' }) as log:
+        with pytest.raises(ValueError):
+            log.log(step=0.5)
+        log.log(step=2)
+    assert list(read_arrow_log(tmp_path / 'typed.arrow')['step']) == [2]
+
+def test_arrow_log_tail(tmp_path):
+    '''Test that an in-progress log can be tailed'''
+    path = tmp_path / 'test-log.arrow'
+    reader = ArrowLogReader(path, ['step'])
+    with ArrowLog(path, batch_size=2, flush_interval=None) as log:
+        assert len(reader.read_new()) == 0
+        log.log(step=1, value=0.1)
+        # Still buffered
+        assert len(reader.read_new()) == 0
+        log.log(step=2, value=0.2)
+        log.log(step=3, value=0.3)
+        assert list(reader.read_new()['step']) == [1, 2]
+        assert len(reader.read_new()) == 0
+        log.log(step=4, value=0.4, flush=True)
+        assert list(reader.read_new()['step']) == [3, 4]
+
+        # A partially written batch is left for later
+        with open(path, 'rb') as infile:
+            complete = infile.read()
+        log.log(step=5, value=0.5, flush=True)
+        with open(path, 'rb') as infile:
+            full = infile.read()
+        with open(path, 'wb') as outfile:
+            outfile.write(full[:len(complete) + 10])
+        assert len(reader.read_new()) == 0
+        with open(path, 'wb') as outfile:
+            outfile.write(full)
+        assert list(reader.read_new()['step']) == [5]
+
+def test_default_logger_arrow(tmp_path):
+    '''Test that DefaultLogger can log results in arrow format'''
+    with DefaultLogger(tmp_path, result_format='arrow') as logger:
+        logger.result(step=1, tag='a', value=0.1, p1=0, p2=2, p3=4)
+    df = read_arrow_log(tmp_path / 'result.arrow')
+    assert list(df.columns) == ['step', 'tag', 'value', 'p1', 'p2', 'p3']
+    assert df.iloc[0]['value'] == 0.1
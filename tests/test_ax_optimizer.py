@@ -0,0 +1,41 @@
+# pylint: disable=relative-beyond-top-level
+import tempfile
+import threading
+import pandas as pd
+import pytest
+from daisypy.optim import ContinuousParameter, DefaultLogger, available_optimizers
+from .mockup import MockProblem
+
+@pytest.mark.skipif('ax' not in available_optimizers, reason='Requires ax')
+@pytest.mark.parametrize('background_generation', [True, False])
+def test_ax_optimizer_streaming(background_generation):
+    '''Test that Ax keeps up to max_trials_iteration trials in flight and completes them all'''
+    active = set()
+    concurrency = []
+    def mock(x, y):
+        key = object()
+        active.add(key)
+        concurrency.append(len(active))
+        threading.Event().wait(0.05 * (1 + x))
+        active.discard(key)
+        return (x - 0.5)**2 + y**2
+    mock.name = 'mock' # MockProblem always names the result 'mock'
+    parameters = [
+        ContinuousParameter('x', 0, (0, 1)),
+        ContinuousParameter('y', 0, (-1, 1)),
+    ]
+    problem = MockProblem(parameters, mock)
+    with tempfile.TemporaryDirectory() as out_dir:
+        with DefaultLogger(out_dir) as logger:
+            options = { 'max_trials' : 6, 'background_generation' : background_generation }
+            optimizer = available_optimizers['ax'](
+                problem, logger, options, number_of_processes=2, executor='thread'
+            )
+            assert optimizer.options['max_trials_iteration'] == 2
+            optimizer.optimize()
+        result = pd.read_csv(f'{out_dir}/result.csv')
+    assert sorted(result['trial']) == list(range(6))
+    assert max(concurrency) <= 2
+    assert len(optimizer.runtime_predictor) == 0 # MockProblem does not record timings
+    assert sum(generation['n_trials'] for generation in optimizer.generation_log) == 6
+    assert 'get_next_trials' in optimizer.timing_summary.summary()
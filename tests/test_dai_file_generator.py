@@ -45,3 +45,30 @@ def test_spawn_is_made_sequential():
     with pytest.warns(UserWarning, match="spawn forced to 1"):
         generator = DaiFileGenerator('dummy', template_text=SPAWN_PARALLEL)
     assert generator.template_text == SPAWN_SEQUENTIAL
+
+STOP_TEMPLATE = """(defprogram p1 Daisy
+  (time 2000 1 1)
+  (stop 2005 1 1)
+  (x {x}))"""
+
+def test_with_stop():
+    generator = DaiFileGenerator('dummy', template_text=STOP_TEMPLATE)
+    shortened = generator.with_stop('2001-06-30')
+    assert '(stop 2001 6 30)' in shortened.template_text
+    assert '(time 2000 1 1)' in shortened.template_text
+    assert '{x}' in shortened.template_text
+    assert '(stop 2005 1 1)' in generator.template_text
+    assert '(stop 2001 6 30 12)' in generator.with_stop('2001-06-30 12:00').template_text
+    with pytest.raises(ValueError):
+        DaiFileGenerator('dummy', template_text=SPAWN_SEQUENTIAL).with_stop('2001-01-01')
+
+SPAWN_TEMPLATE = """(defprogram all spawn
+  (program a b c)
+  (parallel 1))"""
+
+def test_with_programs():
+    generator = DaiFileGenerator('dummy', template_text=SPAWN_TEMPLATE)
+    assert '(program a c)' in generator.with_programs(['a', 'c']).template_text
+    assert '(program a b c)' in generator.template_text
+    with pytest.raises(ValueError):
+        generator.with_programs(['d'])
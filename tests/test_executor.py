@@ -0,0 +1,77 @@
+# pylint: disable=relative-beyond-top-level
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from daisypy.optim import (
+    available_executors,
+    create_executor,
+    evaluation_executor,
+    ContinuousParameter,
+    DaisyCMAOptimizer,
+    DaisySequentialOptimizer,
+    DefaultLogger,
+    SerialExecutor,
+)
+from .mockup import MockProblem
+
+def test_create_executor():
+    '''Test that executors of all kinds can be created and that unknown kinds are rejected'''
+    for kind in available_executors:
+        with create_executor(kind, 2) as executor:
+            assert list(executor.map(abs, [-1, -2])) == [1, 2]
+    with pytest.raises(ValueError):
+        create_executor('unknown')
+
+def test_thread_executor_in_place():
+    '''Test that the thread executor uses objects in place without pickling'''
+    lock = threading.Lock() # Locks cannot be pickled
+    def fn(x):
+        with lock:
+            return x + 1
+    with create_executor('thread', 2) as executor:
+        assert list(executor.map(fn, [1, 2])) == [2, 3]
+
+def test_serial_executor():
+    '''Test that the serial executor runs in the calling thread and captures exceptions'''
+    with SerialExecutor() as executor:
+        assert executor.submit(threading.get_ident).result() == threading.get_ident()
+        future = executor.submit(int, 'not a number')
+        with pytest.raises(ValueError):
+            future.result()
+    with pytest.raises(RuntimeError):
+        executor.submit(abs, -1)
+
+def test_shared_executor():
+    '''Test that an executor passed to optimizers is reused and not shut down'''
+    parameters = [
+        ContinuousParameter('x', 1, (-1, 1)),
+        ContinuousParameter('y', 1, (-1, 1)),
+    ]
+    def objective(x, y):
+        return x**2 + y**2
+    objective.name = 'sum_of_squares'
+    problem = MockProblem(parameters, objective)
+    with ThreadPoolExecutor(2) as executor, tempfile.TemporaryDirectory() as out_dir:
+        with DefaultLogger(os.path.join(out_dir, 'sequential')) as logger:
+            coarse = DaisySequentialOptimizer(problem, logger, executor=executor).optimize()
+        for param in parameters:
+            param.initial_value = coarse[param.name]['best']
+        with DefaultLogger(os.path.join(out_dir, 'cma')) as logger:
+            optimizer = DaisyCMAOptimizer(
+                problem, logger, {'maxfevals' : 20, 'verbose' : -9}, executor=executor
+            )
+            optimizer.optimize()
+        # Still usable
+        assert executor.submit(abs, -1).result() == 1
+
+def test_evaluation_executor():
+    '''Test that evaluation_executor only shuts down executors it creates'''
+    with evaluation_executor('serial') as executor:
+        pass
+    with pytest.raises(RuntimeError):
+        executor.submit(abs, -1)
+    with pytest.raises(TypeError):
+        with evaluation_executor(None):
+            pass
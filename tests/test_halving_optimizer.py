@@ -0,0 +1,72 @@
+# pylint: disable=relative-beyond-top-level
+import tempfile
+import pandas as pd
+import pytest
+from daisypy.optim import (
+    CategoricalParameter,
+    ContinuousParameter,
+    DaisyHalvingOptimizer,
+    DefaultLogger,
+)
+from .mockup import MockProblem
+
+class HorizonLoss:
+    # pylint: disable=too-few-public-methods
+    '''Loss that grows with the horizon and is smallest at x = 0.5, kind = 'b' '''
+    def __init__(self, stop, evaluations):
+        self.name = 'mock'
+        self.stop = stop
+        self.evaluations = evaluations
+
+    def __call__(self, x, kind):
+        years = 10 if self.stop is None else pd.Timestamp(self.stop).year - 2000
+        self.evaluations.append(self.stop)
+        return years * ((x - 0.5)**2 + (kind != 'b'))
+
+
+class HorizonProblem(MockProblem):
+    # pylint: disable=too-few-public-methods
+    '''Problem where the loss is accumulated over the years until stop'''
+    def __init__(self, parameters, stop=None, evaluations=None):
+        self.evaluations = evaluations if evaluations is not None else []
+        super().__init__(parameters, HorizonLoss(stop, self.evaluations))
+
+    def with_stop(self, stop):
+        '''Problem on a shorter horizon sharing the list of evaluations'''
+        return HorizonProblem(self.parameters, stop, self.evaluations)
+
+def make_problem():
+    '''Problem with a continuous and a categorical parameter'''
+    return HorizonProblem([
+        ContinuousParameter('x', 0, (0, 1)),
+        CategoricalParameter('kind', ['a', 'b', 'c']),
+    ])
+
+def test_halving_optimizer():
+    '''Test that the best candidates are promoted to longer horizons'''
+    problem = make_problem()
+    options = {
+        'horizons' : ['2001-01-01', '2003-01-01', None], 'eta' : 3, 'num_candidates' : 27,
+        'seed' : 1
+    }
+    with tempfile.TemporaryDirectory() as out_dir:
+        logger = DefaultLogger(out_dir)
+        optimizer = DaisyHalvingOptimizer(problem, logger, options, executor='thread')
+        result = optimizer.optimize()
+        logger.close()
+        log = pd.read_csv(f'{out_dir}/result.csv')
+    assert problem.evaluations == ['2001-01-01'] * 27 + ['2003-01-01'] * 9 + [None] * 3
+    assert list(log.groupby('step').size()) == [27, 9, 3]
+    assert list(log['stop'].unique()) == ['2001-01-01', '2003-01-01', 'full']
+    assert result['kind']['best'] == 'b'
+    # The best on the full horizon is the best of the promoted candidates on the first horizon
+    first = log[log['step'] == 1]
+    best = first.loc[first['metric_mock'].idxmin()]
+    assert result['x']['best'] == pytest.approx(best['param_x'])
+
+def test_halving_options():
+    '''Test that horizons are required and only the last can be the full horizon'''
+    with pytest.raises(ValueError):
+        DaisyHalvingOptimizer(make_problem(), None, {})
+    with pytest.raises(ValueError):
+        DaisyHalvingOptimizer(make_problem(), None, { 'horizons' : [None, '2001-01-01'] })
@@ -0,0 +1,113 @@
+# pylint: disable=relative-beyond-top-level
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from daisypy.optim import (
+    CategoricalParameter,
+    ContinuousParameter,
+    DaisyCMAOptimizer,
+    DefaultLogger,
+    available_optimizers,
+    distribution_from_history,
+    read_distribution,
+    read_history,
+)
+from .mockup import MockProblem
+
+def quadratic(x, y):
+    '''Minimum at (0.5, -0.5)'''
+    return (x - 0.5)**2 + (y + 0.5)**2
+quadratic.name = 'quadratic'
+
+def test_history_from_cma():
+    '''Test reading results and distributions logged by CMA and starting a new run from them'''
+    parameters = [ContinuousParameter('x', 0, (-1, 1)), ContinuousParameter('y', 0, (-1, 1))]
+    problem = MockProblem(parameters, quadratic)
+    with tempfile.TemporaryDirectory() as out_dir:
+        with DefaultLogger(out_dir) as logger:
+            DaisyCMAOptimizer(
+                problem, logger, { 'maxfevals' : 60, 'verbose' : -9, 'seed' : 1 }, executor='serial'
+            ).optimize()
+        path = os.path.join(out_dir, 'result.csv')
+        history = read_history(path, parameters, 'quadratic')
+        assert list(history.columns) == ['x', 'y', 'quadratic']
+        assert len(history) == len(pd.read_csv(path)) // 2 # Only the raw rows
+        last_means, last_stds = read_distribution(
+            os.path.join(out_dir, 'parameters.csv'), parameters
+        )
+        narrow = [ContinuousParameter('x', 0, (0, 1)), ContinuousParameter('y', 0, (-1, 0))]
+        filtered = read_history(path, narrow, 'quadratic')
+        clipped = read_history(path, narrow, 'quadratic', out_of_range='clip')
+    assert np.all(last_stds > 0)
+    assert last_means == pytest.approx([0.5, -0.5], abs=0.2)
+    assert len(filtered) <= len(clipped) == len(history)
+    assert filtered['x'].between(0, 1).all() and clipped['y'].between(-1, 0).all()
+
+    means, stds = distribution_from_history(clipped, narrow, 'quadratic')
+    assert means == pytest.approx([0.5, -0.5], abs=0.2)
+    assert np.all(stds >= 0.01)
+    with tempfile.TemporaryDirectory() as out_dir:
+        with DefaultLogger(out_dir) as logger:
+            optimizer = DaisyCMAOptimizer(
+                MockProblem(narrow, quadratic), logger, { 'maxfevals' : 10, 'verbose' : -9 },
+                initial_distribution=(means, stds), executor='serial'
+            )
+            assert optimizer.objective.transform(optimizer.optimizer.mean) == pytest.approx(
+                np.clip(means, [0, -1], [1, 0])
+            )
+
+def test_read_history_categorical(tmp_path):
+    '''Test that categorical values not in the new parameter are dropped'''
+    path = tmp_path / 'result.csv'
+    pd.DataFrame({
+        'param_soil' : ['sand', 'clay', 'loam'],
+        'param_depth' : [1.0, 2.0, 3.0],
+        'metric_loss' : [0.1, np.nan, 0.3],
+    }).to_csv(path, index=False)
+    parameters = [
+        CategoricalParameter('soil', ['sand', 'loam'], 0),
+        ContinuousParameter('depth', 1, (0, 5)),
+    ]
+    history = read_history(str(path), parameters, ['loss'])
+    assert list(history['soil']) == ['sand', 'loam']
+    with pytest.raises(ValueError):
+        read_history(str(path), parameters, ['missing'])
+
+def test_read_history_drops_estimates(tmp_path):
+    '''Test that estimates logged by a StagedProblem are not used to seed a new run'''
+    path = tmp_path / 'result.csv'
+    # The estimates look better than the exact evaluations, but are far from the minimum
+    pd.DataFrame({
+        'param_x' : [0.5, 0.4, -1.0, 0.6, -0.9],
+        'param_y' : [-0.5, -0.4, 1.0, -0.6, 0.9],
+        'metric_quadratic' : [0.0, 0.02, -1.0, 0.02, -1.0],
+        'fidelity' : [1.0, 1.0, 0.25, np.nan, 0.5],
+    }).to_csv(path, index=False)
+    parameters = [ContinuousParameter('x', 0, (-1, 1)), ContinuousParameter('y', 0, (-1, 1))]
+    history = read_history(str(path), parameters, 'quadratic')
+    assert list(history['x']) == [0.5, 0.4, 0.6]
+    means, _ = distribution_from_history(history, parameters, 'quadratic')
+    assert means == pytest.approx([0.5, -0.5])
+
+@pytest.mark.skipif('ax' not in available_optimizers, reason='Requires ax')
+def test_ax_history():
+    '''Test that history is attached to Ax as completed trials'''
+    def mock(x, y):
+        return quadratic(x, y)
+    mock.name = 'mock' # MockProblem always names the result 'mock'
+    parameters = [ContinuousParameter('x', 0, (-1, 1)), ContinuousParameter('y', 0, (-1, 1))]
+    history = pd.DataFrame({ 'x' : [0.0, 0.5], 'y' : [0.0, -0.5] })
+    history['mock'] = quadratic(history['x'], history['y'])
+    with tempfile.TemporaryDirectory() as out_dir:
+        with DefaultLogger(out_dir) as logger:
+            optimizer = available_optimizers['ax'](
+                MockProblem(parameters, mock), logger, { 'max_trials' : 2 }, executor='serial',
+                history=history
+            )
+            result = optimizer.optimize()
+        assert len(pd.read_csv(os.path.join(out_dir, 'result.csv'))) == 2
+    assert len(optimizer.client.summarize()) == 4
+    # The best point is from history
+    assert result.parameters == { 'x' : 0.5, 'y' : -0.5 }
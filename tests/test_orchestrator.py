@@ -0,0 +1,126 @@
+# pylint: disable=relative-beyond-top-level
+import os
+import tempfile
+import threading
+import pytest
+from daisypy.optim import (
+    BudgetExhausted,
+    ContinuousParameter,
+    MultiStudyOrchestrator,
+    SharedPool,
+    Study,
+)
+from .mockup import MockProblem
+
+def make_problem():
+    '''Two dimensional sphere'''
+    def sphere(x, y):
+        return x**2 + y**2
+    sphere.name = 'sphere'
+    return MockProblem([ContinuousParameter(name, 1, (-1, 1)) for name in 'xy'], sphere)
+
+def dispatch_order(policy, priorities, tasks_per_study):
+    '''Order in which queued tasks from studies are run by a pool with one worker'''
+    order = []
+    release = threading.Event()
+    with SharedPool(1, 'thread', policy) as pool:
+        executors = {
+            name : pool.executor(name, priority) for name, priority in priorities.items()
+        }
+        # Block the worker so everything is queued before scheduling starts
+        blocker = executors[next(iter(priorities))].submit(release.wait)
+        futures = [
+            executor.submit(order.append, name)
+            for name, executor in executors.items() for _ in range(tasks_per_study)
+        ]
+        release.set()
+        blocker.result()
+        for future in futures:
+            future.result()
+    return order
+
+def test_fair_scheduling():
+    '''Test that studies get evaluations in proportion to their priority'''
+    order = dispatch_order('fair', { 'a' : 1, 'b' : 1 }, 3)
+    assert order == ['b', 'a', 'b', 'a', 'b', 'a']
+    order = dispatch_order('fair', { 'a' : 1, 'b' : 2 }, 4)
+    # After the blocking task from 'a', 'b' gets two evaluations for each from 'a'
+    assert order[:6].count('b') == 4
+
+def test_priority_scheduling():
+    '''Test that the study with highest priority is served first'''
+    order = dispatch_order('priority', { 'a' : 1, 'b' : 2 }, 3)
+    assert order == ['b', 'b', 'b', 'a', 'a', 'a']
+
+def test_shared_pool_limits_workers():
+    '''Test that no more than max_workers evaluations run at the same time'''
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+    def task():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        threading.Event().wait(0.01)
+        with lock:
+            running[0] -= 1
+    with SharedPool(2, 'thread') as pool:
+        executors = [pool.executor(name) for name in 'abc']
+        futures = [executor.submit(task) for executor in executors for _ in range(5)]
+        for future in futures:
+            future.result()
+    assert peak[0] <= 2
+
+def test_budget():
+    '''Test that a study cannot submit more than its budget'''
+    with SharedPool(1, 'serial') as pool:
+        executor = pool.executor('a', budget=2)
+        executor.submit(abs, -1)
+        executor.submit(abs, -2)
+        with pytest.raises(BudgetExhausted):
+            executor.submit(abs, -3)
+        with pytest.raises(ValueError):
+            pool.executor('a')
+
+def test_cancel_queued():
+    '''Test that shutting down a study executor with cancel_futures cancels its queued evaluations
+    without affecting other studies'''
+    started = threading.Event()
+    release = threading.Event()
+    def block():
+        started.set()
+        return release.wait()
+    with SharedPool(1, 'thread') as pool:
+        a, b = pool.executor('a'), pool.executor('b')
+        blocker = a.submit(block)
+        started.wait()
+        queued_a = [a.submit(abs, -i) for i in range(3)]
+        queued_b = [b.submit(abs, -i) for i in range(3)]
+        a.shutdown(cancel_futures=True)
+        release.set()
+        assert blocker.result()
+        assert all(future.cancelled() for future in queued_a)
+        assert [future.result() for future in queued_b] == [0, 1, 2]
+
+def test_orchestrator():
+    '''Test that studies run on a shared pool with their own logs and budgets'''
+    studies = [
+        Study('sequential', make_problem(), 'sequential'),
+        Study('cma', make_problem(), 'cma', { 'maxfevals' : 20, 'verbose' : -9 }, priority=2),
+        # cma evaluates 6 candidates per step, so the budget runs out during the second step
+        Study('limited', make_problem(), 'cma', { 'maxfevals' : 20, 'verbose' : -9 }, budget=8),
+        Study('limited_sequential', make_problem(), 'sequential', budget=2),
+    ]
+    with tempfile.TemporaryDirectory() as out_dir:
+        results = MultiStudyOrchestrator(studies, out_dir, 2, 'thread').run()
+        assert results['sequential'].status == 'completed'
+        assert results['cma'].status == 'completed'
+        assert results['limited'].status == 'budget_exhausted'
+        # The best found before the budget ran out is kept
+        assert set(results['limited'].result) == { 'x', 'y' }
+        assert results['limited_sequential'].status == 'budget_exhausted'
+        assert set(results['limited_sequential'].result) == { 'x', 'y' }
+        for study in studies:
+            assert os.path.exists(os.path.join(out_dir, study.name, 'result.csv'))
+    with pytest.raises(ValueError):
+        MultiStudyOrchestrator(studies + studies[:1], 'out')
@@ -47,3 +47,44 @@ def test_multi_objective(tmp_path):
     result = problem([0])
     for obj in objectives:
         assert result[obj.name] == obj.value
+
+def test_timings(tmp_path):
+    '''Test that the time spent in each phase is returned with the objective map'''
+    file_generator = MockFileGenerator({'dai' : ''})
+    runner = MockRunner()
+    parameters = { 'dai' : [ContinuousParameter('p', 0, (-1, 1))] }
+    objective = MockObjective('mock', 123)
+
+    problem = DaisyOptimizationProblem(
+        runner, file_generator, objective, parameters, tmp_path
+    )
+    result = problem([0])
+    assert dict(result) == { 'mock' : 123 }
+    phases = result.timings.phases
+    assert set(phases) == { 'setup', 'render', 'simulate', 'objective', 'teardown', 'total' }
+    assert phases['total'] >= phases['simulate'] >= 0
+
+def test_with_parameters(tmp_path):
+    '''Test that parameters that are not optimized are fixed at their initial values'''
+    generated = []
+    class RecordingFileGenerator(MockFileGenerator):
+        # pylint: disable=too-few-public-methods
+        '''Record the parameters files are generated with'''
+        def __call__(self, output_directory, params, tagged=True):
+            generated.append(params)
+            return super().__call__(output_directory, params, tagged)
+
+    parameters = [ContinuousParameter(name, 0.5, (-1, 1)) for name in 'abc']
+    problem = DaisyOptimizationProblem(
+        MockRunner(), RecordingFileGenerator({'dai' : ''}), MockObjective(), parameters, tmp_path
+    )
+    reduced = problem.with_parameters(['c', parameters[0]])
+    assert [p.name for p in reduced.parameters] == ['a', 'c']
+    assert len(problem.parameters) == 3
+    reduced([-1, 1])
+    assert generated[-1] == { 'dai' : { 'a' : -1, 'b' : 0.5, 'c' : 1 } }
+    try:
+        reduced.with_parameters(['b'])
+        assert False, 'b is fixed'
+    except ValueError:
+        pass
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+import pytest
+from daisypy.optim.registry import LazyRegistry
+
+def test_lazy_registry():
+    '''Test that entries are only available when their requirements are installed'''
+    registry = LazyRegistry()
+    registry.register('mean', 'daisypy.optim.aggregate_fns', 'mean')
+    registry.register('missing', 'daisypy.optim.aggregate_fns', 'mean',
+                      requires=['a_package_that_does_not_exist'])
+    assert 'mean' in registry
+    assert 'missing' not in registry
+    assert list(registry) == ['mean']
+    assert len(registry) == 1
+    assert callable(registry['mean'])
+    with pytest.raises(KeyError):
+        registry['missing'] # pylint: disable=pointless-statement
+
+def test_lazy_import():
+    '''Test that importing daisypy.optim does not import plotting or optimizer backends'''
+    statement = (
+        'import sys, daisypy.optim;'
+        'from daisypy.optim import available_optimizers, DaisyRunner;'
+        "print(','.join(m for m in ('matplotlib', 'cma', 'ax') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', statement], check=True, capture_output=True, text=True
+    )
+    assert result.stdout.strip() == ''
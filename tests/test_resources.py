@@ -0,0 +1,158 @@
+import os
+import subprocess
+import threading
+import time
+import pytest
+from daisypy.optim import (
+    AdaptiveExecutor,
+    MemoryAwareLimiter,
+    available_cpus,
+    create_executor,
+    memory_status,
+)
+from daisypy.optim import resources
+from daisypy.optim.resources import (
+    MemoryStatus,
+    cgroup_cpu_quota,
+    numa_nodes,
+    pinned_thread,
+    pinning_slots,
+    slot_cpus,
+    wait_process,
+)
+from daisypy.optim.timing import Timings
+
+@pytest.fixture(name='fake_system')
+def fixture_fake_system(tmp_path, monkeypatch):
+    '''Point resources at a fake cgroup v2 hierarchy and /proc/meminfo'''
+    cgroup = tmp_path / 'cgroup'
+    (cgroup / 'job').mkdir(parents=True)
+    proc_cgroup = tmp_path / 'proc-cgroup'
+    proc_cgroup.write_text('0::/job\n')
+    meminfo = tmp_path / 'meminfo'
+    meminfo.write_text(
+        'MemTotal:       16000000 kB\n'
+        'MemAvailable:    8000000 kB\n'
+        'SwapTotal:       2000000 kB\n'
+        'SwapFree:        1500000 kB\n'
+    )
+    monkeypatch.setattr(resources, 'CGROUP_ROOT', str(cgroup))
+    monkeypatch.setattr(resources, 'PROC_SELF_CGROUP', str(proc_cgroup))
+    monkeypatch.setattr(resources, 'PROC_MEMINFO', str(meminfo))
+    return cgroup / 'job'
+
+def test_cpu_quota(fake_system):
+    '''Test that the cgroup CPU quota limits the number of CPUs'''
+    assert cgroup_cpu_quota() is None
+    (fake_system / 'cpu.max').write_text('max 100000\n')
+    assert cgroup_cpu_quota() is None
+    (fake_system / 'cpu.max').write_text('150000 100000\n')
+    assert cgroup_cpu_quota() == 1.5
+    assert 1 <= available_cpus() <= 2
+
+def test_memory_status(fake_system):
+    '''Test that memory is read from meminfo and limited by the cgroup'''
+    assert memory_status() == MemoryStatus(8000000 * 1024, 500000 * 1024)
+    (fake_system / 'memory.max').write_text(f'{2**30}\n')
+    (fake_system / 'memory.current').write_text(f'{2**29}\n')
+    (fake_system / 'memory.swap.current').write_text(f'{2**30}\n')
+    assert memory_status() == MemoryStatus(2**29, 2**30)
+
+def test_memory_aware_limiter(monkeypatch):
+    '''Test that the limit follows available memory and backs off when swap grows'''
+    status = MemoryStatus(10 * 2**30, 0)
+    monkeypatch.setattr(resources, 'memory_status', lambda: status)
+    limiter = MemoryAwareLimiter(8, peak_rss=2 * 2**30, reserve=0, interval=0)
+    assert limiter.limit(0) == 5
+    status = MemoryStatus(2 * 2**30, 0)
+    assert limiter.limit(2) == 3
+    status = MemoryStatus(2 * 2**30, 2**30)
+    assert limiter.limit(2) == 1
+    # Recovers one step at a time
+    status = MemoryStatus(10 * 2**30, 2**30)
+    assert [limiter.limit(0) for _ in range(4)] == [2, 3, 4, 5]
+    limiter.observe(5 * 2**30)
+    assert limiter.limit(0) == 2
+
+def test_adaptive_executor(monkeypatch):
+    '''Test that the adaptive executor observes peak RSS of results and respects the limit'''
+    status = MemoryStatus(16 * 2**30, 0)
+    monkeypatch.setattr(resources, 'memory_status', lambda: status)
+    active = set()
+    concurrency = []
+    def evaluate(x):
+        active.add(x)
+        concurrency.append(len(active))
+        threading.Event().wait(0.01)
+        active.discard(x)
+        timings = Timings()
+        timings.peak_rss = 2**30
+        return x, timings
+    limiter = MemoryAwareLimiter(4, reserve=0, interval=0)
+    with AdaptiveExecutor(4, 'thread', limiter) as executor:
+        assert [value for value, _ in executor.map(evaluate, range(4))] == [0, 1, 2, 3]
+        assert limiter.peak_rss == 2**30
+        # No room for more evaluations, run one at a time
+        status = MemoryStatus(2**29, 0)
+        concurrency.clear()
+        list(executor.map(evaluate, range(8)))
+    assert max(concurrency) == 1
+
+def test_pinning_slots(tmp_path, monkeypatch):
+    '''Test that slots are assigned round-robin across NUMA nodes'''
+    for node, cpulist in enumerate(['0-1,4', '2-3,5']):
+        (tmp_path / f'node{node}').mkdir()
+        (tmp_path / f'node{node}' / 'cpulist').write_text(cpulist + '\n')
+    monkeypatch.setattr(resources, 'NODE_ROOT', str(tmp_path))
+    monkeypatch.setattr(resources, '_affinity', lambda: set(range(6)))
+    assert numa_nodes() == [[0, 1, 4], [2, 3, 5]]
+    assert pinning_slots('core', 4) == [{0}, {2}, {1}, {3}]
+    assert pinning_slots('numa', 3) == [{0, 1, 4}, {2, 3, 5}, {0, 1, 4}]
+    with pytest.raises(ValueError):
+        pinning_slots('socket', 1)
+    # Only CPUs in the affinity mask are used
+    monkeypatch.setattr(resources, '_affinity', lambda: {2, 3})
+    assert numa_nodes() == [[2, 3]]
+
+@pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason='Requires Linux')
+@pytest.mark.parametrize('kind', ['thread', 'process'])
+def test_pinned_executor(kind):
+    '''Test that each worker of a pinned pool gets a slot'''
+    with create_executor(kind, 2, pinning='core') as executor:
+        cpus = [executor.submit(slot_cpus).result() for _ in range(4)]
+    assert all(len(slot) == 1 and slot <= os.sched_getaffinity(0) for slot in cpus)
+    assert slot_cpus() is None
+    with pytest.raises(ValueError):
+        create_executor('serial', 1, pinning='core')
+
+@pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason='Requires Linux')
+def test_pinned_thread():
+    '''Test that processes started in the context are pinned from the start'''
+    before = os.sched_getaffinity(0)
+    cpu = min(before)
+    with pinned_thread({cpu}):
+        assert os.sched_getaffinity(0) == {cpu}
+        output = subprocess.run(
+            ['grep', 'Cpus_allowed_list', '/proc/self/status'], capture_output=True, check=True
+        ).stdout.decode()
+    assert output.split() == ['Cpus_allowed_list:', str(cpu)]
+    assert os.sched_getaffinity(0) == before
+
+def wall_time(wait, duration):
+    '''Seconds from starting `sleep duration` until wait returns'''
+    start = time.perf_counter()
+    with subprocess.Popen(['sleep', str(duration)]) as process:
+        wait(process)
+    return time.perf_counter() - start
+
+@pytest.mark.skipif(not hasattr(os, 'wait4'), reason='Requires os.wait4')
+def test_wait_process_overhead():
+    '''Test that wait_process returns as soon as the process exits, like Popen.wait'''
+    def wait(process):
+        process.returncode, peak_rss = wait_process(process.pid)
+        assert process.returncode == 0
+        if os.path.exists('/proc/self/status'):
+            assert peak_rss > 0
+    for duration in (0.3, 1.05):
+        overhead = wall_time(wait, duration) - wall_time(subprocess.Popen.wait, duration)
+        assert overhead < 0.05
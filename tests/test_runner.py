@@ -1,5 +1,8 @@
+import os
 from pathlib import Path
-from daisypy.optim import DaisyRunner
+import numpy as np
+import pytest
+from daisypy.optim import DaisyRunner, available_launchers, collect_timings
 from .markers import requires_daisy
 
 EXPECTED = "Hello from Daisy"
@@ -18,3 +21,49 @@ def test_runner(tmp_path):
         lines = list(f)
     assert len(lines) >= 2
     assert lines[-2].strip() == EXPECTED
+
+@pytest.mark.skipif(os.name != 'posix', reason='Requires a POSIX shell')
+@pytest.mark.parametrize('launcher', available_launchers)
+def test_launchers(tmp_path, monkeypatch, launcher):
+    '''Test that all launchers pass arguments and environment, and return the exit code'''
+    # DaisyRunner sets DAISYHOME, make sure it is restored
+    monkeypatch.setenv('DAISYHOME', '')
+    fake_daisy = tmp_path / 'daisy'
+    fake_daisy.write_text('#!/bin/sh\necho "$DAISYHOME $4" > "$3/args.txt"\nexit 3\n')
+    fake_daisy.chmod(0o755)
+    runner = DaisyRunner(str(fake_daisy), 'some-home', launcher=launcher)
+    assert DaisyRunner.unzerialize(runner.serialize()).launcher == launcher
+    results = [runner('run.dai', str(tmp_path)) for _ in range(2)]
+    assert [result.returncode for result in results] == [3, 3]
+    assert (tmp_path / 'args.txt').read_text().strip() == 'some-home run.dai'
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/status'), reason='Requires Linux')
+@pytest.mark.parametrize('launcher', available_launchers)
+def test_peak_rss_of_daisy_only(tmp_path, launcher):
+    '''Test that the peak resident set size is of Daisy, not of the process that launched it'''
+    fake_daisy = tmp_path / 'daisy'
+    fake_daisy.write_text('#!/bin/sh\nsleep 0.2\n')
+    fake_daisy.chmod(0o755)
+    runner = DaisyRunner(str(fake_daisy), launcher=launcher)
+    # Touch every page, so the buffer is resident
+    buffer = np.ones(2**28 // 8)
+    with collect_timings() as timings:
+        assert runner('run.dai', str(tmp_path)).returncode == 0
+    del buffer
+    assert 0 < timings.peak_rss < 2**26
+
+@pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason='Requires Linux')
+@pytest.mark.parametrize('launcher', available_launchers)
+def test_pinned_runner(tmp_path, launcher):
+    '''Test that Daisy is pinned to the CPUs given to the runner'''
+    before = os.sched_getaffinity(0)
+    cpu = min(before)
+    fake_daisy = tmp_path / 'daisy'
+    fake_daisy.write_text('#!/bin/sh\ngrep Cpus_allowed_list /proc/self/status > "$3/cpus.txt"\n')
+    fake_daisy.chmod(0o755)
+    runner = DaisyRunner(str(fake_daisy), launcher=launcher, cpus={cpu})
+    assert DaisyRunner.unzerialize(runner.serialize()).cpus == [cpu]
+    assert runner('run.dai', str(tmp_path)).returncode == 0
+    # Only Daisy is pinned, not the thread that launched it
+    assert os.sched_getaffinity(0) == before
+    assert (tmp_path / 'cpus.txt').read_text().split() == ['Cpus_allowed_list:', str(cpu)]
@@ -0,0 +1,49 @@
+import pytest
+from daisypy.optim import RuntimePredictor, SerialExecutor, map_longest_first
+from daisypy.optim.timing import Timings
+
+def test_runtime_predictor():
+    '''Test nearest neighbour and linear runtime prediction'''
+    for method in ('nearest', 'linear'):
+        predictor = RuntimePredictor(method, k=1)
+        assert predictor.predict([1.0]) is None
+        for x in range(5):
+            predictor.observe([x], 2 * x + 1)
+        assert len(predictor) == 5
+        assert predictor.predict([3]) == pytest.approx(7)
+        assert predictor.predict([0.1]) == pytest.approx(1 if method == 'nearest' else 1.2)
+    with pytest.raises(ValueError):
+        RuntimePredictor('random')
+
+def test_runtime_predictor_scenario_and_categorical():
+    '''Test that scenarios are kept apart and non-numeric parameters are compared for equality'''
+    predictor = RuntimePredictor(k=1)
+    predictor.observe([1, 'fine'], 10, scenario='a')
+    predictor.observe([1, 'coarse'], 1, scenario='a')
+    predictor.observe([1, 'fine'], 100, scenario='b')
+    assert predictor.predict([1, 'coarse'], scenario='a') == 1
+    assert predictor.predict([1, 'fine'], scenario='a') == 10
+    assert predictor.predict([1, 'fine'], scenario='b') == 100
+    # Unknown scenario uses all observations
+    assert predictor.predict([1, 'coarse'], scenario='c') == 1
+
+def test_map_longest_first():
+    '''Test that evaluations are submitted longest predicted first and returned in order'''
+    submitted = []
+    def evaluate(params):
+        submitted.append(params[0])
+        timings = Timings()
+        timings.add('total', params[0])
+        return params[0] * 10, timings
+    predictor = RuntimePredictor(k=1)
+    parameter_sets = [[1], [3], [2]]
+    with SerialExecutor() as executor:
+        # Nothing observed, submit in order
+        results = list(map_longest_first(executor, evaluate, parameter_sets, predictor))
+        assert submitted == [1, 3, 2]
+        assert [value for value, _ in results] == [10, 30, 20]
+        assert len(predictor) == 3
+        submitted.clear()
+        results = list(map_longest_first(executor, evaluate, parameter_sets, predictor))
+        assert submitted == [3, 2, 1]
+        assert [value for value, _ in results] == [10, 30, 20]
@@ -16,3 +16,15 @@ def test_csv_delimiter():
             f = ScalarObjective(target_file.name, data_extractor, target_file, "NO3", mse)
             result = f(in_dir).pop(target_file.name)
             assert result == 0, target_file
+
+def test_with_stop():
+    target = pd.DataFrame({
+        'time' : pd.date_range('2000-01-01', periods=4, freq='YS'), 'NO3' : [1.0, 2.0, 3.0, 4.0]
+    })
+    # The simulation stopped early, so only the first two years are in the output
+    actual = target.iloc[:2].rename(columns={'NO3' : 'value'})
+    objective = ScalarObjective('NO3', MockDataExtractor(actual), target, 'NO3', mse)
+    shortened = objective.with_stop('2001-01-01')
+    assert len(shortened.target) == 2
+    assert len(objective.target) == 4
+    assert shortened('unused') == { 'NO3' : 0 }
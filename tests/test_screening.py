@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+from daisypy.optim import ContinuousParameter, ScreeningResult, screen
+from daisypy.optim.screening import (
+    halton, morris_design, morris_indices, sobol_design, sobol_indices
+)
+from .mockup import MockProblem
+
+def linear_with_interaction(a, b, c, d):
+    '''a matters most, b a little, c not at all and d only through its interaction with a'''
+    return 5 * a + b**2 + 0 * c + a * d
+
+def make_problem():
+    '''Problem with four parameters on [-1, 1]'''
+    return MockProblem(
+        [ContinuousParameter(name, 0, (-1, 1)) for name in 'abcd'], linear_with_interaction
+    )
+
+def test_halton():
+    '''Test that the first dimension is the van der Corput sequence in base 2, and that scrambling
+    removes the correlation between dimensions with large bases'''
+    points = halton(4, 3, scramble=False)
+    assert points[:, 0] == pytest.approx([0.5, 0.25, 0.75, 0.125])
+    assert points[:, 1] == pytest.approx([1/3, 2/3, 1/9, 4/9])
+    scrambled = halton(64, 50, seed=1)
+    assert ((scrambled >= 0) & (scrambled < 1)).all()
+    correlation = np.corrcoef(scrambled.T)[np.triu_indices(50, 1)]
+    assert np.abs(correlation).max() < 0.6
+
+def test_morris_design():
+    '''Test that consecutive points of a trajectory differ in one parameter'''
+    parameters = [ContinuousParameter(name, 0, (0, 10)) for name in 'xyz']
+    design = morris_design(parameters, num_trajectories=5, num_levels=4, seed=1)
+    assert design.shape == (20, 3)
+    assert ((design >= 0) & (design <= 10)).all()
+    for trajectory in design.reshape((5, 4, 3)):
+        steps = np.diff(trajectory, axis=0)
+        assert ((steps != 0).sum(axis=1) == 1).all()
+        # Every parameter is changed once
+        assert sorted(np.nonzero(steps)[1]) == [0, 1, 2]
+
+def test_morris_screening():
+    '''Test that inert parameters are not selected'''
+    result = screen(make_problem(), 'morris', num_samples=20, seed=1, executor='serial')
+    indices = result.indices['mock']
+    assert indices.loc['c', 'mu_star'] == 0
+    assert indices['mu_star'].idxmax() == 'a'
+    assert indices.loc['a', 'mu'] == pytest.approx(10, rel=0.1)
+    assert [p.name for p in result.select(0.05)] == ['a', 'b', 'd']
+
+def test_sobol_indices():
+    '''Test that Sobol indices match the analytical indices of a linear function'''
+    parameters = [ContinuousParameter(name, 0, (-1, 1)) for name in 'xyz']
+    design = sobol_design(parameters, 512, seed=1)
+    values = design @ np.array([3, 1, 0])
+    indices = sobol_indices(parameters, values, seed=1)
+    assert indices['S1'].to_numpy() == pytest.approx([0.9, 0.1, 0], abs=0.05)
+    assert indices['ST'].to_numpy() == pytest.approx([0.9, 0.1, 0], abs=0.05)
+    assert (indices['ST_conf'] < 0.1).all()
+
+def test_sobol_screening():
+    '''Test that interactions are included in the total index'''
+    result = screen(make_problem(), 'sobol', num_samples=128, seed=1, executor='thread')
+    indices = result.indices['mock']
+    assert len(result.values) == 128 * 6
+    assert indices.loc['d', 'S1'] == pytest.approx(0, abs=0.02)
+    assert indices.loc['d', 'ST'] > 0.005
+    assert [p.name for p in result.select(0.5)] == ['a']
+
+def additive_parameters():
+    '''25 parameters on [0, 1] where only the last five matter'''
+    return [ContinuousParameter(f'p{i}', 0.5, (0, 1)) for i in range(25)]
+
+def test_sobol_many_parameters():
+    '''Test the indices of an additive function of 5 out of 25 parameters'''
+    parameters = additive_parameters()
+    design = sobol_design(parameters, 512, seed=1)
+    indices = sobol_indices(parameters, design[:, 20:].sum(axis=1), seed=1)
+    assert indices['ST'].to_numpy() == pytest.approx([0] * 20 + [0.2] * 5, abs=0.05)
+    assert indices['S1'].to_numpy() == pytest.approx([0] * 20 + [0.2] * 5, abs=0.1)
+    result = ScreeningResult('sobol', parameters, design, None, { 'f' : indices })
+    assert [p.name for p in result.select(0.1)] == [f'p{i}' for i in range(20, 25)]
+
+def test_morris_many_parameters():
+    '''Test the elementary effects of an additive function of 5 out of 25 parameters'''
+    parameters = additive_parameters()
+    design = morris_design(parameters, num_trajectories=10, num_levels=4, seed=1)
+    starts = design.reshape((10, 26, 25))[:, 0]
+    # Start points are spread over the levels in every parameter
+    assert all(len(np.unique(starts[:, j])) > 1 for j in range(25))
+    indices = morris_indices(parameters, design, design[:, 20:].sum(axis=1), seed=1)
+    assert indices['mu_star'].to_numpy() == pytest.approx([0] * 20 + [1] * 5)
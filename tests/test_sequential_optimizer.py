@@ -1,8 +1,11 @@
 # pylint: disable=relative-beyond-top-level
 import os
 import tempfile
+import time
+import pytest
 from daisypy.optim import (
     CategoricalParameter,
+    ContinuousParameter,
     DefaultLogger,
     DaisySequentialOptimizer,
 )
@@ -73,3 +76,104 @@ def test_sequential_optimizer(capsys):
     assert result['a']['best'] == 1
     assert result['b']['best'] == 2
     assert result['c']['best'] == 3
+
+def test_sequential_optimizer_thread_executor():
+    '''Test that the thread executor can evaluate problems that cannot be pickled'''
+    parameters = [
+        CategoricalParameter('a', [0,1]),
+        CategoricalParameter('b', [0,1,2]),
+    ]
+    def neg_sum(a, b):
+        return - (a + b)
+    neg_sum.name = 'neg_sum'
+    problem = MockProblem(parameters, neg_sum)
+    with tempfile.TemporaryDirectory() as out_dir:
+        with DefaultLogger(out_dir) as logger:
+            optimizer = DaisySequentialOptimizer(problem, logger, executor='thread')
+            result = optimizer.optimize()
+    assert result['a']['best'] == 1
+    assert result['b']['best'] == 2
+
+def test_sequential_optimizer_refinement():
+    '''Test that refinement passes zoom in on the optimum of continuous parameters'''
+    def shifted_sphere(x, y):
+        return (x - 0.3137)**2 + (y + 1.234)**2
+    shifted_sphere.name = 'sphere'
+    parameters = [ContinuousParameter(name, 0, (-2, 2)) for name in 'xy']
+    problem = MockProblem(parameters, shifted_sphere)
+    results = {}
+    for passes in (0, 8):
+        with tempfile.TemporaryDirectory() as out_dir:
+            with DefaultLogger(out_dir) as logger:
+                options = { 'num_samples' : 5, 'refinement_passes' : passes }
+                optimizer = DaisySequentialOptimizer(problem, logger, options, executor='serial')
+                results[passes] = optimizer.optimize()
+    assert results[0]['y']['best'] == pytest.approx(-2/3)
+    assert results[8]['x']['best'] == pytest.approx(0.3137, abs=0.01)
+    assert results[8]['y']['best'] == pytest.approx(-1.234, abs=0.01)
+
+class Interacting:
+    # pylint: disable=too-few-public-methods
+    '''Each of a and b improves the objective alone, but not together'''
+    name = 'interacting'
+
+    def __call__(self, a, b):
+        return - (a + b) + 3 * a * b
+
+class SlowObjective:
+    # pylint: disable=too-few-public-methods
+    '''Negative weighted sum of arguments that takes a while to compute'''
+    name = 'slow'
+
+    def __call__(self, a, b, c):
+        time.sleep(0.02)
+        return - (3*a + b + c)
+
+def _optimize(parameters, objective, options, **kwargs):
+    problem = MockProblem(parameters, objective)
+    kwargs.setdefault('executor', 'serial')
+    with tempfile.TemporaryDirectory() as out_dir:
+        with DefaultLogger(out_dir) as logger:
+            optimizer = DaisySequentialOptimizer(problem, logger, options, **kwargs)
+            result = optimizer.optimize()
+        with open(os.path.join(out_dir, 'result.csv'), 'r', encoding='utf-8') as in_file:
+            rows = in_file.readlines()[1:]
+    result = { name : value['best'] for name, value in result.items() }
+    return result, rows, optimizer
+
+def test_sequential_optimizer_fix_multiple():
+    '''Test that improving parameters are fixed together, unless the joint run is worse'''
+    parameters = [
+        CategoricalParameter('a', [0,1]),
+        CategoricalParameter('b', [0,1,2]),
+        CategoricalParameter('c', [0,1,2,3]),
+    ]
+    result, rows, _ = _optimize(parameters, Objective('neg_sum'), { 'fix_multiple' : True })
+    assert result == { 'a' : 1, 'b' : 2, 'c' : 3 }
+    # One step with 6 alternatives and the joint run, instead of 3 steps with 10 evaluations
+    assert len(rows) == 7
+
+    parameters = [CategoricalParameter('a', [0,1]), CategoricalParameter('b', [0,1])]
+    result, rows, _ = _optimize(parameters, Interacting(), { 'fix_multiple' : True })
+    assert result == { 'a' : 1, 'b' : 0 }
+    # Alternatives and rejected joint run in step 1 and b in step 2
+    assert len(rows) == 4
+
+def test_sequential_optimizer_speculative():
+    '''Test that speculative evaluation gives the same steps and reuses evaluations'''
+    parameters = [
+        CategoricalParameter('a', [0,1]),
+        CategoricalParameter('b', [0,1,2]),
+        CategoricalParameter('c', [0,1,2,3]),
+    ]
+    expected, expected_rows, _ = _optimize(parameters, SlowObjective(), {})
+    result, rows, optimizer = _optimize(
+        parameters, SlowObjective(), { 'speculative' : True }, executor='thread',
+        number_of_processes=2
+    )
+    assert result == expected
+    # The initial parameters are logged as the first evaluation of step 1
+    assert rows[0].strip() == '1,"raw",-0.0,0.0,0.0,0.0'
+    assert rows[1:] == expected_rows
+    # a wins step 1 early, so step 2 is started on the idle worker at the end of step 1
+    assert optimizer.num_speculative_reused > 0
@@ -0,0 +1,179 @@
+# pylint: disable=relative-beyond-top-level
+import json
+import os
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from daisypy.optim import (
+    AggregateObjective,
+    ContinuousParameter,
+    DaisyCMAOptimizer,
+    DaisyOptimizationProblem,
+    DaisySequentialOptimizer,
+    DefaultLogger,
+    StagedProblem,
+    available_optimizers,
+    select_scenarios,
+)
+from daisypy.optim.file_generator import FileGenerator
+from daisypy.optim.parameter import CategoricalParameter
+from daisypy.optim.problem import ObjectiveMap
+from daisypy.optim.timing import Timings
+from .mockup import MockRunner
+
+CENTERS = { f'site{i}' : c for i, c in enumerate(np.linspace(-1, 1, 9)) }
+
+class ProgramsGenerator(FileGenerator):
+    '''Write the parameters and the programs to run, and record the programs that were run'''
+    def __init__(self, programs, runs):
+        self.programs = programs
+        self.runs = runs
+
+    def __call__(self, output_directory, params, tagged=True):
+        path = os.path.join(output_directory, 'run.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({ 'params' : params['dai'], 'programs' : self.programs }, f)
+        self.runs.extend(self.programs)
+        return { 'dai' : path }
+
+    def with_programs(self, programs):
+        '''Generator that only runs programs'''
+        return ProgramsGenerator(programs, self.runs)
+
+class SiteLoss:
+    # pylint: disable=too-few-public-methods
+    '''Squared distance from the center of a site. Only computed if the site was run'''
+    def __init__(self, name):
+        self.name = name
+
+    def __call__(self, daisy_output_directory):
+        with open(os.path.join(daisy_output_directory, 'run.json'), encoding='utf-8') as f:
+            run = json.load(f)
+        assert self.name in run['programs']
+        return { self.name : (run['params']['x'] - CENTERS[self.name])**2 }
+
+def total(losses):
+    '''Sum of losses'''
+    return sum(losses.values())
+
+def make_problem(runs):
+    '''Problem with one parameter and nine sites'''
+    objective = AggregateObjective('total', [SiteLoss(name) for name in CENTERS], total)
+    return DaisyOptimizationProblem(
+        MockRunner(), ProgramsGenerator(list(CENTERS), runs), objective,
+        [ContinuousParameter('x', 0, (-5, 5))]
+    )
+
+def test_select_scenarios():
+    '''Test that the scenarios that explain the aggregated objective are selected'''
+    rng = np.random.default_rng(1)
+    losses = rng.uniform(size=(20, 5))
+    selected, coefficients, correlation = select_scenarios(losses, 2 * losses[:, 3] + 1, 1)
+    assert selected == [3]
+    assert coefficients == pytest.approx([2, 1])
+    assert correlation == pytest.approx(1)
+
+def test_staged_problem():
+    '''Test that bad candidates are only run on the subset after warmup'''
+    runs = []
+    problem = StagedProblem(make_problem(runs), warmup=5)
+    for x in np.linspace(-2, 2, 5):
+        result = problem([x])
+        assert result.timings.fidelity == 1.0
+        assert result['total'] == pytest.approx(sum((x - c)**2 for c in CENTERS.values()))
+    assert len(problem.subset) == 3
+    assert problem.correlation == pytest.approx(1)
+
+    # A bad candidate is estimated from the subset. The sum of squares is exactly explained by three
+    # of them
+    runs.clear()
+    result = problem([4])
+    assert result.timings.fidelity == pytest.approx(3 / 9)
+    assert result['total'] == pytest.approx(sum((4 - c)**2 for c in CENTERS.values()))
+    assert sorted(runs) == sorted(problem.scenarios[i] for i in problem.subset)
+
+    # A good candidate is run on all sites
+    runs.clear()
+    result = problem([0])
+    assert result.timings.fidelity == 1.0
+    assert sorted(runs) == sorted(CENTERS)
+
+def test_fidelity_is_logged():
+    '''Test that optimizers log the fidelity of staged evaluations'''
+    problem = StagedProblem(make_problem([]), warmup=3)
+    with tempfile.TemporaryDirectory() as out_dir:
+        logger = DefaultLogger(out_dir)
+        optimizer = DaisySequentialOptimizer(
+            problem, logger, { 'num_samples' : 9 }, executor='thread'
+        )
+        optimizer.optimize()
+        logger.close()
+        log = pd.read_csv(os.path.join(out_dir, 'result.csv'))
+    assert 'fidelity' in log.columns
+    assert (log['fidelity'] < 1).any()
+
+def test_staged_problem_is_not_picklable():
+    '''Test that a staged problem cannot be sent to a process pool, where it would not learn'''
+    with pytest.raises(TypeError):
+        pickle.dumps(StagedProblem(make_problem([])))
+
+class EstimatingProblem:
+    # pylint: disable=too-few-public-methods
+    '''Problem where values of x above 1.5 are estimated to be much better than they are'''
+    def __init__(self, parameters):
+        self.parameters = parameters
+        self.objective_fn = AggregateObjective('total', [], total)
+
+    def __call__(self, parameter_values):
+        x = parameter_values[0]
+        timings = Timings()
+        timings.fidelity = 1.0
+        if x > 1.5:
+            timings.fidelity = 0.5
+            return ObjectiveMap({ 'total' : -10.0 }, timings)
+        return ObjectiveMap({ 'total' : -x }, timings)
+
+def test_estimates_are_not_fixed():
+    '''Test that the sequential optimizer never fixes a parameter based on an estimate'''
+    problem = EstimatingProblem([CategoricalParameter('x', [0, 1, 2])])
+    with tempfile.TemporaryDirectory() as out_dir:
+        with DefaultLogger(out_dir) as logger:
+            optimizer = DaisySequentialOptimizer(problem, logger, executor='serial')
+            result = optimizer.optimize()
+    assert result['x']['best'] == 1
+
+def test_cma_never_returns_estimates():
+    '''Test that CMA returns the best full evaluation, and nothing if all are estimates'''
+    options = { 'maxfevals' : 30, 'verbose' : -9, 'seed' : 1 }
+    for initial, valid_range, best in ((0.5, (0, 2), True), (1.8, (1.6, 2), False)):
+        # cma needs at least two parameters. y does not change the objective
+        problem = EstimatingProblem([
+            ContinuousParameter('x', initial, valid_range), ContinuousParameter('y', 0, (-1, 1))
+        ])
+        with tempfile.TemporaryDirectory() as out_dir:
+            with DefaultLogger(out_dir) as logger:
+                optimizer = DaisyCMAOptimizer(problem, logger, options, executor='serial')
+                if best:
+                    assert optimizer.optimize()['x']['best'] <= 1.5
+                else:
+                    with pytest.raises(RuntimeError):
+                        optimizer.optimize()
+                    assert optimizer.partial_result() is None
+
+@pytest.mark.skipif('ax' not in available_optimizers, reason='Requires ax')
+def test_estimates_are_not_passed_to_ax():
+    '''Test that Ax does not get estimates as data'''
+    problem = EstimatingProblem([ContinuousParameter('x', 0, (0, 2))])
+    with tempfile.TemporaryDirectory() as out_dir:
+        with DefaultLogger(out_dir) as logger:
+            optimizer = available_optimizers['ax'](
+                problem, logger, { 'max_trials' : 8 }, number_of_processes=1, executor='serial'
+            )
+            result = optimizer.optimize()
+        log = pd.read_csv(os.path.join(out_dir, 'result.csv'))
+    estimated = log.loc[log['fidelity'] < 1, 'trial']
+    statuses = optimizer.client.summarize().set_index('trial_index')['trial_status']
+    assert all(statuses[i] == 'ABANDONED' for i in estimated)
+    assert result.parameters['x'] <= 1.5
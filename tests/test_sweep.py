@@ -0,0 +1,104 @@
+# pylint: disable=relative-beyond-top-level
+import numpy as np
+import pytest
+from daisypy.optim import ContinuousParameter, read_sweep, sweep
+from .mockup import MockProblem
+
+GRIDS = { 'b' : [0, 1, 2, 3], 'a' : [-1.0, 0.0, 1.0], 'c' : [5, 6] }
+
+class Objective:
+    # pylint: disable=too-few-public-methods
+    '''Records evaluations and fails for a = fail_at'''
+    def __init__(self, fail_at=None):
+        self.name = 'mock'
+        self.fail_at = fail_at
+        self.evaluations = 0
+
+    def __call__(self, a, b, c):
+        if a == self.fail_at:
+            raise RuntimeError('Interrupted')
+        self.evaluations += 1
+        return (a - 1)**2 + b + c
+
+def make_problem(objective):
+    '''Problem with three parameters in a different order than the grids'''
+    return MockProblem([ContinuousParameter(name, 0, (-5, 5)) for name in 'abc'], objective)
+
+def expected_values():
+    '''Objective values with axes in the order of the grids'''
+    b, a, c = np.meshgrid(*GRIDS.values(), indexing='ij')
+    return (a - 1)**2 + b + c
+
+def test_sweep(tmp_path):
+    '''Test that all grid points are evaluated and stored with axes in grid order'''
+    result = sweep(make_problem(Objective()), GRIDS, tmp_path, executor='thread')
+    assert result.complete
+    assert result.values['mock'].shape == (4, 3, 2)
+    assert np.asarray(result.values['mock']) == pytest.approx(expected_values())
+    stored = read_sweep(tmp_path)
+    assert stored.parameters == ['b', 'a', 'c']
+    assert np.asarray(stored.values['mock']) == pytest.approx(expected_values())
+    assert stored.index(a=0.9, c=6) == { 'a' : 2, 'c' : 1 }
+    with pytest.raises(ValueError):
+        sweep(make_problem(Objective()), { 'a' : [0, 1], 'b' : [0], 'c' : [0] }, tmp_path)
+
+def test_resume(tmp_path):
+    '''Test that an interrupted sweep only evaluates the points that are not done'''
+    with pytest.raises(RuntimeError):
+        sweep(make_problem(Objective(fail_at=1.0)), GRIDS, tmp_path, 'serial', flush_every=1)
+    interrupted = read_sweep(tmp_path)
+    assert not interrupted.complete
+    num_done = int(interrupted.done.sum())
+    # In C order a = 1 is reached after a = -1 and a = 0, each with two values of c
+    assert num_done == 4
+    objective = Objective()
+    result = sweep(make_problem(objective), GRIDS, tmp_path, 'serial')
+    assert objective.evaluations == 4 * 3 * 2 - num_done
+    assert np.asarray(result.values['mock']) == pytest.approx(expected_values())
+
+def test_failed_are_retried(tmp_path):
+    '''Test that failed evaluations are not done, and are retried when the sweep is resumed'''
+    objective = Objective()
+    def failing(a, b, c):
+        return np.nan if a == 1.0 else objective(a, b, c)
+    result = sweep(make_problem(failing), GRIDS, tmp_path, 'serial')
+    assert not result.complete
+    assert np.array_equal(result.failed, ~result.done)
+    assert int(result.failed.sum()) == 4 * 2
+    assert objective.evaluations == 4 * 2 * 2
+    result = sweep(make_problem(objective), GRIDS, tmp_path, 'serial')
+    assert result.complete
+    assert not result.failed.any()
+    assert objective.evaluations == 4 * 3 * 2
+    assert np.asarray(result.values['mock']) == pytest.approx(expected_values())
+
+class NamedProblem:
+    '''Problem with objectives named like the files of a sweep'''
+    # pylint: disable=too-few-public-methods
+    def __init__(self):
+        self.parameters = [ContinuousParameter('a', 0, (-5, 5))]
+
+    def __call__(self, parameter_values):
+        a = parameter_values[0]
+        return { 'done' : a, 'sweep' : 2*a, 'x/y' : 3*a }
+
+def test_objective_names(tmp_path):
+    '''Test that objectives with the names of sweep files or with slashes are stored safely'''
+    sweep(NamedProblem(), { 'a' : [0, 1] }, tmp_path, 'serial')
+    result = read_sweep(tmp_path)
+    assert result.complete
+    assert list(result.done) == [True, True]
+    assert list(result.values['done']) == [0, 1]
+    assert list(result.values['sweep']) == [0, 2]
+    assert list(result.values['x/y']) == [0, 3]
+
+def test_sweep_plots(tmp_path):
+    '''Test that heatmaps and slices are plotted from the stored arrays'''
+    # pylint: disable-next=import-outside-toplevel # matplotlib is only needed here
+    from daisypy.optim import plot_sweep_heatmap, plot_sweep_slice
+    sweep(make_problem(Objective()), GRIDS, tmp_path, executor='serial')
+    _, ax = plot_sweep_heatmap(tmp_path, 'a', 'b')
+    # c is fixed at the best point
+    assert ax.get_title() == 'c=5'
+    _, ax = plot_sweep_slice(tmp_path, 'a', fixed={ 'b' : 3, 'c' : 6 })
+    assert list(ax.lines[0].get_ydata()) == pytest.approx([13, 10, 9])
@@ -0,0 +1,61 @@
+from pytest import approx
+from daisypy.optim import Logger, TimingSummary, collect_timings, timed_phase
+from daisypy.optim.timing import Timings
+
+class ListLog:
+    '''Log that stores log messages in a list'''
+    def __init__(self):
+        self.rows = []
+
+    def log(self, **kwargs):
+        '''Store message'''
+        self.rows.append(kwargs)
+
+    def close(self):
+        '''Nothing to close'''
+
+def test_timed_phase():
+    '''Test that phases are only recorded while collecting, and that they accumulate'''
+    with timed_phase('outside'):
+        pass
+    with collect_timings() as timings:
+        for _ in range(3):
+            with timed_phase('inner'):
+                pass
+    assert set(timings.phases) == { 'inner', 'total' }
+    assert timings.phases['inner'] <= timings.phases['total']
+
+def test_timing_summary():
+    '''Test that the summary has the expected statistics and is written to the timing log'''
+    summary = TimingSummary()
+    for seconds in range(1, 101):
+        timings = Timings()
+        timings.add('simulate', float(seconds))
+        summary.add(timings)
+    summary.add(None)
+    stats = summary.summary()['simulate']
+    assert stats['count'] == 100
+    assert stats['mean'] == approx(50.5)
+    assert stats['p50'] == approx(50.5)
+    assert stats['p95'] == approx(95.05)
+
+    log = ListLog()
+    summary.log(Logger(timing=log))
+    assert len(log.rows) == 1
+    assert log.rows[0]['phase'] == 'simulate'
+
+def test_timing_summary_is_bounded():
+    '''Test that the summary keeps a bounded number of timings, with exact count and total and
+    approximate percentiles'''
+    summary = TimingSummary(reservoir_size=200, seed=1)
+    for seconds in range(1, 10001):
+        timings = Timings()
+        timings.add('simulate', float(seconds))
+        summary.add(timings)
+    assert len(summary.reservoirs['simulate']) == 200
+    stats = summary.summary()['simulate']
+    assert stats['count'] == 10000
+    assert stats['total'] == approx(10000 * 10001 / 2)
+    assert stats['mean'] == approx(5000.5)
+    assert stats['p50'] == approx(5000, abs=1000)
+    assert stats['p95'] == approx(9500, abs=500)
@@ -0,0 +1,37 @@
+import json
+from daisypy.optim import DaisyOptimizationProblem, ContinuousParameter, Tracer
+from .mockup import (MockRunner, MockFileGenerator, MockObjective)
+
+def test_tracer(tmp_path):
+    '''Test that evaluations, phases and optimizer events end up in the exported trace'''
+    file_generator = MockFileGenerator({'dai' : ''})
+    parameters = [ContinuousParameter('p', 0, (-1, 1))]
+    problem = DaisyOptimizationProblem(
+        MockRunner(), file_generator, MockObjective('mock', 1), parameters, tmp_path
+    )
+    tracer = Tracer()
+    for step in range(3):
+        with tracer.span('ask', step=step):
+            pass
+        tracer.add_evaluation(problem([0]).timings, step=step)
+
+    assert 0 < tracer.utilization(1) <= 100
+    assert tracer.utilization(2) == tracer.utilization(1) / 2
+
+    trace_path = tmp_path / 'trace.json'
+    tracer.export(trace_path)
+    with open(trace_path, 'r', encoding='utf-8') as infile:
+        trace = json.load(infile)
+    names = [event['name'] for event in trace['traceEvents']]
+    assert names.count('evaluation') == 3
+    assert names.count('ask') == 3
+    assert names.count('simulate') == 3
+    assert 'process_name' in names
+
+def test_disabled_tracer():
+    '''Test that a disabled tracer records nothing'''
+    tracer = Tracer(enabled=False)
+    with tracer.span('ask'):
+        pass
+    assert len(tracer.events) == 0
+    assert tracer.utilization(1) is None
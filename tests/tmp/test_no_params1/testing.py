@@ -0,0 +1 @@
+x = { "a" : 2 }
\ No newline at end of file
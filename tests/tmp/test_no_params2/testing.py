@@ -0,0 +1 @@
+x = { 'a' : 1 }
\ No newline at end of file
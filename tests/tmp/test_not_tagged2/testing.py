@@ -0,0 +1,2 @@
+def linear(x):
+    return 0.5 * x + 10
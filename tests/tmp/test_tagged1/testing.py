@@ -0,0 +1,2 @@
+def linear(x):
+    return 0.25 * x + 7